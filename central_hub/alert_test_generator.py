@@ -13,14 +13,48 @@ Usage:
     --count 10
 
 This will publish 10 alert messages at 5‑second intervals to topics like home/sensor/esp01/pir.
+
+Add `--burst 4` to publish 4 back-to-back messages per event, the way one intruder
+produces rising/falling edges on several sensors; the hub should coalesce each burst
+into a single incident.
+
+Load mode simulates a whole site: thousands of virtual nodes spread over several
+processes and MQTT connections, with Poisson, burst or replayed-trace arrivals:
+
+  python alert_test_generator.py --load \
+    --host 192.168.0.100 \
+    --virtual-nodes 2000 --processes 4 --connections 8 \
+    --pattern poisson --rate 200 --duration 60 --qos 1 \
+    --ws-url ws://192.168.0.100:8000/ws/alerts --json load.json
+
+Every payload carries a "correlation_id". The hub echoes the ids of the events
+behind each notification on /ws/alerts, which the generator subscribes to in
+order to report publish-to-notification latency percentiles and a histogram.
+Latency uses wall-clock time on both ends, so run it on the hub or keep clocks
+in sync with NTP.
+
+A trace for `--pattern trace` is a JSON-lines file of {"t": seconds, "node": ...,
+"sensor": ...} records, or a CSV file with a t,node,sensor header.
 """
 
 import argparse
+import asyncio
+import csv
+import multiprocessing
+import threading
 import time
 import random
 import json
+import uuid
+import zlib
 from datetime import datetime
 import paho.mqtt.client as mqtt
+import websockets
+
+from core.metrics import percentile
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
 
 
 def main():
@@ -61,30 +95,77 @@ def main():
         "--count", "-c",
         type=int,
         default=0,
-        help="Number of messages to send (0 for infinite)"
+        help="Number of events to send (0 for infinite)"
+    )
+    parser.add_argument(
+        "--burst", "-b",
+        type=int,
+        default=1,
+        help="Messages published back-to-back per event"
     )
+    parser.add_argument(
+        "--qos", "-q",
+        type=int,
+        choices=(0, 1, 2),
+        default=0,
+        help="MQTT QoS of published messages"
+    )
+    load = parser.add_argument_group("load mode")
+    load.add_argument("--load", action="store_true", help="Simulate many virtual nodes and measure latency")
+    load.add_argument("--virtual-nodes", type=int, default=1000, help="Simulated nodes")
+    load.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="Publishing processes")
+    load.add_argument("--connections", type=int, default=4, help="MQTT connections per process")
+    load.add_argument(
+        "--pattern",
+        choices=("poisson", "burst", "trace"),
+        default="poisson",
+        help="Arrival pattern of events across the site"
+    )
+    load.add_argument("--rate", type=float, default=100.0, help="Average events per second across all nodes")
+    load.add_argument("--duration", type=float, default=60.0, help="Seconds to publish for")
+    load.add_argument(
+        "--burst-size",
+        type=int,
+        default=8,
+        help="Events per burst (burst pattern), from neighbouring nodes"
+    )
+    load.add_argument("--burst-spread", type=float, default=0.5, help="Seconds each burst is spread over")
+    load.add_argument("--trace", help="Trace file to replay (trace pattern)")
+    load.add_argument("--speed", type=float, default=1.0, help="Trace replay speed factor")
+    load.add_argument("--ws-url", help="Hub alerts websocket (default: ws://HOST:8000/ws/alerts); '' to skip")
+    load.add_argument("--drain", type=float, default=30.0, help="Seconds to wait for outstanding notifications")
+    load.add_argument("--seed", type=int, help="Random seed for reproducible arrivals")
+    load.add_argument("--json", help="Write the load report to this file")
     args = parser.parse_args()
 
+    if args.load:
+        run_load(args)
+        return
+
     # Create MQTT client
     client = mqtt.Client()
     client.connect(args.host, args.port, keepalive=60)
     client.loop_start()
 
     sent = 0
+    messages = 0
+    started = time.perf_counter()
     try:
         while True:
-            # Pick random node and sensor
-            node = random.choice(args.nodes)
-            sensor = random.choice(args.sensors)
-            # Build payload
-            payload = {
-                "node": node,
-                "sensor": sensor,
-                "ts": datetime.now().isoformat()
-            }
-            topic = f"home/sensor/{node}/{sensor}"
-            client.publish(topic, json.dumps(payload))
-            print(f"[{datetime.now().isoformat()}] Published to {topic}: {payload}")
+            for _ in range(args.burst):
+                # Pick random node and sensor
+                node = random.choice(args.nodes)
+                sensor = random.choice(args.sensors)
+                # Build payload
+                payload = {
+                    "node": node,
+                    "sensor": sensor,
+                    "ts": datetime.now().isoformat()
+                }
+                topic = f"home/sensor/{node}/{sensor}"
+                client.publish(topic, json.dumps(payload), qos=args.qos)
+                print(f"[{datetime.now().isoformat()}] Published to {topic}: {payload}")
+                messages += 1
 
             sent += 1
             if args.count and sent >= args.count:
@@ -93,8 +174,275 @@ def main():
     except KeyboardInterrupt:
         print("\nInterrupted by user, shutting down.")
     finally:
+        elapsed = time.perf_counter() - started
+        print(f"Sent {sent} event(s) / {messages} message(s) in {elapsed:.1f}s")
+        client.loop_stop()
+        client.disconnect()
+
+
+def run_load(args):
+    """
+    Publishes from `args.processes` worker processes and collects the notification
+    latency of every correlation id they report back.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    nodes = [f"vnode{i:05d}" for i in range(args.virtual_nodes)]
+    trace = _load_trace(args.trace) if args.pattern == "trace" else None
+    if args.pattern == "trace" and not trace:
+        raise SystemExit("--pattern trace needs a non-empty --trace file")
+    ws_url = f"ws://{args.host}:8000/ws/alerts" if args.ws_url is None else args.ws_url
+
+    subscriber = None
+    if ws_url:
+        subscriber = LatencySubscriber(ws_url, prefix=f"{run_id}-")
+        subscriber.start()
+
+    settings = dict(
+        run_id=run_id,
+        host=args.host,
+        port=args.port,
+        connections=args.connections,
+        qos=args.qos,
+        pattern=args.pattern,
+        rate=args.rate / args.processes,
+        duration=args.duration,
+        sensors=args.sensors,
+        burst_size=args.burst_size,
+        burst_spread=args.burst_spread,
+        speed=args.speed,
+        seed=args.seed,
+    )
+    start_at = time.time() + 2.0  # lets every process connect before the first event
+    results = multiprocessing.Queue()
+    workers = []
+    for index in range(args.processes):
+        worker_trace = None
+        if trace is not None:
+            worker_trace = [r for r in trace if zlib.crc32(r[1].encode()) % args.processes == index]
+        workers.append(multiprocessing.Process(
+            target=_load_worker,
+            args=(index, settings, nodes[index::args.processes], worker_trace, start_at, results),
+            daemon=True,
+        ))
+    print(f"Run {run_id}: {len(nodes)} virtual node(s), {args.processes} process(es) x "
+          f"{args.connections} connection(s), {args.pattern} arrivals, QoS {args.qos}")
+    for worker in workers:
+        worker.start()
+
+    sent: dict[str, float] = {}
+    errors = 0
+    max_lag = 0.0
+    for _ in workers:
+        result = results.get()
+        sent.update(result["sent"])
+        errors += result["errors"]
+        max_lag = max(max_lag, result["max_lag"])
+    for worker in workers:
+        worker.join()
+    elapsed = max(sent.values(), default=start_at) - start_at
+    print(f"Published {len(sent)} event(s) in {elapsed:.1f}s ({len(sent) / max(elapsed, 1e-9):.1f}/s), "
+          f"{errors} publish error(s), max schedule lag {max_lag * 1000:.0f} ms")
+
+    report = dict(
+        run_id=run_id,
+        config={k: v for k, v in vars(args).items() if k != "json"},
+        published=len(sent),
+        publish_errors=errors,
+        publish_rate=round(len(sent) / elapsed, 2) if elapsed > 0 else None,
+        max_schedule_lag_ms=round(max_lag * 1000, 1),
+    )
+    if subscriber is not None:
+        deadline = time.time() + args.drain
+        while time.time() < deadline and len(subscriber.received.keys() & sent.keys()) < len(sent):
+            time.sleep(0.1)
+        subscriber.stop()
+        latencies = sorted(
+            subscriber.received[cid] - sent_at for cid, sent_at in sent.items() if cid in subscriber.received
+        )
+        report.update(
+            notified=len(latencies),
+            missing=len(sent) - len(latencies),
+            notifications=subscriber.notifications,
+            latency_ms=_latency_summary(latencies),
+            histogram=_histogram(latencies),
+        )
+        _print_latency(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def _load_worker(index: int, settings: dict, nodes: list[str], trace, start_at: float, results):
+    """
+    One publishing process: owns `connections` MQTT clients, with its share of the
+    virtual nodes pinned to them round-robin, and publishes its share of the events.
+    """
+    clients = []
+    for c in range(settings["connections"]):
+        client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2, client_id=f"loadgen-{settings['run_id']}-{index}-{c}",
+        )
+        client.connect(settings["host"], settings["port"], keepalive=60)
+        client.loop_start()
+        clients.append(client)
+    node_client = {node: clients[i % len(clients)] for i, node in enumerate(nodes)}
+    rng = random.Random(None if settings["seed"] is None else settings["seed"] + index)
+
+    sent = []
+    pending = []
+    errors = 0
+    max_lag = 0.0
+    time.sleep(max(0.0, start_at - time.time()))
+    for offset, node, sensor in _arrivals(settings, nodes, trace, rng):
+        delay = start_at + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            max_lag = max(max_lag, -delay)
+        client = node_client.get(node) or clients[zlib.crc32(node.encode()) % len(clients)]
+        correlation_id = f"{settings['run_id']}-{index}-{len(sent) + errors}"
+        now = time.time()
+        payload = {
+            "node": node,
+            "sensor": sensor,
+            "ts": datetime.fromtimestamp(now).isoformat(),
+            "correlation_id": correlation_id,
+        }
+        info = client.publish(f"home/sensor/{node}/{sensor}", json.dumps(payload), qos=settings["qos"])
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            errors += 1
+            continue
+        sent.append((correlation_id, now))
+        if settings["qos"]:
+            pending.append(info)
+
+    for info in pending:
+        try:
+            info.wait_for_publish(timeout=10)
+        except (RuntimeError, ValueError):
+            errors += 1
+    for client in clients:
         client.loop_stop()
         client.disconnect()
+    results.put(dict(sent=sent, errors=errors, max_lag=max_lag))
+
+
+def _arrivals(settings: dict, nodes: list[str], trace, rng: random.Random):
+    """
+    Yields (offset seconds, node, sensor) in time order for one worker.
+    """
+    duration = settings["duration"]
+    sensors = settings["sensors"]
+    if settings["pattern"] == "trace":
+        for t, node, sensor in trace:
+            offset = t / settings["speed"]
+            if duration and offset > duration:
+                return
+            yield offset, node, sensor
+        return
+    rate = settings["rate"]
+    if settings["pattern"] == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            yield t, rng.choice(nodes), rng.choice(sensors)
+            t += rng.expovariate(rate)
+        return
+    # Bursts start as a Poisson process; each is `burst_size` events from neighbouring
+    # nodes within `burst_spread` seconds, like one intruder crossing several rooms
+    size = settings["burst_size"]
+    events = []
+    t = rng.expovariate(rate / size)
+    while t < duration:
+        first = rng.randrange(len(nodes))
+        for i in range(size):
+            events.append((t + rng.uniform(0, settings["burst_spread"]), nodes[(first + i // 2) % len(nodes)],
+                           rng.choice(sensors)))
+        t += rng.expovariate(rate / size)
+    yield from sorted(events)
+
+
+def _load_trace(path: str) -> list[tuple[float, str, str]]:
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            records = [(float(r["t"]), r["node"], r["sensor"]) for r in csv.DictReader(f)]
+        else:
+            records = [(float(r["t"]), r["node"], r["sensor"]) for r in map(json.loads, filter(str.strip, f))]
+    return sorted(records)
+
+
+class LatencySubscriber:
+    """
+    Listens on the hub's /ws/alerts from a background thread and records when each
+    correlation id starting with `prefix` was first notified.
+    """
+    def __init__(self, url: str, prefix: str):
+        self.url = url
+        self.prefix = prefix
+        self.received: dict[str, float] = {}
+        self.notifications = 0
+        self._connected = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._task = None
+        self._thread = threading.Thread(target=self._run, name="ws-subscriber", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        if not self._connected.wait(10):
+            raise SystemExit(f"Could not connect to {self.url}")
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join()
+
+    def _run(self):
+        self._task = self._loop.create_task(self._listen())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Websocket subscriber stopped: {e}")
+
+    async def _listen(self):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            self._connected.set()
+            async for message in ws:
+                received_at = time.time()
+                self.notifications += 1
+                for correlation_id in json.loads(message).get("correlation_ids", []):
+                    if correlation_id.startswith(self.prefix):
+                        self.received.setdefault(correlation_id, received_at)
+
+
+def _latency_summary(sorted_seconds: list[float]) -> dict:
+    if not sorted_seconds:
+        return dict(p50=None, p90=None, p99=None, max=None, mean=None)
+    return dict(
+        p50=round(percentile(sorted_seconds, 50) * 1000, 1),
+        p90=round(percentile(sorted_seconds, 90) * 1000, 1),
+        p99=round(percentile(sorted_seconds, 99) * 1000, 1),
+        max=round(sorted_seconds[-1] * 1000, 1),
+        mean=round(sum(sorted_seconds) / len(sorted_seconds) * 1000, 1),
+    )
+
+
+def _histogram(latencies: list[float]) -> list[dict]:
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for seconds in latencies:
+        ms = seconds * 1000
+        counts[next((i for i, le in enumerate(LATENCY_BUCKETS_MS) if ms <= le), len(LATENCY_BUCKETS_MS))] += 1
+    return [dict(le_ms=le, count=n) for le, n in zip(LATENCY_BUCKETS_MS + [None], counts)]
+
+
+def _print_latency(report: dict):
+    latency = report["latency_ms"]
+    print(f"Notified {report['notified']}/{report['published']} ({report['missing']} missing) "
+          f"in {report['notifications']} notification(s); latency p50 {latency['p50']} ms, "
+          f"p90 {latency['p90']} ms, p99 {latency['p99']} ms, max {latency['max']} ms")
+    widest = max((b["count"] for b in report["histogram"]), default=0) or 1
+    for bucket in report["histogram"]:
+        label = f"<= {bucket['le_ms']} ms" if bucket["le_ms"] is not None else f"> {LATENCY_BUCKETS_MS[-1]} ms"
+        print(f"  {label:>12} {bucket['count']:>7} {'#' * round(40 * bucket['count'] / widest)}")
 
 
 if __name__ == "__main__":
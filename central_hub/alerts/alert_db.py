@@ -1,16 +1,100 @@
+import json
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 
+from core.metrics import LatencyWindow
+from envs import (
+    ALERT_DB_DURABILITY,
+    ALERT_DB_FLUSH_INTERVAL,
+    ALERT_DB_BATCH_SIZE,
+    ALERT_DB_READERS,
+    ALERT_DB_BUSY_RETRY_SECONDS,
+)
+
+# durability mode -> (PRAGMA synchronous, add_alert waits for the commit)
+DURABILITY_MODES = {
+    "full": ("FULL", True),  # every alert is on disk before add_alert returns
+    "normal": ("NORMAL", False),  # group commit; survives app crashes, may lose the last batch on power loss
+    "off": ("OFF", False),  # no fsync at all; fastest, for benchmarks and throwaway hubs
+}
+
+INSERT_ALERT = """
+    INSERT INTO alerts(timestamp, ts, node, sensor, image_path, description, sources, cameras)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Errors that clear up by themselves: another connection holds the lock (e.g. retention)
+TRANSIENT_ERRORS = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
 class AlertStore:
     """
     Manages SQLite storage of alerts.
+
+    The database runs in WAL mode. One writer thread owns the write connection
+    and group-commits queued inserts at most `flush_interval` seconds apart;
+    reads use a small pool of connections and run concurrently with writes.
+
+    A batch that hits a busy or locked database is retried with backoff for up to
+    `busy_retry_seconds`, then fails as a whole. Any other error falls back to
+    inserting the batch row by row, so only the offending alert's future fails.
     """
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        durability: str = ALERT_DB_DURABILITY,
+        flush_interval: float = ALERT_DB_FLUSH_INTERVAL,
+        batch_size: int = ALERT_DB_BATCH_SIZE,
+        readers: int = ALERT_DB_READERS,
+        busy_retry_seconds: float = ALERT_DB_BUSY_RETRY_SECONDS,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
         self.db_path = db_path
+        self.durability = durability
+        # Callers already wait for the commit in "full" mode, so only batch what is queued
+        self.flush_interval = 0.0 if DURABILITY_MODES[durability][1] else flush_interval
+        self.batch_size = batch_size
+        self.busy_retry_seconds = busy_retry_seconds
+
+        self._synchronous, self._wait_for_commit = DURABILITY_MODES[durability]
         self._init_db()
 
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(self._connect(readonly=True))
+
+        self._pending = queue.Queue()
+        self.batches = 0
+        self.rows_written = 0
+        self.busy_retries = 0
+        self.rows_failed = 0
+        self.commit_latency = LatencyWindow()
+        self._writer = threading.Thread(target=self._write_loop, name="alert-db-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(f"PRAGMA synchronous={self._synchronous}")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
     def _init_db(self):
         conn = sqlite3.connect(self.db_path)
+        # Lets retention return freed pages with incremental VACUUM. Setting it only applies to
+        # new files; older ones are converted once with a full VACUUM, before the writer starts,
+        # so nothing else waits on the lock while the file is rewritten
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("[DB] Converting the database to incremental auto-vacuum (one-time full VACUUM)")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode=WAL")
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS alerts (
@@ -19,44 +103,307 @@ class AlertStore:
                 node TEXT,
                 sensor TEXT,
                 image_path TEXT,
-                description TEXT
+                description TEXT,
+                ts INTEGER,
+                sources TEXT,
+                cameras TEXT,
+                clips TEXT
             )
         """
         )
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(alerts)")}
+        if "ts" not in columns:
+            # ts = epoch milliseconds; backfill from the ISO local-time strings of older rows
+            cursor.execute("ALTER TABLE alerts ADD COLUMN ts INTEGER")
+            rows = cursor.execute("SELECT id, timestamp FROM alerts WHERE timestamp IS NOT NULL").fetchall()
+            backfill = []
+            for row_id, timestamp in rows:
+                ts = _parse_ms(timestamp)
+                if ts is not None:
+                    backfill.append((ts, row_id))
+            cursor.executemany("UPDATE alerts SET ts = ? WHERE id = ?", backfill)
+            if len(backfill) < len(rows):
+                print(f"[DB] Left ts unset on {len(rows) - len(backfill)} alert(s) with an unreadable timestamp")
+        if "sources" not in columns:
+            # JSON list of every "node/sensor" that contributed to a coalesced incident
+            cursor.execute("ALTER TABLE alerts ADD COLUMN sources TEXT")
+        if "cameras" not in columns:
+            # JSON list of the cameras whose frames make up the alert image
+            cursor.execute("ALTER TABLE alerts ADD COLUMN cameras TEXT")
+        if "clips" not in columns:
+            # JSON list of pre/post-event clip files, added once each clip is written
+            cursor.execute("ALTER TABLE alerts ADD COLUMN clips TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_node_sensor_ts ON alerts(node, sensor, ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts(ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_image_path ON alerts(image_path)")
+        # Named high-water marks of background consumers (e.g. the alert uploader)
+        cursor.execute("CREATE TABLE IF NOT EXISTS cursors (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
         conn.commit()
         conn.close()
 
-    def add_alert(self, node: str, sensor: str, image_path: str, description: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO alerts(timestamp, node, sensor, image_path, description)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (datetime.now().isoformat(), node, sensor, image_path, description),
+    @contextmanager
+    def _reader(self):
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._pending.get(timeout=remaining))
+                    else:
+                        batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.monotonic()
+            rows = [(params, future) for params, future in batch if params is not None]
+            try:
+                ids = self._insert(conn, [params for params, _ in rows])
+            except Exception as e:
+                if _is_transient(e):
+                    # The retry budget is spent; more attempts per row would only stall the writer
+                    print(f"[DB] Failed to write {len(rows)} alert(s), database busy: {e}")
+                    ids = self._fail(rows, e)
+                else:
+                    # One bad row must not fail the alerts that happened to share its batch
+                    print(f"[DB] Failed to write {len(rows)} alert(s) ({e}), retrying them one by one")
+                    ids = self._insert_each(conn, rows)
+            self.commit_latency.add(time.monotonic() - started)
+            self.batches += 1
+            self.rows_written += sum(row_id is not None for row_id in ids)
+            for (_, future), row_id in zip(rows, ids):
+                if row_id is not None:
+                    future.set_result(row_id)
+            for params, future in batch:
+                if params is None:
+                    future.set_result(None)
+
+    def _insert_each(self, conn: sqlite3.Connection, rows: list[tuple]) -> list[int | None]:
+        """
+        Inserts the rows one transaction each; failed rows get None and their future the error.
+        """
+        ids = []
+        for i, (params, future) in enumerate(rows):
+            try:
+                ids.append(self._insert(conn, [params])[0])
+            except Exception as e:
+                if _is_transient(e):
+                    print(f"[DB] Failed to write {len(rows) - i} alert(s), database busy: {e}")
+                    return ids + self._fail(rows[i:], e)
+                print(f"[DB] Failed to write alert from {params[2]}/{params[3]}: {e}")
+                ids += self._fail([(params, future)], e)
+        return ids
+
+    def _fail(self, rows: list[tuple], error: Exception) -> list[None]:
+        self.rows_failed += len(rows)
+        for _, future in rows:
+            future.set_exception(error)
+        return [None] * len(rows)
+
+    def _insert(self, conn: sqlite3.Connection, rows: list[tuple]) -> list[int]:
+        """
+        Inserts the rows in one transaction and returns their ids, retrying while the
+        database is busy or locked.
+        """
+        deadline = time.monotonic() + self.busy_retry_seconds
+        delay = 0.05
+        while True:
+            try:
+                with conn:
+                    return [conn.execute(INSERT_ALERT, params).lastrowid for params in rows]
+            except sqlite3.OperationalError as e:
+                if not _is_transient(e) or time.monotonic() + delay > deadline:
+                    raise
+                self.busy_retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+    def add_alert(
+        self,
+        node: str,
+        sensor: str,
+        image_path: str,
+        description: str,
+        sources: list[str] | None = None,
+        cameras: list[str] | None = None,
+    ) -> Future:
+        """
+        Queues an alert for the writer thread. Returns a Future resolving to the new row id;
+        in "full" durability mode it has already resolved when this returns.
+        `sources` lists every "node/sensor" merged into the incident (default: just this one),
+        `cameras` the cameras whose frames were captured for it.
+        """
+        future = Future()
+        now = time.time()
+        sources = json.dumps(sources or [f"{node}/{sensor}"])
+        cameras = json.dumps(cameras) if cameras is not None else None
+        self._pending.put(
+            (
+                (datetime.fromtimestamp(now).isoformat(), int(now * 1000), node, sensor, image_path, description, sources,
+                 cameras),
+                future,
+            )
         )
-        conn.commit()
-        conn.close()
+        if self._wait_for_commit:
+            future.result()
+        return future
+
+    def add_clip(self, alert_id: int, path: str):
+        """
+        Links a clip file to an alert. Clips finish after their alert is stored, once
+        the post-event footage is in.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE alerts SET clips = json_insert(COALESCE(clips, '[]'), '$[#]', ?) WHERE id = ?",
+                    (path, alert_id),
+                )
+        finally:
+            conn.close()
+
+    def flush(self):
+        """
+        Blocks until every alert queued before this call is committed.
+        """
+        future = Future()
+        self._pending.put((None, future))
+        future.result()
 
     def get_alerts(self, limit: int = 20):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, timestamp, node, sensor, image_path, description"
-            " FROM alerts ORDER BY id DESC LIMIT ?",
-            (limit,),
+        alerts, _ = self.query_alerts(limit=limit)
+        return alerts
+
+    def query_alerts(
+        self,
+        node: str | None = None,
+        sensor: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+        cursor: str | None = None,
+        limit: int = 20,
+    ) -> tuple[list[dict], str | None]:
+        """
+        Newest-first alerts, optionally filtered by node, sensor and a (since, until]
+        range of epoch-millisecond timestamps.
+
+        Pagination is keyset-based: pass the returned cursor to get the next (older)
+        page. The cursor is None once there are no more rows.
+        """
+        clauses, params = [], []
+        if node is not None:
+            clauses.append("node = ?")
+            params.append(node)
+        if sensor is not None:
+            clauses.append("sensor = ?")
+            params.append(sensor)
+        if since is not None:
+            clauses.append("ts > ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        if cursor is not None:
+            clauses.append("(ts, id) < (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, timestamp, ts, node, sensor, image_path, description, sources, cameras, clips"
+                f" FROM alerts{where} ORDER BY ts DESC, id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        alerts = [_alert_dict(row) for row in rows]
+        next_cursor = f"{rows[-1][2]}:{rows[-1][0]}" if len(rows) == limit else None
+        return alerts, next_cursor
+
+    def alerts_after(self, after_id: int, limit: int = 100) -> list[dict]:
+        """
+        Oldest-first alerts with an id greater than `after_id`, for consumers that
+        walk the table with a high-water mark.
+        """
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, timestamp, ts, node, sensor, image_path, description, sources, cameras, clips"
+                " FROM alerts WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+        return [_alert_dict(row) for row in rows]
+
+    def last_alert_id(self) -> int:
+        with self._reader() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM alerts").fetchone()[0]
+
+    def get_cursor(self, name: str) -> int:
+        with self._reader() as conn:
+            row = conn.execute("SELECT value FROM cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_cursor(self, name: str, value: int):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO cursors(name, value) VALUES (?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                    (name, value),
+                )
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        return dict(
+            durability=self.durability,
+            queued=self._pending.qsize(),
+            batches=self.batches,
+            rows_written=self.rows_written,
+            avg_batch=round(self.rows_written / self.batches, 1) if self.batches else None,
+            busy_retries=self.busy_retries,
+            rows_failed=self.rows_failed,
+            commit=self.commit_latency.snapshot(),
         )
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            dict(
-                id=row[0],
-                timestamp=row[1],
-                node=row[2],
-                sensor=row[3],
-                image_path=row[4],
-                description=row[5],
-            )
-            for row in rows
-        ]
+
+
+def _is_transient(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and error.sqlite_errorcode & 0xFF in TRANSIENT_ERRORS
+
+
+def _alert_dict(row: tuple) -> dict:
+    return dict(
+        id=row[0],
+        timestamp=row[1],
+        ts=row[2],
+        node=row[3],
+        sensor=row[4],
+        image_path=row[5],
+        description=row[6],
+        sources=json.loads(row[7]) if row[7] else [f"{row[3]}/{row[4]}"],
+        cameras=json.loads(row[8]) if row[8] else [],
+        clips=json.loads(row[9]) if row[9] else [],
+    )
+
+
+def _parse_ms(timestamp) -> int | None:
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        ts, row_id = cursor.split(":")
+        return int(ts), int(row_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+
+from alerts.alert_db import AlertStore
+from core.image_store import content_hash, is_full_image
+from core.metrics import LatencyWindow
+from envs import CENTRAL_API_URL, ALERT_UPLOAD_BATCH_SIZE, ALERT_UPLOAD_INTERVAL, ALERT_UPLOAD_MAX_BACKOFF
+
+CURSOR_NAME = "central_upload"
+
+
+class AlertUploader:
+    """
+    Store-and-forward of local alerts to the central API.
+
+    Walks the AlertStore in id order from a high-water mark kept in the alert
+    database, and POSTs gzip-compressed batches to /hub/{hub_id}/alerts. Images are
+    referenced by SHA-256; the ones the central API does not have yet are PUT to
+    /images/{sha256} afterwards. The mark only advances once a batch and its images
+    are accepted, so after a failure or restart the same batch is sent again. That
+    is safe because the central API ignores alert ids it already stored for this hub.
+    While the API is unreachable alerts stay queued in SQLite and retries back off
+    exponentially, with jitter, up to `max_backoff` seconds.
+    """
+    def __init__(
+        self,
+        store: AlertStore,
+        hub_id: int,
+        base_url: str = CENTRAL_API_URL,
+        batch_size: int = ALERT_UPLOAD_BATCH_SIZE,
+        interval: float = ALERT_UPLOAD_INTERVAL,
+        max_backoff: float = ALERT_UPLOAD_MAX_BACKOFF,
+    ):
+        self.store = store
+        self.hub_id = hub_id
+        self.base_url = base_url
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.high_water_mark = store.get_cursor(CURSOR_NAME)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.batches = 0
+        self.uploaded = 0
+        self.duplicates = 0
+        self.images_uploaded = 0
+        self.bytes_sent = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        self.batch_latency = LatencyWindow()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-uploader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                sent = self.upload_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                self.failures += 1
+                self.last_error = str(e)
+                delay = random.uniform(0, min(self.max_backoff, self.interval * 2 ** failures))
+                print(f"[UPLOAD] Upload failed ({e}), retrying in {delay:.1f}s")
+                self._stop.wait(delay)
+                continue
+            if sent < self.batch_size:
+                self._stop.wait(self.interval)  # caught up; otherwise keep draining
+
+    def upload_once(self) -> int:
+        """
+        Sends the next batch after the high-water mark. Returns the number of alerts sent.
+        """
+        alerts = self.store.alerts_after(self.high_water_mark, self.batch_size)
+        if not alerts:
+            return 0
+        started = time.monotonic()
+        images = {}  # sha256 -> path
+        payload = []
+        for alert in alerts:
+            sha256 = None
+            path = alert["image_path"]
+            if path and is_full_image(path) and os.path.exists(path):
+                sha256 = content_hash(path)  # the file name is the hash of its bytes
+            else:
+                data = _read_image(path)
+                if data is not None:
+                    sha256 = hashlib.sha256(data).hexdigest()
+            if sha256 is not None:
+                images[sha256] = path
+            payload.append(dict(
+                id=alert["id"],
+                ts=alert["ts"],
+                node=alert["node"],
+                sensor=alert["sensor"],
+                description=alert["description"],
+                sources=alert["sources"],
+                image_sha256=sha256,
+            ))
+
+        body = gzip.compress(json.dumps({"alerts": payload}).encode(), compresslevel=6)
+        resp = self.session.post(
+            f"{self.base_url}/hub/{self.hub_id}/alerts/",
+            data=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        result = resp.json()
+        self.bytes_sent += len(body)
+
+        for sha256 in result["missing_images"]:
+            data = _read_image(images.get(sha256))
+            if data is None:
+                continue  # deleted since the batch was built; the alert keeps the hash
+            self.session.put(
+                f"{self.base_url}/images/{sha256}",
+                data=data,
+                headers={"Content-Type": "image/jpeg"},
+                timeout=60,
+            ).raise_for_status()
+            self.images_uploaded += 1
+            self.bytes_sent += len(data)
+
+        self.high_water_mark = alerts[-1]["id"]
+        self.store.set_cursor(CURSOR_NAME, self.high_water_mark)
+        self.batches += 1
+        self.uploaded += result["accepted"]
+        self.duplicates += result["duplicates"]
+        self.batch_latency.add(time.monotonic() - started)
+        return len(alerts)
+
+    def stats(self) -> dict:
+        return dict(
+            high_water_mark=self.high_water_mark,
+            backlog=max(0, self.store.last_alert_id() - self.high_water_mark),
+            batches=self.batches,
+            uploaded=self.uploaded,
+            duplicates=self.duplicates,
+            images_uploaded=self.images_uploaded,
+            bytes_sent=self.bytes_sent,
+            failures=self.failures,
+            last_error=self.last_error,
+            batch=self.batch_latency.snapshot(),
+        )
+
+
+def _read_image(path: str | None) -> bytes | None:
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
@@ -0,0 +1,69 @@
+import threading
+
+from envs import COALESCE_WINDOW
+
+
+class EventCoalescer:
+    """
+    Merges sensor events that arrive close together into a single incident.
+
+    The first event opens a window of `window` seconds and is emitted at once, so the
+    frame is captured at the event's time and the window adds no latency. Every event
+    received while the incident is open (rising/falling edges, other sensors and nodes
+    seeing the same thing) is merged into the emitted job instead of triggering its own
+    capture and analysis. The job carries `sources` (unique "node/sensor" pairs in
+    arrival order), `events` (number of merged messages) and `correlation_ids` (the
+    "correlation_id" of each merged event that carried one, so load generators can
+    match notifications to what they published).
+
+    The incident closes when the window ends or when `seal(job)` is called (before the
+    alert is stored), whichever comes first; later events open a new incident. Read
+    those fields only after sealing. A window of 0 disables coalescing.
+    """
+    def __init__(self, emit, window: float = COALESCE_WINDOW):
+        self.emit = emit
+        self.window = window
+        self._incident: dict | None = None
+        self._lock = threading.Lock()
+        self.events = 0
+        self.incidents = 0
+
+    def add(self, job: dict):
+        source = f"{job['node']}/{job['sensor']}"
+        correlation_id = job["event"].get("correlation_id")
+        with self._lock:
+            self.events += 1
+            if self._incident is not None:
+                if source not in self._incident["sources"]:
+                    self._incident["sources"].append(source)
+                self._incident["events"] += 1
+                if correlation_id is not None:
+                    self._incident["correlation_ids"].append(correlation_id)
+                return
+            job["sources"] = [source]
+            job["events"] = 1
+            job["correlation_ids"] = [correlation_id] if correlation_id is not None else []
+            self.incidents += 1
+            if self.window > 0:
+                self._incident = job
+                timer = threading.Timer(self.window, self.seal, args=(job,))
+                timer.daemon = True
+                timer.start()
+        self.emit(job)
+
+    def seal(self, job: dict):
+        """
+        Stops merging events into `job`, if it is still the open incident.
+        """
+        with self._lock:
+            if self._incident is job:
+                self._incident = None
+
+    def stats(self) -> dict:
+        return dict(
+            window=self.window,
+            events=self.events,
+            incidents=self.incidents,
+            open=self._incident is not None,
+            events_per_incident=round(self.events / self.incidents, 2) if self.incidents else None,
+        )
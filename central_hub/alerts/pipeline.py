@@ -0,0 +1,344 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from alerts.alert_db import AlertStore
+from alerts.coalescer import EventCoalescer
+from core.ai_analyzer import AIAnalyzer
+from core.camera_registry import CameraRegistry, mosaic
+from core.metrics import LatencyWindow
+from core.motion_filter import MotionFilter, NO_CHANGE_DESCRIPTION
+from core.result_cache import ResultCache
+from envs import PIPELINE_STAGES
+
+BLOCK = "block"
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+
+# Sensor timestamps further than this from the hub clock (e.g. nodes without NTP) are ignored
+MAX_EVENT_CLOCK_SKEW = 5.0
+
+
+class Stage:
+    """
+    A bounded queue drained by a pool of worker threads.
+
+    `handler(job)` returns the job for the downstream stage, or None to stop
+    processing it. When the queue is full the overflow policy decides what happens:
+      - block:       wait up to `block_timeout` seconds for room (backpressure), then drop
+      - drop_newest: reject the incoming job
+      - drop_oldest: evict the oldest queued job to make room
+    """
+    def __init__(
+        self,
+        name: str,
+        handler,
+        workers: int = 1,
+        depth: int = 64,
+        policy: str = BLOCK,
+        block_timeout: float | None = None,
+    ):
+        if policy not in (BLOCK, DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=depth)
+        self.next: Stage | None = None
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0
+        self.wait_latency = LatencyWindow()
+        self.service_latency = LatencyWindow()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def submit(self, job) -> bool:
+        """
+        Enqueue a job according to the overflow policy. Returns False if it was dropped.
+        """
+        item = (time.monotonic(), job)
+        with self._lock:
+            self.submitted += 1
+        try:
+            if self.policy == BLOCK:
+                self.queue.put(item, timeout=self.block_timeout)
+            elif self.policy == DROP_NEWEST:
+                self.queue.put_nowait(item)
+            else:
+                while True:
+                    try:
+                        self.queue.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                            self.queue.task_done()
+                            self._count_drop()
+                        except queue.Empty:
+                            pass
+        except queue.Full:
+            self._count_drop()
+            return False
+        return True
+
+    def _count_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            enqueued_at, job = item
+            started = time.monotonic()
+            self.wait_latency.add(started - enqueued_at)
+            with self._lock:
+                self.busy += 1
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                result = None
+                with self._lock:
+                    self.errors += 1
+                print(f"[PIPELINE] {self.name} failed: {e}")
+            finally:
+                self.service_latency.add(time.monotonic() - started)
+                with self._lock:
+                    self.busy -= 1
+                    self.processed += 1
+                self.queue.task_done()
+            if result is not None and self.next is not None:
+                self.next.submit(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(
+                submitted=self.submitted,
+                processed=self.processed,
+                dropped=self.dropped,
+                errors=self.errors,
+                busy=self.busy,
+            )
+        return dict(
+            workers=self.workers,
+            policy=self.policy,
+            depth=self.queue.qsize(),
+            max_depth=self.queue.maxsize,
+            **counters,
+            wait=self.wait_latency.snapshot(),
+            service=self.service_latency.snapshot(),
+        )
+
+
+class AlertPipeline:
+    """
+    Processes sensor events off the MQTT network thread:
+    ingest -> [coalesce] -> capture -> analyze -> persist -> notify.
+    Each stage has its own bounded queue and worker pool (see envs.PIPELINE_STAGES);
+    events within the coalescing window are merged into the incident opened by the
+    first one, which is captured right away.
+    An incident seen by several cameras is captured from all of them in parallel and
+    stored and analyzed as one labelled mosaic. Each camera's pre/post-event clip is
+    linked to the alert row when it has been written.
+    """
+    def __init__(
+        self,
+        store: AlertStore,
+        cameras: CameraRegistry,
+        analyzer: AIAnalyzer,
+        app,
+        cache: ResultCache | None = None,
+        motion_filter: MotionFilter | None = None,
+        stages: dict = PIPELINE_STAGES,
+    ):
+        self.store = store
+        self.cameras = cameras
+        self.analyzer = analyzer
+        self.cache = cache
+        self.motion_filter = motion_filter
+        self.app = app  # FastAPI instance for sensor flags and websocket notifications
+        self.end_to_end_latency = LatencyWindow()
+
+        handlers = [
+            ("ingest", self._ingest),
+            ("capture", self._capture),
+            ("analyze", self._analyze),
+            ("persist", self._persist),
+            ("notify", self._notify),
+        ]
+        self.stages = [Stage(name, handler, **stages[name]) for name, handler in handlers]
+        for stage, downstream in zip(self.stages[1:], self.stages[2:]):
+            stage.next = downstream
+        # Ingest hands events to the coalescer, which submits whole incidents to capture
+        self.coalescer = EventCoalescer(emit=self.stages[1].submit)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def submit(self, topic: str, payload: bytes) -> bool:
+        """
+        Called from the MQTT network thread; never blocks unless the ingest policy is "block".
+        """
+        return self.stages[0].submit(
+            dict(topic=topic, payload=payload, received_at=time.monotonic(), received_ts=time.time())
+        )
+
+    def _ingest(self, job: dict) -> dict | None:
+        topic_parts = job["topic"].split("/")
+        node = topic_parts[2]
+        sensor = topic_parts[3]
+        job["event"] = json.loads(job["payload"].decode())
+
+        # Check flag
+        key = f"{node}/{sensor}"
+        if not self.app.state.sensor_flags.get(key, True):
+            print(f"[MQTT] Skipping alert for disabled sensor {key}")
+            return None
+
+        # Only process if motion==True
+        # if not job["event"].get("motion", False):
+        #    return None
+
+        job["node"] = node
+        job["sensor"] = sensor
+        job["event_ts"] = _event_time(job["event"], job["received_ts"])
+        self.coalescer.add(job)
+        return None
+
+    def _capture(self, job: dict) -> dict:
+        # From every camera covering the incident, pick the buffered frame closest to when
+        # the sensor fired, not when we got here
+        captured = self.cameras.capture(self.cameras.cameras_for(job["sources"]), job["event_ts"])
+        if not captured:
+            raise RuntimeError("Camera capture failed")
+        camera, (_, ts, _) = captured[0]
+        job["cameras"] = [camera.name for camera, _ in captured]
+        job["frames"] = [(camera.name, frame) for camera, (_, _, frame) in captured]
+        job["frame"] = mosaic(job["frames"])
+        # Analysis gets an in-memory JPEG; the full-size capture is stored in the background
+        # and only awaited by persist, after the vision round-trip
+        job["image"] = camera.encode(job["frame"], ts)
+        job["image_future"] = camera.save_async(job["frame"])
+        job["clips"] = self.cameras.record_clips(job["cameras"], job["event_ts"])
+        return job
+
+    def _analyze(self, job: dict) -> dict:
+        frame = job.pop("frame")  # not needed downstream; don't hold it in later queues
+        frames = job.pop("frames")
+        image = job.pop("image")
+        if self.motion_filter is not None:
+            # Check every camera, so each one's background keeps up even when another changed
+            changed = [self.motion_filter.has_changed(camera_frame, key=name) for name, camera_frame in frames]
+            if not any(changed):
+                # False trigger: nothing moved versus the baseline, skip the network round-trip
+                job["description"] = NO_CHANGE_DESCRIPTION
+                return job
+        key = None
+        if self.cache is not None:
+            key = self.cache.hash(frame)
+            cached = self.cache.lookup(key)
+            if cached is not None:
+                job["description"] = cached
+                return job
+        try:
+            job["description"] = self.analyzer.analyze(image)
+        except Exception as e:
+            # Keep the alert (and its image) even when the vision API is unavailable
+            print(f"[PIPELINE] Analysis failed: {e}")
+            job["description"] = f"Analysis unavailable: {e}"
+            return job
+        if key is not None:
+            self.cache.store(key, job["description"])
+        return job
+
+    def _persist(self, job: dict) -> dict:
+        # Events arriving from here on start a new incident; sources are final now
+        self.coalescer.seal(job)
+        job["image_path"] = job.pop("image_future").result()
+        # Group-committed by the store's writer thread; notify waits for the row id
+        job["alert_id"] = self.store.add_alert(
+            job["node"], job["sensor"], job["image_path"], job["description"],
+            sources=job["sources"], cameras=job["cameras"],
+        )
+        for clip in job.pop("clips"):
+            clip.add_done_callback(lambda clip, alert_id=job["alert_id"]: self._link_clip(alert_id, clip))
+        return job
+
+    def _link_clip(self, alert_id: Future, clip: Future):
+        """
+        Runs on the clip writer thread once the clip (post-event footage included) is on disk.
+        """
+        if clip.exception() is None and clip.result() is not None:
+            self.store.add_clip(alert_id.result(), clip.result())
+
+    def _notify(self, job: dict) -> None:
+        alert = {
+            "id": job["alert_id"].result(),
+            "timestamp": datetime.now().isoformat(),
+            "node": job["node"],
+            "sensor": job["sensor"],
+            "image_path": job["image_path"],
+            "thumbnails": self.cameras.images.thumbnails(job["image_path"]),
+            "description": job["description"],
+            "sources": job["sources"],
+            "cameras": job["cameras"],
+            "correlation_ids": job["correlation_ids"],
+        }
+        # Hands off to the server's event loop; never blocks on slow clients
+        self.app.state.ws_broadcaster.publish(alert)
+        self.end_to_end_latency.add(time.monotonic() - job["received_at"])
+        return None
+
+    def stats(self) -> dict:
+        """
+        Per-stage queue depth, counters and wait/service latency, plus end-to-end latency.
+        """
+        return dict(
+            stages={stage.name: stage.stats() for stage in self.stages},
+            coalescer=self.coalescer.stats(),
+            end_to_end=self.end_to_end_latency.snapshot(),
+        )
+
+
+def _event_time(event: dict, received_ts: float) -> float:
+    """
+    Returns the sensor's own timestamp ("ts": epoch seconds or ISO string) when it
+    is plausible, otherwise the time the hub received the message.
+    """
+    ts = event.get("ts")
+    try:
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts).timestamp()
+        ts = float(ts)
+    except (TypeError, ValueError):
+        return received_ts
+    return ts if abs(ts - received_ts) <= MAX_EVENT_CLOCK_SKEW else received_ts
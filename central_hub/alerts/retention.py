@@ -0,0 +1,361 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import cv2
+
+from alerts.alert_db import AlertStore
+from core.image_store import ImageStore, content_hash, is_full_image
+from envs import (
+    RETENTION_DAYS,
+    RETENTION_RULES,
+    RETENTION_FULL_RES_DAYS,
+    RETENTION_THUMBNAIL_WIDTH,
+    RETENTION_THUMBNAIL_QUALITY,
+    RETENTION_INTERVAL,
+)
+
+THUMBNAIL_CURSOR = "retention_thumbnails"
+DAY_MS = 86_400_000
+CHUNK = 500
+# Images touched this many seconds before a run (new or deduplicated captures whose alert
+# may still be queued in the AlertStore writer) are never deleted by that run
+IN_USE_GRACE = 300
+
+
+class RetentionManager:
+    """
+    Bounds the alert database and the image directory.
+
+    Each run, from a background thread every `interval` seconds:
+    - deletes alerts past their retention, in short transactions of CHUNK rows,
+      together with their images and clips. Retention is RETENTION_DAYS unless a rule in
+      `rules` matches "node/sensor", "node/*" or "*/sensor" (checked in that order);
+      0 days keeps alerts forever;
+    - keeps only a thumbnail of images older than `full_res_days`;
+    - removes orphaned image and clip files older than every retention;
+    - compacts the database with incremental VACUUM and truncates the WAL.
+    The report of rows and bytes reclaimed is printed and kept for /stats.
+
+    Alerts after the `protect_cursor` high-water mark (e.g. not yet uploaded to the
+    central API) are never deleted.
+    """
+    def __init__(
+        self,
+        store: AlertStore,
+        images: ImageStore,
+        days: float = RETENTION_DAYS,
+        rules: dict[str, float] = RETENTION_RULES,
+        full_res_days: float = RETENTION_FULL_RES_DAYS,
+        thumbnail_width: int = RETENTION_THUMBNAIL_WIDTH,
+        thumbnail_quality: int = RETENTION_THUMBNAIL_QUALITY,
+        interval: float = RETENTION_INTERVAL,
+        protect_cursor: str | None = None,
+        clip_dir: str | None = None,
+    ):
+        self.store = store
+        self.images = images
+        self.image_dir = images.root
+        self.clip_dir = clip_dir
+        self.days = days
+        self.rules = rules
+        self.full_res_days = full_res_days
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+        self.interval = interval
+        self.protect_cursor = protect_cursor
+        self._stop = threading.Event()
+        self._in_use_after = 0.0
+        self._thread: threading.Thread | None = None
+        self.runs = 0
+        self.last_report: dict | None = None
+        self.totals = dict(rows_deleted=0, images_deleted=0, image_bytes_reclaimed=0, clips_deleted=0,
+                           clip_bytes_reclaimed=0, db_bytes_reclaimed=0)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[RETENTION] Run failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.store.db_path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _retention_days(self, node: str, sensor: str) -> float:
+        for key in (f"{node}/{sensor}", f"{node}/*", f"*/{sensor}"):
+            if key in self.rules:
+                return self.rules[key]
+        return self.days
+
+    def run_once(self) -> dict:
+        started = time.monotonic()
+        self._in_use_after = time.time() - IN_USE_GRACE
+        now_ms = int(time.time() * 1000)
+        report = dict(rows_deleted=0, images_deleted=0, image_bytes_reclaimed=0,
+                      thumbnails=0, thumbnail_bytes_reclaimed=0, clips_deleted=0, clip_bytes_reclaimed=0,
+                      dirs_deleted=0)
+        db_bytes_before = self._db_bytes()
+        conn = self._connect()
+        try:
+            self._expire_alerts(conn, now_ms, report)
+            self._downsample_images(conn, now_ms, report)
+            self._remove_orphans(conn, report)
+            report["vacuum"] = self._compact(conn)
+        finally:
+            conn.close()
+        report["db_bytes_reclaimed"] = max(0, db_bytes_before - self._db_bytes())
+        report["seconds"] = round(time.monotonic() - started, 2)
+
+        self.runs += 1
+        self.last_report = report
+        for key in self.totals:
+            self.totals[key] += report[key]
+        print(
+            f"[RETENTION] Deleted {report['rows_deleted']} alert(s), {report['images_deleted']} image(s) "
+            f"and {report['clips_deleted']} clip(s), downsampled {report['thumbnails']} image(s); reclaimed "
+            f"{report['image_bytes_reclaimed'] + report['thumbnail_bytes_reclaimed']} image bytes, "
+            f"{report['clip_bytes_reclaimed']} clip bytes "
+            f"and {report['db_bytes_reclaimed']} database bytes in {report['seconds']}s"
+        )
+        return report
+
+    def _expire_alerts(self, conn: sqlite3.Connection, now_ms: int, report: dict):
+        """
+        Keyset scan, oldest first, over alerts older than the shortest retention;
+        each row is then checked against its own node/sensor retention.
+        """
+        retentions = [d for d in (self.days, *self.rules.values()) if d > 0]
+        if not retentions:
+            return
+        oldest_cutoff = now_ms - int(min(retentions) * DAY_MS)
+        max_id = self.store.get_cursor(self.protect_cursor) if self.protect_cursor else None
+        after = (-1, -1)
+        while not self._stop.is_set():
+            rows = conn.execute(
+                "SELECT id, ts, node, sensor, image_path, clips FROM alerts"
+                " WHERE ts < ? AND (ts, id) > (?, ?) ORDER BY ts, id LIMIT ?",
+                (oldest_cutoff, *after, CHUNK),
+            ).fetchall()
+            if not rows:
+                return
+            after = (rows[-1][1], rows[-1][0])
+            expired, clips = [], []
+            for row_id, ts, node, sensor, image_path, clip_paths in rows:
+                days = self._retention_days(node, sensor)
+                if days > 0 and ts < now_ms - days * DAY_MS and (max_id is None or row_id <= max_id):
+                    expired.append((row_id, image_path))
+                    clips += json.loads(clip_paths) if clip_paths else []
+            if not expired:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM alerts WHERE id = ?", [(row_id,) for row_id, _ in expired])
+                # Images are deduplicated: only delete the ones no remaining alert points at
+                unused = [
+                    path for path in {path for _, path in expired if path}
+                    if not self._referenced(conn, path) and not self._recently_used(path)
+                ]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            report["rows_deleted"] += len(expired)
+            for path in unused:
+                self._remove_image(path, report)
+            for path in clips:
+                self._remove_clip(path, report)
+
+    def _remove_clip(self, path: str, report: dict):
+        size = _remove_file(path)
+        if size is not None:
+            report["clips_deleted"] += 1
+            report["clip_bytes_reclaimed"] += size
+
+    def _referenced(self, conn: sqlite3.Connection, path: str) -> bool:
+        variants = self.images.variants(path)
+        return conn.execute(
+            f"SELECT 1 FROM alerts WHERE image_path IN ({','.join('?' * len(variants))}) LIMIT 1",
+            variants,
+        ).fetchone() is not None
+
+    def _recently_used(self, path: str) -> bool:
+        """
+        Whether any file of the image was written or deduplicated onto since `_in_use_after`.
+        """
+        for variant in self.images.variants(path):
+            try:
+                if os.path.getmtime(variant) >= self._in_use_after:
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def _remove_image(self, path: str, report: dict):
+        removed = False
+        for variant in self.images.variants(path):
+            size = _remove_file(variant)
+            if size is not None:
+                removed = True
+                report["image_bytes_reclaimed"] += size
+        report["images_deleted"] += removed
+
+    def _downsample_images(self, conn: sqlite3.Connection, now_ms: int, report: dict):
+        """
+        Drops the full resolution of images whose alerts crossed `full_res_days` since
+        the last run. Content-addressed images are immutable, so those alerts are
+        repointed at the largest pre-generated thumbnail. The full file is deleted once
+        no alert references it; a deduplicated image shared with newer alerts stays
+        until they cross too. Older captures outside the store are resized in place.
+        """
+        if self.full_res_days <= 0:
+            return
+        cutoff = now_ms - int(self.full_res_days * DAY_MS)
+        since = self.store.get_cursor(THUMBNAIL_CURSOR)
+        rows = conn.execute(
+            "SELECT DISTINCT image_path FROM alerts WHERE ts > ? AND ts <= ? AND image_path IS NOT NULL",
+            (since, cutoff),
+        ).fetchall()
+        for (path,) in rows:
+            if self._stop.is_set():
+                return
+            if is_full_image(path):
+                saved = self._drop_full_resolution(conn, path, cutoff)
+            elif content_hash(path) is None:
+                saved = self._downsample(path)
+            else:
+                continue  # already a thumbnail, which is never rewritten
+            if saved is not None:
+                report["thumbnails"] += 1
+                report["thumbnail_bytes_reclaimed"] += saved
+        self.store.set_cursor(THUMBNAIL_CURSOR, cutoff)
+
+    def _drop_full_resolution(self, conn: sqlite3.Connection, path: str, cutoff: int) -> int | None:
+        thumbnail = self.images.largest_thumbnail(path)
+        if thumbnail is None or not os.path.exists(thumbnail):
+            return None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE alerts SET image_path = ? WHERE image_path = ? AND ts <= ?", (thumbnail, path, cutoff),
+            )
+            # Only the full file itself: the alerts just repointed reference its thumbnail
+            in_use = conn.execute("SELECT 1 FROM alerts WHERE image_path = ? LIMIT 1", (path,)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return None if in_use or self._recently_used(path) else _remove_file(path)
+
+    def _downsample(self, path: str) -> int | None:
+        image = cv2.imread(path)
+        if image is None or image.shape[1] <= self.thumbnail_width:
+            return None
+        height = round(image.shape[0] * self.thumbnail_width / image.shape[1])
+        small = cv2.resize(image, (self.thumbnail_width, height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+        if not ok:
+            return None
+        before = os.path.getsize(path)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp, path)
+        return before - len(encoded)
+
+    def _remove_orphans(self, conn: sqlite3.Connection, report: dict):
+        """
+        Deletes image and clip files older than every retention that no alert points at
+        (their alert was never written), then any directories left empty.
+        """
+        if self.days <= 0 or any(d <= 0 for d in self.rules.values()):
+            return
+        cutoff = time.time() - (max([self.days, *self.rules.values()]) + 1) * 86400
+        self._remove_orphan_images(conn, cutoff, report)
+        if self.clip_dir is not None:
+            self._remove_orphan_clips(conn, cutoff, report)
+
+    def _remove_orphan_images(self, conn: sqlite3.Connection, cutoff: float, report: dict):
+        for dirpath, dirnames, filenames in os.walk(self.image_dir, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                if not self._referenced(conn, path):
+                    self._remove_image(path, report)
+            if dirpath != self.image_dir and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+                report["dirs_deleted"] += 1
+
+    def _remove_orphan_clips(self, conn: sqlite3.Connection, cutoff: float, report: dict):
+        for dirpath, dirnames, filenames in os.walk(self.clip_dir, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                # Clips are rare and mostly deleted with their alerts, so a scan per old file is fine
+                referenced = conn.execute(
+                    "SELECT 1 FROM alerts WHERE instr(clips, ?) LIMIT 1", (json.dumps(path),),
+                ).fetchone()
+                if not referenced:
+                    self._remove_clip(path, report)
+            if dirpath != self.clip_dir and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+                report["dirs_deleted"] += 1
+
+    def _compact(self, conn: sqlite3.Connection) -> str | None:
+        """
+        Returns freed pages to the filesystem with incremental VACUUM. A full VACUUM
+        would hold the write lock for as long as it takes to rewrite the file while
+        alerts keep arriving, so databases not yet in incremental mode are converted
+        by AlertStore at startup instead.
+        """
+        if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return None
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return None
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return "incremental"
+
+    def _db_bytes(self) -> int:
+        return sum(
+            os.path.getsize(path)
+            for path in (self.store.db_path, f"{self.store.db_path}-wal")
+            if os.path.exists(path)
+        )
+
+    def stats(self) -> dict:
+        return dict(runs=self.runs, last=self.last_report, totals=self.totals)
+
+
+def _remove_file(path: str) -> int | None:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return None
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import uvicorn
+
+
+class BackgroundServer:
+    """
+    Serves an ASGI app with uvicorn on a background thread. Port 0 picks a free port.
+    """
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+        self._thread: threading.Thread | None = None
+        self.port = port
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.run, name="background-server", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+
+    def stop(self):
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,87 @@
+import glob
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from core.camera_capture import CameraCapture
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FakeCamera(CameraCapture):
+    """
+    A CameraCapture that replays image files instead of opening a device.
+
+    Frames from `paths` (files or directories of images) are decoded once and
+    pushed into the ring buffer in a loop at `fps`, so the alert path sees the
+    same producer as with a real camera. Without paths, `synthetic` generated
+    frames of `size` (width, height) are used.
+    """
+    def __init__(
+        self,
+        paths: list[str] | None = None,
+        fps: float = 15.0,
+        size: tuple[int, int] = (1280, 720),
+        synthetic: int = 8,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.paths = paths or []
+        self.fps = fps
+        self.size = size
+        self.synthetic = synthetic
+
+    def load_frames(self) -> list[np.ndarray]:
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                files += sorted(
+                    f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTENSIONS)
+                )
+            else:
+                files.append(path)
+        frames = [frame for frame in map(cv2.imread, files) if frame is not None]
+        if self.paths and not frames:
+            raise RuntimeError(f"No readable images in {self.paths}")
+        return frames or [synthetic_frame(*self.size, seed=i) for i in range(self.synthetic)]
+
+    def _run(self):
+        frames = self.load_frames()
+        interval = 1 / self.fps
+        next_at = time.monotonic()
+        i = 0
+        while self._running:
+            with self._cond:
+                self._seq += 1
+                self._frames.append((self._seq, time.time(), frames[i % len(frames)]))
+                self._cond.notify_all()
+            i += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    A gradient background with a few filled shapes: compresses like a camera scene,
+    unlike random noise.
+    """
+    rng = random.Random(seed)
+    # Shape sizes scale down with the frame, so tiny test frames work too
+    max_w, max_h, max_r = max(2, width // 3), max(2, height // 3), max(2, height // 6)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[..., 0] = (x * 0.6 + y * 0.4).astype(np.uint8)
+    frame[..., 1] = (255 - x * 0.5).astype(np.uint8)
+    frame[..., 2] = np.broadcast_to(y, (height, width)).astype(np.uint8)
+    for _ in range(6):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(min(40, max_w - 1), max_w), rng.randrange(min(40, max_h - 1), max_h)
+        cv2.rectangle(frame, (x0, y0), (x0 + w, y0 + h), color, -1)
+        radius = rng.randrange(min(10, max_r - 1), max_r)
+        cv2.circle(frame, (rng.randrange(width), rng.randrange(height)), radius, color, -1)
+    return frame
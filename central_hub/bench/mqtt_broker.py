@@ -0,0 +1,183 @@
+import asyncio
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+class MQTTBroker:
+    """
+    Minimal in-process MQTT 3.1.1 broker for benchmarks and local testing.
+
+    Runs an asyncio server on its own thread. Supports CONNECT, SUBSCRIBE and
+    UNSUBSCRIBE with + and # wildcards, PUBLISH at QoS 0, 1 and 2 from clients,
+    and delivery to subscribers at up to QoS 1. No sessions, retained messages,
+    wills or authentication: every connection starts clean.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.Server | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._subscriptions: dict[asyncio.StreamWriter, dict[str, int]] = {}
+        self._packet_ids: dict[asyncio.StreamWriter, int] = {}
+        self.connections = 0
+        self.received = 0
+        self.delivered = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="mqtt-broker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("MQTT broker did not start")
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for writer in list(self._subscriptions):
+                writer.close()
+            self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._subscriptions[writer] = {}
+        self._packet_ids[writer] = 0
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                packet_type, flags = header[0] >> 4, header[0] & 0x0F
+                body = await reader.readexactly(await _read_length(reader))
+                if packet_type == CONNECT:
+                    writer.write(bytes([CONNACK << 4, 2, 0, 0]))
+                elif packet_type == PUBLISH:
+                    await self._on_publish(writer, flags, body)
+                elif packet_type == PUBREL:
+                    writer.write(bytes([PUBCOMP << 4, 2]) + body[:2])
+                elif packet_type == SUBSCRIBE:
+                    self._on_subscribe(writer, body)
+                elif packet_type == UNSUBSCRIBE:
+                    pos = 2
+                    while pos < len(body):
+                        topic, pos = _read_string(body, pos)
+                        self._subscriptions[writer].pop(topic, None)
+                    writer.write(bytes([UNSUBACK << 4, 2]) + body[:2])
+                elif packet_type == PINGREQ:
+                    writer.write(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+                # PUBACK/PUBREC/PUBCOMP from subscribers need no action: nothing is redelivered
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._subscriptions.pop(writer, None)
+            self._packet_ids.pop(writer, None)
+            writer.close()
+
+    async def _on_publish(self, writer: asyncio.StreamWriter, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        topic, pos = _read_string(body, 0)
+        packet_id = body[pos:pos + 2] if qos else b""
+        payload = body[pos + len(packet_id):]
+        self.received += 1
+        if qos == 1:
+            writer.write(bytes([PUBACK << 4, 2]) + packet_id)
+        elif qos == 2:
+            writer.write(bytes([PUBREC << 4, 2]) + packet_id)
+        for subscriber, filters in list(self._subscriptions.items()):
+            granted = max((q for f, q in filters.items() if topic_matches(f, topic)), default=None)
+            if granted is None:
+                continue
+            delivery_qos = min(qos, granted)
+            variable = _encode_string(topic)
+            if delivery_qos:
+                self._packet_ids[subscriber] = self._packet_ids[subscriber] % 0xFFFF + 1
+                variable += struct.pack("!H", self._packet_ids[subscriber])
+            subscriber.write(_packet(PUBLISH << 4 | delivery_qos << 1, variable + payload))
+            self.delivered += 1
+            if subscriber is not writer:
+                try:
+                    await subscriber.drain()
+                except ConnectionError:
+                    pass
+
+    def _on_subscribe(self, writer: asyncio.StreamWriter, body: bytes):
+        granted = []
+        pos = 2
+        while pos < len(body):
+            topic, pos = _read_string(body, pos)
+            qos = min(body[pos], 1)
+            pos += 1
+            self._subscriptions[writer][topic] = qos
+            granted.append(qos)
+        writer.write(_packet(SUBACK << 4, body[:2] + bytes(granted)))
+
+    def stats(self) -> dict:
+        return dict(
+            port=self.port,
+            connections=self.connections,
+            clients=len(self._subscriptions),
+            received=self.received,
+            delivered=self.delivered,
+        )
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels) or (level != "+" and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+async def _read_length(reader: asyncio.StreamReader) -> int:
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return length
+        shift += 7
+
+
+def _read_string(data: bytes, pos: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("!H", data, pos)
+    return data[pos + 2:pos + 2 + length].decode(), pos + 2 + length
+
+
+def _encode_string(value: str) -> bytes:
+    encoded = value.encode()
+    return struct.pack("!H", len(encoded)) + encoded
+
+
+def _packet(first_byte: int, body: bytes) -> bytes:
+    length = len(body)
+    encoded = bytearray([first_byte])
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded) + body
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from bench.background_server import BackgroundServer
+from core.metrics import LatencyWindow
+
+STUB_DESCRIPTION = "A person walks across the frame from left to right."
+
+
+class LatencyDistribution:
+    """
+    Parses "kind:params" into a sampler of seconds:
+      fixed:0.8             constant
+      uniform:0.3,1.2       uniform between the bounds
+      normal:0.8,0.2        mean, standard deviation (clamped at 0)
+      lognormal:0.8,0.4     median, sigma of the underlying normal (long right tail)
+      exponential:0.8       mean
+    """
+    def __init__(self, spec: str, seed: int | None = None):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",")] if params else []
+        self._random = random.Random(seed)
+        samplers = {
+            "fixed": lambda v: lambda: v[0],
+            "uniform": lambda v: lambda: self._random.uniform(v[0], v[1]),
+            "normal": lambda v: lambda: max(0.0, self._random.gauss(v[0], v[1])),
+            "lognormal": lambda v: lambda: v[0] * self._random.lognormvariate(0, v[1]),
+            "exponential": lambda v: lambda: self._random.expovariate(1 / v[0]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        try:
+            self.sample = samplers[kind](values)
+            self.sample()
+        except (IndexError, ZeroDivisionError):
+            raise ValueError(f"Bad parameters for latency distribution: {spec}") from None
+
+
+class StubVisionServer:
+    """
+    Stands in for the OpenAI Responses API (POST /v1/responses) on localhost.
+
+    Every request is answered after a delay drawn from `latency` with a fixed
+    description, or with a 500 for a fraction `error_rate` of requests. Request
+    body sizes are counted, so callers can report bytes on the wire. Point
+    AIAnalyzer (or any OpenAI client) at `base_url`.
+    """
+    def __init__(
+        self,
+        latency: str = "fixed:0.5",
+        error_rate: float = 0.0,
+        description: str = STUB_DESCRIPTION,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = None,
+    ):
+        self.latency = LatencyDistribution(latency, seed)
+        self.error_rate = error_rate
+        self.description = description
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = LatencyWindow()
+
+        self.app = FastAPI()
+        self.app.post("/v1/responses")(self._create_response)
+        self._server = BackgroundServer(self.app, host, port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self._server.url}/v1"
+
+    def start(self):
+        self._server.start()
+
+    def stop(self):
+        self._server.stop()
+
+    async def _create_response(self, request: Request):
+        body = await request.json()
+        delay = self.latency.sample()
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += int(request.headers.get("content-length", 0))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.delay.add(delay)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if self._random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return JSONResponse({"error": {"message": "stub error", "type": "server_error"}}, status_code=500)
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "stub"),
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": self.description, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+        }
+
+    def stats(self) -> dict:
+        return dict(
+            latency=self.latency.spec,
+            requests=self.requests,
+            errors=self.errors,
+            bytes_received=self.bytes_received,
+            max_in_flight=self.max_in_flight,
+            delay=self.delay.snapshot(),
+        )
@@ -1,33 +1,206 @@
+import asyncio
 import base64
+import random
+import threading
+import time
+
+import httpx
+from openai import (
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from core.camera_capture import EncodedFrame
+from core.metrics import LatencyWindow
+from envs import (
+    OPENAI_MODEL,
+    ANALYZER_MAX_CONCURRENCY,
+    ANALYZER_TIMEOUT,
+    ANALYZER_MAX_RETRIES,
+    ANALYZER_BREAKER_THRESHOLD,
+    ANALYZER_BREAKER_RESET,
+)
+
+# Transient failures worth retrying; anything else (4xx) is returned to the caller at once
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed requests, rejecting calls until
+    `reset_after` seconds have passed; then lets a single trial request through.
+    """
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
 
-from openai import OpenAI
 
 class AIAnalyzer:
     """
     Uses OpenAI to analyze image and return a description.
+
+    Requests are made with AsyncOpenAI on a dedicated event loop thread, sharing
+    one keep-alive HTTP connection pool. Concurrency is bounded by a semaphore,
+    transient errors are retried with jittered exponential backoff, and a circuit
+    breaker fails fast while the API is down. `analyze` is a blocking facade for
+    pipeline worker threads; `analyze_async` can be awaited on the analyzer loop.
     """
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(
+        self,
+        model: str = OPENAI_MODEL,
+        max_concurrency: int = ANALYZER_MAX_CONCURRENCY,
+        timeout: float = ANALYZER_TIMEOUT,
+        max_retries: int = ANALYZER_MAX_RETRIES,
+        breaker_threshold: int = ANALYZER_BREAKER_THRESHOLD,
+        breaker_reset: float = ANALYZER_BREAKER_RESET,
+        base_url: str | None = None,
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+        self.client = AsyncOpenAI(
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,  # retries are handled here, with jitter and the breaker
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency,
+                ),
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latency = LatencyWindow()
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="ai-analyzer", daemon=True).start()
 
-    def analyze(self, image_path: str) -> str:
+    def analyze(self, image: str | bytes | EncodedFrame) -> str:
+        """
+        Blocking call; `image` is a JPEG file path, encoded JPEG bytes or an EncodedFrame.
+        """
+        return asyncio.run_coroutine_threadsafe(self.analyze_async(image), self.loop).result()
+
+    async def analyze_async(self, image: str | bytes | EncodedFrame) -> str:
         # Prepare prompt
         prompt = (
             "It's an image from security camera. Movement detected via sensors. "
             "Please provide a detailed description of the cause and appearance."
         )
-        base64_image = self._encode_image(image_path)
-
-        response = self.client.responses.create(
-            model="gpt-4.1-mini",
-            input=[
-                {"role": "user", "content": [
-                    {"type": "input_text", "text": prompt},
-                    {"type": "input_image", "image_url": f"data:image/jpeg;base64,{base64_image}"},
-                ]}
-            ],
-        )
-        return response.output_text
+        if isinstance(image, EncodedFrame):
+            image = image.data
+        elif isinstance(image, str):
+            image = await self.loop.run_in_executor(None, self._read_image, image)
+        base64_image = base64.b64encode(image).decode("utf-8")
+        payload = [
+            {"role": "user", "content": [
+                {"type": "input_text", "text": prompt},
+                {"type": "input_image", "image_url": f"data:image/jpeg;base64,{base64_image}"},
+            ]}
+        ]
+
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("OpenAI circuit breaker is open")
 
-    def _encode_image(self, image_path):
+        self.requests += 1
+        settled = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._semaphore:
+                        self.in_flight += 1
+                        started = time.perf_counter()
+                        try:
+                            response = await self.client.responses.create(model=self.model, input=payload)
+                        finally:
+                            self.in_flight -= 1
+                    self.latency.add(time.perf_counter() - started)
+                    settled = True
+                    self.breaker.record_success()
+                    return response.output_text
+                except RETRYABLE_ERRORS:
+                    if attempt == self.max_retries:
+                        self.errors += 1
+                        settled = True
+                        self.breaker.record_failure()
+                        raise
+                    self.retries += 1
+                    # Full jitter: spread retries of concurrent callers apart
+                    await asyncio.sleep(random.uniform(0, min(10.0, 0.5 * 2 ** attempt)))
+                except Exception:
+                    self.errors += 1
+                    settled = True
+                    self.breaker.record_success()  # the API answered; the request itself was bad
+                    raise
+        finally:
+            if not settled:
+                # Cancelled (e.g. the caller stopped waiting): count it as a failure, which also
+                # ends a half-open trial, or the breaker would reject every later call
+                self.errors += 1
+                self.breaker.record_failure()
+
+    def _read_image(self, image_path: str) -> bytes:
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+            return image_file.read()
+
+    def stats(self) -> dict:
+        return dict(
+            model=self.model,
+            max_concurrency=self.max_concurrency,
+            in_flight=self.in_flight,
+            requests=self.requests,
+            errors=self.errors,
+            retries=self.retries,
+            rejected=self.rejected,
+            circuit=self.breaker.state,
+            latency=self.latency.snapshot(),
+        )
@@ -1,27 +1,226 @@
-import os
-from datetime import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 
 import cv2
 
-from envs import IMAGE_DIR
+from core.image_store import ImageStore
+from core.metrics import LatencyWindow
+from envs import CAMERA_BUFFER_SIZE, CAMERA_WARMUP_FRAMES, CAMERA_ENCODE_MAX_WIDTH, CAMERA_ENCODE_QUALITY
+
+
+class EncodedFrame:
+    """
+    A JPEG-encoded frame held in memory, as sent to the vision model.
+    """
+    def __init__(self, data: bytes, width: int, height: int, timestamp: float, quality: int):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.timestamp = timestamp
+        self.quality = quality
+
+    def __len__(self) -> int:
+        return len(self.data)
 
 
 class CameraCapture:
     """
-    Captures frames from a connected camera.
+    Captures frames from a camera.
+
+    `source` is a device index (int or digit string), an RTSP/HTTP stream URL, or a
+    video/image file path or file:// URI. Files are replayed in a loop at their own
+    frame rate, so recordings can stand in for devices.
+
+    A single background thread owns the device and keeps a ring buffer of the
+    last `buffer_size` decoded frames with their wall-clock timestamps, so alert
+    capture and the MJPEG stream read from one producer without reopening it.
+
+    Alert frames are encoded in memory for analysis (`encode`, scaled down to
+    `encode_max_width` at `encode_quality`) while the full-resolution capture is
+    written to the image store in the background (`save_async`).
     """
-    def __init__(self, index: int = 0, image_dir: str = IMAGE_DIR):
-        self.index = index
-        self.image_dir = image_dir
-        os.makedirs(self.image_dir, exist_ok=True)
-
-    def capture(self) -> str:
-        cam = cv2.VideoCapture(self.index)
-        ret, frame = cam.read()
-        cam.release()
-        if not ret:
+    def __init__(
+        self,
+        source: int | str = 0,
+        images: ImageStore | None = None,
+        name: str = "default",
+        buffer_size: int = CAMERA_BUFFER_SIZE,
+        warmup_frames: int = CAMERA_WARMUP_FRAMES,
+        encode_max_width: int = CAMERA_ENCODE_MAX_WIDTH,
+        encode_quality: int = CAMERA_ENCODE_QUALITY,
+    ):
+        self.source = source
+        self.name = name
+        self.images = images or ImageStore()
+        self.warmup_frames = warmup_frames
+        self.encode_max_width = encode_max_width
+        self.encode_quality = encode_quality
+        self.encode_latency = LatencyWindow()
+
+        self._frames = deque(maxlen=buffer_size)  # (seq, timestamp, frame)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self.reopens = 0
+        self._closed = False
+
+    def start(self):
+        with self._cond:
+            if self._running or self._closed:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.name}", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops for good: later reads no longer restart the capture thread.
+        """
+        with self._cond:
+            self._closed = True
+        self.stop()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _open(self) -> tuple[cv2.VideoCapture, bool]:
+        """
+        Opens the source; returns the capture and whether it is a file to replay.
+        """
+        source = self.source
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        if isinstance(source, str) and source.startswith("file://"):
+            source = source[len("file://"):]
+        if isinstance(source, int):
+            return cv2.VideoCapture(source), False
+        cam = cv2.VideoCapture(source)
+        is_file = "://" not in source
+        if not is_file:
+            cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # stream: keep the newest frame, not a backlog
+        return cam, is_file
+
+    def _run(self):
+        while self._running:
+            cam, is_file = self._open()
+            if not cam.isOpened():
+                print(f"[CAMERA] Could not open camera {self.name} ({self.source}), retrying")
+                cam.release()
+                time.sleep(1)
+                continue
+            # Auto-exposure needs a few frames after open; the first ones are dark or stale
+            for _ in range(0 if is_file else self.warmup_frames):
+                cam.read()
+            # Files are read as fast as they decode: pace them at their recorded frame rate
+            interval = 1 / (cam.get(cv2.CAP_PROP_FPS) or 15) if is_file else 0.0
+            next_at = time.monotonic()
+            while self._running:
+                ret, frame = cam.read()
+                if not ret and is_file and cam.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    ret, frame = cam.read()  # end of file: replay from the start
+                if not ret:
+                    print(f"[CAMERA] Read from camera {self.name} failed, reopening")
+                    break
+                with self._cond:
+                    self._seq += 1
+                    self._frames.append((self._seq, time.time(), frame))
+                    self._cond.notify_all()
+                if interval:
+                    next_at += interval
+                    time.sleep(max(0.0, next_at - time.monotonic()))
+            cam.release()
+            self.reopens += 1
+            if self._running:
+                time.sleep(1)
+
+    def latest(self, after_seq: int = 0, timeout: float = 5.0):
+        """
+        Returns the newest (seq, timestamp, frame) with seq > after_seq, waiting up to `timeout`.
+        Returns None on timeout.
+        """
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: not self._running or (self._frames and self._frames[-1][0] > after_seq),
+                timeout=timeout,
+            ):
+                return None
+            return self._frames[-1] if self._frames else None
+
+    def frame_at(self, ts: float, timeout: float = 5.0):
+        """
+        Returns the buffered (seq, timestamp, frame) closest to wall-clock `ts`.
+        If `ts` is newer than every buffered frame, waits for the next frame.
+        """
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: not self._running or (self._frames and self._frames[-1][1] >= ts),
+                timeout=timeout,
+            ) and not self._frames:
+                return None
+            return min(self._frames, key=lambda item: abs(item[1] - ts), default=None)
+
+    def capture(self, ts: float | None = None) -> str:
+        """
+        Saves the frame nearest to `ts` (default: now) and returns its path.
+        """
+        item = self.frame_at(time.time() if ts is None else ts)
+        if item is None:
             raise RuntimeError("Camera capture failed")
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        path = os.path.join(self.image_dir, f"cap_{ts}.jpg")
-        cv2.imwrite(path, frame)
-        return path
\ No newline at end of file
+        _, _, frame = item
+        return self.save(frame)
+
+    def save(self, frame) -> str:
+        """
+        Stores the frame (and its thumbnails) in the image store; returns its path.
+        """
+        return self.images.put_frame(frame)
+
+    def save_async(self, frame) -> Future:
+        """
+        Like `save`, on the image store's writer threads. Returns a Future of the path.
+        """
+        return self.images.put_frame_async(frame)
+
+    def encode(self, frame, timestamp: float | None = None) -> EncodedFrame:
+        """
+        JPEG-encodes the frame in memory at the analysis resolution and quality.
+        """
+        started = time.perf_counter()
+        height, width = frame.shape[:2]
+        if self.encode_max_width and width > self.encode_max_width:
+            height = round(height * self.encode_max_width / width)
+            width = self.encode_max_width
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.encode_quality])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        self.encode_latency.add(time.perf_counter() - started)
+        return EncodedFrame(
+            encoded.tobytes(), width, height, time.time() if timestamp is None else timestamp, self.encode_quality,
+        )
+
+    def stats(self) -> dict:
+        with self._cond:
+            frames = list(self._frames)
+        fps = None
+        if len(frames) > 1 and frames[-1][1] > frames[0][1]:
+            fps = round((len(frames) - 1) / (frames[-1][1] - frames[0][1]), 1)
+        return dict(
+            source=str(self.source),
+            running=self._running,
+            frames=self._seq,
+            buffered=len(frames),
+            fps=fps,
+            reopens=self.reopens,
+            encode=self.encode_latency.snapshot(),
+        )
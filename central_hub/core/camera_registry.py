@@ -0,0 +1,216 @@
+import math
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from core.camera_capture import CameraCapture
+from core.clip_recorder import ClipRecorder
+from core.image_store import ImageStore
+from core.mjpeg_broadcaster import MJPEGBroadcaster
+from envs import CAMERAS, CAMERA_INDEX, CAMERA_MOSAIC_TILE_WIDTH
+
+
+class CameraRegistry:
+    """
+    The hub's cameras, and which sensors each one covers.
+
+    Every enabled camera has its own capture thread and MJPEG broadcaster. A camera's
+    `coverage` lists "node/sensor" keys, where either part may be "*". Sources that
+    no camera covers fall back to the first camera, so a single camera without
+    coverage sees everything.
+
+    Cameras from the central config (`configure`, `apply_ops`) replace the local
+    `static` list while the config defines any; with none, the local list applies
+    again. A camera whose uri changes is restarted; removed ones are closed.
+    `static` defaults to envs.CAMERAS, or one camera at CAMERA_INDEX when that is empty.
+
+    With a `clip_dir`, every camera also has a ClipRecorder keeping its last seconds
+    of footage for pre/post-event clips.
+    """
+    def __init__(self, images: ImageStore, static: list[dict] | None = None, clip_dir: str | None = None):
+        self.images = images
+        self.clip_dir = clip_dir
+        if static is None:
+            static = CAMERAS or [{"name": "default", "uri": str(CAMERA_INDEX)}]
+        self.static = static
+        self._remote: dict[str, dict] = {}
+        self._specs: dict[str, dict] = {}
+        self._cameras: dict[str, CameraCapture] = {}
+        self._mjpeg: dict[str, MJPEGBroadcaster] = {}
+        self._clips: dict[str, ClipRecorder] = {}
+        self._lock = threading.Lock()
+        self._capture_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="camera-capture")
+        self.configure([])
+
+    def configure(self, cameras: list[dict]):
+        """
+        Replaces the centrally configured cameras (e.g. after a full config sync).
+        """
+        with self._lock:
+            self._remote = {camera["name"]: camera for camera in cameras}
+            self._reconcile()
+
+    def apply_ops(self, ops: list[dict]):
+        """
+        Applies "camera" (add or update) and "camera_remove" config deltas.
+        """
+        with self._lock:
+            for op in ops:
+                if op["op"] == "camera":
+                    self._remote[op["camera"]["name"]] = op["camera"]
+                elif op["op"] == "camera_remove":
+                    self._remote.pop(op["name"], None)
+            self._reconcile()
+
+    def add(self, camera: CameraCapture, coverage: list[str] | None = None):
+        """
+        Registers an already constructed camera (e.g. a stand-in for tests and benchmarks).
+        """
+        with self._lock:
+            self._close(camera.name)
+            self._specs[camera.name] = dict(name=camera.name, uri=str(camera.source), coverage=coverage or [])
+            self._start(camera)
+
+    def _reconcile(self):
+        specs = [s for s in (self._remote.values() or self.static) if s.get("status", "enabled") == "enabled"]
+        wanted = {spec["name"]: dict(name=spec["name"], uri=str(spec["uri"]), coverage=list(spec.get("coverage", [])))
+                  for spec in specs}
+        for name in list(self._cameras):
+            if name not in wanted or wanted[name]["uri"] != self._specs[name]["uri"]:
+                self._close(name)
+        for name, spec in wanted.items():
+            self._specs[name] = spec
+            if name not in self._cameras:
+                self._start(CameraCapture(source=spec["uri"], images=self.images, name=name))
+                print(f"[CAMERA] Started camera {name} ({spec['uri']}) covering {spec['coverage'] or 'fallback'}")
+
+    def _start(self, camera: CameraCapture):
+        self._cameras[camera.name] = camera
+        self._mjpeg[camera.name] = MJPEGBroadcaster(camera)
+        camera.start()
+        if self.clip_dir is not None:
+            self._clips[camera.name] = ClipRecorder(camera, root=self.clip_dir)
+            self._clips[camera.name].start()
+
+    def _close(self, name: str, wait: bool = False):
+        camera = self._cameras.pop(name, None)
+        self._specs.pop(name, None)
+        if camera is None:
+            return
+        self._mjpeg.pop(name).close()
+        recorder = self._clips.pop(name, None)
+
+        def close():
+            if recorder is not None:
+                recorder.stop()  # writes the clips already requested
+            camera.close()
+
+        if wait:
+            close()
+        else:
+            # Joining the threads may take a frame time; don't hold up config changes
+            threading.Thread(target=close, name=f"camera-close-{name}", daemon=True).start()
+        print(f"[CAMERA] Stopped camera {name}")
+
+    def get(self, name: str | None = None) -> CameraCapture | None:
+        """
+        The named camera, or the first one when `name` is None.
+        """
+        with self._lock:
+            if name is None:
+                return next(iter(self._cameras.values()), None)
+            return self._cameras.get(name)
+
+    def mjpeg(self, name: str | None = None) -> MJPEGBroadcaster | None:
+        with self._lock:
+            if name is None:
+                return next(iter(self._mjpeg.values()), None)
+            return self._mjpeg.get(name)
+
+    def cameras_for(self, sources: list[str]) -> list[CameraCapture]:
+        """
+        Cameras covering any of the "node/sensor" sources, in registry order.
+        """
+        with self._lock:
+            matched = []
+            for name, spec in self._specs.items():
+                coverage = set(spec["coverage"])
+                for source in sources:
+                    node, _, sensor = source.partition("/")
+                    if coverage & {source, f"{node}/*", f"*/{sensor}", "*"}:
+                        matched.append(self._cameras[name])
+                        break
+            if not matched and self._cameras:
+                matched.append(next(iter(self._cameras.values())))
+            return matched
+
+    def capture(self, cameras: list[CameraCapture], ts: float) -> list[tuple[CameraCapture, tuple]]:
+        """
+        The buffered frame nearest to `ts` from each camera, fetched in parallel.
+        Cameras without a frame are left out.
+        """
+        if len(cameras) == 1:
+            items = [cameras[0].frame_at(ts)]
+        else:
+            items = list(self._capture_pool.map(lambda camera: camera.frame_at(ts), cameras))
+        return [(camera, item) for camera, item in zip(cameras, items) if item is not None]
+
+    def record_clips(self, names: list[str], ts: float) -> list[Future]:
+        """
+        Requests the clip around `ts` from each named camera that records clips.
+        Each Future resolves to the clip's path, or None.
+        """
+        with self._lock:
+            recorders = [self._clips[name] for name in names if name in self._clips]
+        return [recorder.record(ts) for recorder in recorders]
+
+    def describe(self) -> list[dict]:
+        with self._lock:
+            return [dict(spec, running=self._cameras[name].stats()["running"]) for name, spec in self._specs.items()]
+
+    def close(self):
+        with self._lock:
+            for name in list(self._cameras):
+                self._close(name, wait=True)
+        self._capture_pool.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            cameras = dict(self._cameras)
+        return {name: camera.stats() for name, camera in cameras.items()}
+
+    def mjpeg_stats(self) -> dict:
+        with self._lock:
+            broadcasters = dict(self._mjpeg)
+        return {name: broadcaster.stats() for name, broadcaster in broadcasters.items()}
+
+    def clip_stats(self) -> dict:
+        with self._lock:
+            recorders = dict(self._clips)
+        return {name: recorder.stats() for name, recorder in recorders.items()}
+
+
+def mosaic(frames: list[tuple[str, np.ndarray]], tile_width: int = CAMERA_MOSAIC_TILE_WIDTH) -> np.ndarray:
+    """
+    Tiles labelled camera frames into one image: a near-square grid of `tile_width`-wide
+    cells, so one stored image and one vision request cover every camera of an incident.
+    """
+    if len(frames) == 1:
+        return frames[0][1]
+    tiles = []
+    tile_height = 0
+    for _, frame in frames:
+        height = round(frame.shape[0] * tile_width / frame.shape[1])
+        tile_height = max(tile_height, height)
+        tiles.append(cv2.resize(frame, (tile_width, height), interpolation=cv2.INTER_AREA))
+    columns = math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    grid = np.zeros((rows * tile_height, columns * tile_width, 3), np.uint8)
+    for i, ((name, _), tile) in enumerate(zip(frames, tiles)):
+        y, x = (i // columns) * tile_height, (i % columns) * tile_width
+        grid[y:y + tile.shape[0], x:x + tile_width] = tile
+        cv2.putText(grid, name, (x + 10, y + 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 4, cv2.LINE_AA)
+        cv2.putText(grid, name, (x + 10, y + 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2, cv2.LINE_AA)
+    return grid
@@ -0,0 +1,347 @@
+import heapq
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from concurrent.futures import Future
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from core.camera_capture import CameraCapture
+from core.metrics import LatencyWindow
+from envs import (
+    CLIP_DIR,
+    CLIP_PRE_SECONDS,
+    CLIP_POST_SECONDS,
+    CLIP_BUFFER_BYTES,
+    CLIP_BUFFER_FRAMES,
+    CLIP_FPS,
+    CLIP_WIDTH,
+    CLIP_QUALITY,
+)
+
+
+class EncodedRing:
+    """
+    The most recent JPEG frames, packed into one preallocated bytearray.
+
+    Frames are written back to back and wrap to the start when the next one does not
+    fit before the end; the oldest frames whose bytes are overwritten, or whose index
+    slot is reused, are evicted. Memory is bounded by `capacity` bytes and `slots`
+    frames, and nothing is allocated per frame once constructed.
+    """
+    def __init__(self, capacity: int, slots: int):
+        self.capacity = capacity
+        self.slots = slots
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        # Per slot: byte offset, length, wall-clock timestamp, frame size
+        self._offsets = array("q", bytes(8 * slots))
+        self._lengths = array("q", bytes(8 * slots))
+        self._timestamps = array("d", bytes(8 * slots))
+        self._widths = array("l", bytes(array("l").itemsize * slots))
+        self._heights = array("l", bytes(array("l").itemsize * slots))
+        self._first = 0  # slot of the oldest frame
+        self._count = 0
+        self._write_at = 0  # byte offset of the next frame
+        self.used = 0
+        self.evicted = 0
+        self.oversized = 0
+
+    def append(self, data: np.ndarray, timestamp: float, width: int, height: int) -> bool:
+        """
+        Copies an encoded frame (a flat uint8 array) in. Returns False if it is larger
+        than the whole ring.
+        """
+        length = data.shape[0]
+        if length > self.capacity:
+            self.oversized += 1
+            return False
+        wrap = self._write_at + length > self.capacity
+        offset = 0 if wrap else self._write_at
+        # Evict from the oldest end until the new frame has a free slot and free bytes. On a
+        # wrap, the frames in the skipped tail are the oldest and go first.
+        while self._count and (
+            self._count == self.slots
+            or self._overlaps(self._first, offset, length)
+            or (wrap and self._offsets[self._first] >= self._write_at)
+        ):
+            self.used -= self._lengths[self._first]
+            self._first = (self._first + 1) % self.slots
+            self._count -= 1
+            self.evicted += 1
+        self._view[offset:offset + length] = data
+        slot = (self._first + self._count) % self.slots
+        self._offsets[slot] = offset
+        self._lengths[slot] = length
+        self._timestamps[slot] = timestamp
+        self._widths[slot] = width
+        self._heights[slot] = height
+        self._count += 1
+        self._write_at = offset + length
+        self.used += length
+        return True
+
+    def _overlaps(self, slot: int, offset: int, length: int) -> bool:
+        start = self._offsets[slot]
+        return start < offset + length and offset < start + self._lengths[slot]
+
+    def oldest(self) -> float | None:
+        return self._timestamps[self._first] if self._count else None
+
+    def newest(self) -> float | None:
+        return self._timestamps[(self._first + self._count - 1) % self.slots] if self._count else None
+
+    def copy(self, start: float, end: float) -> list[tuple[float, int, int, bytes]]:
+        """
+        (timestamp, width, height, jpeg) of every frame with start <= timestamp <= end, oldest first.
+        """
+        frames = []
+        for i in range(self._count):
+            slot = (self._first + i) % self.slots
+            timestamp = self._timestamps[slot]
+            if start <= timestamp <= end:
+                offset = self._offsets[slot]
+                frames.append((
+                    timestamp, self._widths[slot], self._heights[slot],
+                    self._view[offset:offset + self._lengths[slot]].tobytes(),
+                ))
+        return frames
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class ClipRecorder:
+    """
+    Records pre/post-event video clips of a camera.
+
+    An encoder thread samples the camera at `fps`, scales frames to `width` and
+    JPEG-encodes them at `quality` into an EncodedRing of `buffer_bytes` /
+    `buffer_frames`, so the last seconds of footage are always in memory at a fixed
+    cost. `record(ts)` returns at once; once `post_seconds` have passed after `ts`,
+    a writer thread copies the frames from `pre_seconds` before to `post_seconds`
+    after out of the ring and writes them, without re-encoding, as an MJPEG AVI
+    under `root`. The Future resolves to the clip's path (None if no frames were
+    buffered for that window).
+    """
+    def __init__(
+        self,
+        camera: CameraCapture,
+        root: str = CLIP_DIR,
+        pre_seconds: float = CLIP_PRE_SECONDS,
+        post_seconds: float = CLIP_POST_SECONDS,
+        buffer_bytes: int = CLIP_BUFFER_BYTES,
+        buffer_frames: int = CLIP_BUFFER_FRAMES,
+        fps: float = CLIP_FPS,
+        width: int = CLIP_WIDTH,
+        quality: int = CLIP_QUALITY,
+    ):
+        self.camera = camera
+        self.root = root
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+        self.ring = EncodedRing(buffer_bytes, buffer_frames)
+        self._lock = threading.Lock()
+        self._scaled: np.ndarray | None = None  # reused resize target
+
+        self._pending: list[tuple[float, int, float, Future]] = []  # heap of (due, seq, ts, future)
+        self._pending_seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads: list[threading.Thread] = []
+        self.frames_encoded = 0
+        self.clips_written = 0
+        self.clips_empty = 0
+        self.write_errors = 0
+        self.encode_latency = LatencyWindow()
+        self.write_latency = LatencyWindow()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for target, name in ((self._encode_loop, "encoder"), (self._write_loop, "writer")):
+            thread = threading.Thread(target=target, name=f"clip-{name}-{self.camera.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Stops encoding; clips already requested are written from what is buffered.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def record(self, ts: float) -> Future:
+        """
+        Requests the clip around wall-clock `ts`. Returns a Future resolving to its path.
+        """
+        future = Future()
+        with self._cond:
+            if not self._running:
+                future.set_result(None)  # stopped (camera removed): nothing more to record
+                return future
+            self._pending_seq += 1
+            heapq.heappush(self._pending, (ts + self.post_seconds, self._pending_seq, ts, future))
+            self._cond.notify_all()
+        return future
+
+    def _encode_loop(self):
+        interval = 1 / self.fps
+        next_at = time.monotonic()
+        seq = 0
+        while self._running:
+            next_at = max(next_at + interval, time.monotonic() - interval)
+            item = self.camera.latest(after_seq=seq, timeout=1.0)
+            if item is not None and item[0] > seq:
+                seq, ts, frame = item
+                self._append(frame, ts)
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    def _append(self, frame: np.ndarray, ts: float):
+        started = time.perf_counter()
+        height, width = frame.shape[:2]
+        if self.width and width > self.width:
+            height = round(height * self.width / width)
+            width = self.width
+            if self._scaled is None or self._scaled.shape != (height, width, *frame.shape[2:]):
+                self._scaled = np.empty((height, width, *frame.shape[2:]), frame.dtype)
+            frame = cv2.resize(frame, (width, height), dst=self._scaled, interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._lock:
+            self.ring.append(encoded.reshape(-1), ts, width, height)
+        self.frames_encoded += 1
+        self.encode_latency.add(time.perf_counter() - started)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending and (not self._running or self._pending[0][0] <= time.time()):
+                        break
+                    if not self._running and not self._pending:
+                        return
+                    timeout = self._pending[0][0] - time.time() if self._pending else None
+                    self._cond.wait(timeout)
+                _, _, ts, future = heapq.heappop(self._pending)
+            if self._running:
+                # Let the encoder catch up with the last post-event frame
+                time.sleep(1 / self.fps)
+            try:
+                future.set_result(self._write(ts))
+            except Exception as e:
+                self.write_errors += 1
+                print(f"[CLIP] Writing clip of camera {self.camera.name} failed: {e}")
+                future.set_exception(e)
+
+    def _write(self, ts: float) -> str | None:
+        with self._lock:
+            frames = self.ring.copy(ts - self.pre_seconds, ts + self.post_seconds)
+        if not frames:
+            self.clips_empty += 1
+            return None
+        started = time.perf_counter()
+        stamp = datetime.fromtimestamp(ts)
+        directory = os.path.join(self.root, stamp.strftime("%Y-%m-%d"))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.camera.name}_{stamp.strftime('%H%M%S_%f')}.avi")
+        # Write to a temporary file and rename, so readers never see a partial clip
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_mjpeg_avi(f, frames)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.clips_written += 1
+        self.write_latency.add(time.perf_counter() - started)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            oldest, newest = self.ring.oldest(), self.ring.newest()
+            ring = dict(
+                capacity_bytes=self.ring.capacity,
+                used_bytes=self.ring.used,
+                frames=len(self.ring),
+                max_frames=self.ring.slots,
+                seconds=round(newest - oldest, 1) if oldest is not None else 0.0,
+                evicted=self.ring.evicted,
+                oversized=self.ring.oversized,
+            )
+        return dict(
+            buffer=ring,
+            frames_encoded=self.frames_encoded,
+            pending=len(self._pending),
+            clips_written=self.clips_written,
+            clips_empty=self.clips_empty,
+            write_errors=self.write_errors,
+            encode=self.encode_latency.snapshot(),
+            write=self.write_latency.snapshot(),
+        )
+
+
+def write_mjpeg_avi(f, frames: list[tuple[float, int, int, bytes]]):
+    """
+    Writes JPEG frames as-is into an AVI (RIFF) container with one MJPG video stream.
+    The frame rate is the clip's average; the size is taken from the first frame.
+    """
+    _, width, height, _ = frames[0]
+    duration = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / duration if len(frames) > 1 and duration > 0 else 1.0
+    largest = max(len(data) for *_, data in frames)
+
+    def chunk(fourcc: bytes, data: bytes) -> bytes:
+        return fourcc + struct.pack("<I", len(data)) + data + b"\0" * (len(data) % 2)
+
+    def riff_list(kind: bytes, fourcc: bytes, data: bytes) -> bytes:
+        return kind + struct.pack("<I", len(data) + 4) + fourcc + data
+
+    avih = struct.pack(
+        "<10I16x",
+        round(1_000_000 / fps), round(largest * fps), 0, 0x10,  # AVIF_HASINDEX
+        len(frames), 0, 1, largest, width, height,
+    )
+    strh = b"vidsMJPG" + struct.pack(
+        "<IHHIIIIIIiI4h",
+        0, 0, 0, 0, 1000, round(fps * 1000), 0, len(frames), largest, -1, 0, 0, 0, width, height,
+    )
+    strf = struct.pack("<IiiHH4sIiiII", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+    header = riff_list(
+        b"LIST", b"hdrl",
+        chunk(b"avih", avih) + riff_list(b"LIST", b"strl", chunk(b"strh", strh) + chunk(b"strf", strf)),
+    )
+
+    index = bytearray()
+    movi_size = 4
+    for _, _, _, data in frames:
+        # idx1 offsets are relative to the "movi" fourcc
+        index += b"00dc" + struct.pack("<III", 0x10, movi_size, len(data))  # AVIIF_KEYFRAME
+        movi_size += 8 + len(data) + len(data) % 2
+    idx1 = chunk(b"idx1", bytes(index))
+
+    f.write(b"RIFF" + struct.pack("<I", 4 + len(header) + 8 + movi_size + len(idx1)) + b"AVI ")
+    f.write(header)
+    f.write(b"LIST" + struct.pack("<I", movi_size) + b"movi")
+    for _, _, _, data in frames:
+        f.write(b"00dc" + struct.pack("<I", len(data)))
+        f.write(data)
+        if len(data) % 2:
+            f.write(b"\0")
+    f.write(idx1)
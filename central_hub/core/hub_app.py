@@ -1,88 +1,243 @@
-import asyncio
+import os
 import threading
 import time
 
-import cv2
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import requests
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
-from starlette.staticfiles import StaticFiles
+from starlette.responses import FileResponse, StreamingResponse
 from starlette.websockets import WebSocket
 
-from envs import IMAGE_DIR, CAMERA_INDEX, CONFIG_SYNC_INTERVAL, CENTRAL_API_URL, HUB_NAME
+from core.camera_registry import CameraRegistry
+from core.image_store import content_hash
+from core.ws_broadcaster import WebSocketBroadcaster
+from envs import (
+    CONFIG_SYNC_INTERVAL, CENTRAL_API_URL, HUB_NAME,
+    CONFIG_PUSH_ENABLED, CONFIG_LONG_POLL_TIMEOUT, CONFIG_RESYNC_INTERVAL,
+)
 
 
 class HubApp:
     """
     Encapsulates the FastAPI application, routes, and streaming.
+    With `connect_central=False` the hub neither registers with the central API
+    nor syncs its config (offline use, e.g. benchmarks). Cameras defined in the central
+    config are applied to `cameras`.
     """
-    def __init__(self):
+    def __init__(self, connect_central: bool = True, cameras: CameraRegistry | None = None):
         self.app = FastAPI()
         self.app.add_middleware(
             CORSMiddleware,
             allow_origins=["*"],
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Next-Cursor"],
         )
-        self.app.state.websockets = []
+        self.app.state.ws_broadcaster = WebSocketBroadcaster()
         self.app.state.sensor_flags: dict[str, bool] = {}
+        self.app.state.cameras = cameras
+        # name -> callable returning a stats dict, exposed via GET /stats
+        self.app.state.stats_sources = {"websockets": self.app.state.ws_broadcaster.stats}
 
         self.hub_id = None
+        # Keep-alive connection to the central API, and the ETag of the last applied config
+        self.session = requests.Session()
+        self._config_etag: str | None = None
+        # config_version of the applied flags; full syncs and pushed deltas apply under the lock
+        self._config_version: int | None = None
+        self._config_lock = threading.Lock()
+        self._last_full_sync = 0.0
+        self._subscribed = False
 
-        # Mount static folders
-        self.app.mount("/images", StaticFiles(directory=IMAGE_DIR), name="images")
         # Setup routes
         self._setup_routes()
 
+        if not connect_central:
+            return
         self._register_from_central()
 
-        # Start periodic config sync
+        # Start periodic config sync, and the push subscription it falls back from
         threading.Thread(target=self._config_sync_loop, daemon=True).start()
+        if CONFIG_PUSH_ENABLED:
+            threading.Thread(target=self._config_subscribe_loop, daemon=True).start()
 
     def _setup_routes(self):
         @self.app.get("/alerts")
-        def get_alerts():
-            return self.app.state.store.get_alerts()
+        def get_alerts(
+            response: Response,
+            node: str | None = None,
+            sensor: str | None = None,
+            since: int | None = Query(None, description="Only alerts newer than this epoch-ms timestamp"),
+            until: int | None = Query(None, description="Only alerts at or before this epoch-ms timestamp"),
+            cursor: str | None = Query(None, description="X-Next-Cursor from the previous page"),
+            limit: int = Query(20, ge=1, le=500),
+        ):
+            """
+            Newest-first alerts. When more rows exist, the X-Next-Cursor response header
+            carries the cursor for the next (older) page.
+            """
+            try:
+                alerts, next_cursor = self.app.state.store.query_alerts(
+                    node=node, sensor=sensor, since=since, until=until, cursor=cursor, limit=limit,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            images = self.app.state.images
+            for alert in alerts:
+                # List views should fetch these instead of the full-size image_path
+                alert["thumbnails"] = images.thumbnails(alert["image_path"])
+            return alerts
+
+        @self.app.get("/images/{path:path}")
+        def get_image(path: str, request: Request):
+            """
+            Serves stored images. Content-addressed files never change, so they carry a
+            strong ETag and are cacheable forever; FileResponse hands the file to the
+            server's zero-copy path where it supports one.
+            """
+            root = os.path.abspath(self.app.state.images.root)
+            full = os.path.abspath(os.path.join(root, path))
+            if not full.startswith(root + os.sep) or not os.path.isfile(full):
+                raise HTTPException(status_code=404, detail="Image not found")
+            if content_hash(full) is None:
+                return FileResponse(full, media_type="image/jpeg")  # legacy capture
+            etag = f'"{os.path.basename(full)[:-4]}"'
+            headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+            if_none_match = request.headers.get("if-none-match", "")
+            if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+                return Response(status_code=304, headers=headers)
+            return FileResponse(full, media_type="image/jpeg", headers=headers)
+
+        @self.app.get("/clips/{path:path}")
+        def get_clip(path: str):
+            """
+            Serves pre/post-event clips (MJPEG AVI), as linked from alerts.clips.
+            """
+            cameras = self.app.state.cameras
+            if cameras is None or cameras.clip_dir is None:
+                raise HTTPException(status_code=404, detail="Clip not found")
+            root = os.path.abspath(cameras.clip_dir)
+            full = os.path.abspath(os.path.join(root, path))
+            if not full.startswith(root + os.sep) or not full.endswith(".avi") or not os.path.isfile(full):
+                raise HTTPException(status_code=404, detail="Clip not found")
+            return FileResponse(full, media_type="video/x-msvideo")
+
+        @self.app.get("/stats")
+        def get_stats():
+            return {name: source() for name, source in self.app.state.stats_sources.items()}
 
         @self.app.websocket("/ws/alerts")
         async def ws_alerts(ws: WebSocket):
             await ws.accept()
-            self.app.state.websockets.append(ws)
-            try:
-                while True:
-                    await asyncio.sleep(1)
-            finally:
-                self.app.state.websockets.remove(ws)
+            await self.app.state.ws_broadcaster.serve(ws)
+
+        @self.app.get("/cameras")
+        def get_cameras():
+            """
+            The hub's cameras with their uri, coverage and whether they are capturing.
+            """
+            cameras = self.app.state.cameras
+            return cameras.describe() if cameras is not None else []
 
         @self.app.get("/stream/video.mjpg",
                  responses={200: {"content": {"multipart/x-mixed-replace; boundary=frame": {}}}},
                  response_class=StreamingResponse)
-        def stream_video_mjpg():
-            return StreamingResponse(
-                self._mjpeg_stream(),
-                media_type="multipart/x-mixed-replace; boundary=frame"
-            )
-
-    def _mjpeg_stream(self):
-        cap = cv2.VideoCapture(CAMERA_INDEX)
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            _, jpeg = cv2.imencode(".jpg", frame)
-            yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n"
-            )
+        async def stream_video_mjpg():
+            return self._mjpeg_response(None)
+
+        @self.app.get("/stream/{camera}/video.mjpg",
+                 responses={200: {"content": {"multipart/x-mixed-replace; boundary=frame": {}}}},
+                 response_class=StreamingResponse)
+        async def stream_camera_mjpg(camera: str):
+            return self._mjpeg_response(camera)
+
+    def _mjpeg_response(self, camera: str | None) -> StreamingResponse:
+        """
+        The MJPEG stream of the named camera (default: the first one).
+        """
+        cameras = self.app.state.cameras
+        mjpeg = cameras.mjpeg(camera) if cameras is not None else None
+        if mjpeg is None:
+            raise HTTPException(status_code=404, detail="Camera not found")
+        return StreamingResponse(mjpeg.stream(), media_type="multipart/x-mixed-replace; boundary=frame")
 
     def _config_sync_loop(self):
         while True:
+            due = time.monotonic() - self._last_full_sync >= CONFIG_RESYNC_INTERVAL
+            if not self._subscribed or due:
+                try:
+                    self._sync_config_from_central()
+                except Exception as e:
+                    print(f"[SYNC] Error syncing config: {e}")
+            time.sleep(CONFIG_SYNC_INTERVAL)
+
+    def _config_subscribe_loop(self):
+        """
+        Long-polls /hub/{HUB_ID}/config/changes and applies the deltas as they arrive.
+        While the central API is unreachable, _config_sync_loop keeps polling instead.
+        """
+        url = f"{CENTRAL_API_URL}/hub/{self.hub_id}/config/changes"
+        while True:
+            if self._config_version is None:
+                time.sleep(1)  # wait for the first full sync
+                continue
             try:
-                self._sync_config_from_central()
+                resp = self.session.get(
+                    url,
+                    params={"since": self._config_version, "timeout": CONFIG_LONG_POLL_TIMEOUT},
+                    timeout=CONFIG_LONG_POLL_TIMEOUT + 10,
+                )
+                resp.raise_for_status()
+                if not self._subscribed:
+                    print("[SYNC] Subscribed to config changes")
+                self._subscribed = True
+                self._apply_config_changes(resp.json())
             except Exception as e:
-                print(f"[SYNC] Error syncing config: {e}")
-            time.sleep(CONFIG_SYNC_INTERVAL)
+                if self._subscribed:
+                    print(f"[SYNC] Config subscription lost, falling back to polling: {e}")
+                self._subscribed = False
+                time.sleep(CONFIG_SYNC_INTERVAL)
+
+    def _apply_config_changes(self, changes: dict):
+        """
+        Applies pushed deltas to a copy of sensor_flags and swaps it in; camera deltas go to
+        the camera registry. Falls back to a full sync when the central API reports a reset
+        or the versions are not contiguous.
+        """
+        with self._config_lock:
+            contiguous = not changes.get("reset")
+            flags = dict(self.app.state.sensor_flags)
+            camera_ops = []
+            version = self._config_version
+            for event in changes.get("events", []) if contiguous else []:
+                if event["version"] <= version:
+                    continue  # already covered by a full sync
+                if event["version"] != version + 1:
+                    contiguous = False
+                    break
+                for op in event["ops"]:
+                    if op["op"] == "set":
+                        flags[op["key"]] = op["enabled"]
+                    elif op["op"] in ("camera", "camera_remove"):
+                        camera_ops.append(op)
+                    else:
+                        flags.pop(op["key"], None)
+                version = event["version"]
+            if contiguous:
+                if version != self._config_version:
+                    self.app.state.sensor_flags = flags
+                    if camera_ops and self.app.state.cameras is not None:
+                        self.app.state.cameras.apply_ops(camera_ops)
+                    self._config_version = version
+                    self._config_etag = changes.get("etag", self._config_etag)
+                    print(f"[SYNC] Applied config v{version}: {flags}")
+                return
+            # Deltas are missing: apply none of them and fetch the whole config
+            self._config_etag = None
+        print("[SYNC] Config deltas missing, resyncing")
+        self._sync_config_from_central()
 
     def _register_from_central(self):
         """
@@ -95,32 +250,44 @@ class HubApp:
             "ip": ip,
             "name": name,
         }
-        resp = requests.put(url, json=data)
+        resp = self.session.put(url, json=data, timeout=10)
         resp.raise_for_status()
         self.hub_id = resp.json().get("hub_id")
         print(f"[SYNC] Registered with central server: {resp.json()}")
 
     def _sync_config_from_central(self):
         """
-        Fetch /hub/{HUB_ID}/config -> sensors, update sensor_flags.
+        Fetch /hub/{HUB_ID}/config -> sensors, update sensor_flags; cameras go to the
+        camera registry.
 
         sensor_flags - mean "enabled" or "disabled" for each sensor.
         if enabled, process the alert.
         if disabled, skip the alert.
 
+        Sends the last ETag in If-None-Match; a 304 means nothing changed.
         """
         url = f"{CENTRAL_API_URL}/hub/{self.hub_id}/config"
-        resp = requests.get(url)
-        resp.raise_for_status()
-        new_flags: dict[str, bool] = {}
-        for node in resp.json().get("nodes", []):
-            node_key = node.get('location')
-            for sensor in node.get('sensors', []):
-                sensor_key = sensor.get('type')
-                enabled = sensor.get('status', '') == 'enabled'
-                key = f"{node_key}/{sensor_key}"
-                new_flags[key] = enabled
-        self.app.state.sensor_flags = new_flags
+        with self._config_lock:
+            headers = {"If-None-Match": self._config_etag} if self._config_etag else {}
+            resp = self.session.get(url, headers=headers, timeout=10)
+            self._last_full_sync = time.monotonic()
+            if resp.status_code == 304:
+                return
+            resp.raise_for_status()
+            config = resp.json()
+            new_flags: dict[str, bool] = {}
+            for node in config.get("nodes", []):
+                node_key = node.get('location')
+                for sensor in node.get('sensors', []):
+                    sensor_key = sensor.get('type')
+                    enabled = sensor.get('status', '') == 'enabled'
+                    key = f"{node_key}/{sensor_key}"
+                    new_flags[key] = enabled
+            self.app.state.sensor_flags = new_flags
+            if self.app.state.cameras is not None:
+                self.app.state.cameras.configure(config.get("cameras", []))
+            self._config_etag = resp.headers.get("ETag")
+            self._config_version = config.get("config_version")
         print(f"[SYNC] Updated sensor flags: {new_flags}")
 
     def run(self):
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from core.metrics import LatencyWindow
+from envs import (
+    IMAGE_DIR,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_THUMBNAIL_WIDTHS,
+    IMAGE_THUMBNAIL_QUALITY,
+    IMAGE_WRITERS,
+    IMAGE_WRITE_QUEUE_SIZE,
+)
+
+# <root>/ab/cd/<sha256>.jpg for the full image, <sha256>_<width>.jpg for its thumbnails
+CONTENT_NAME_RE = re.compile(r"^(?P<sha>[0-9a-f]{64})(?:_(?P<width>\d+))?\.jpg$")
+
+
+class ImageStore:
+    """
+    Content-addressed JPEG store.
+
+    Images are named by the SHA-256 of their bytes and sharded into two levels of
+    subdirectories, so identical images are stored once and a file never changes
+    once written. Thumbnails at each of `thumbnail_widths` are generated next to
+    the full image when it is stored. The paths returned are relative to the hub's
+    working directory, as stored in alerts.image_path, and are also the URL paths.
+
+    `put_frame_async` hands encoding and writing to `writers` background threads,
+    so callers on the alert path don't wait for the disk.
+    """
+    def __init__(
+        self,
+        root: str = IMAGE_DIR,
+        quality: int = IMAGE_JPEG_QUALITY,
+        thumbnail_widths: list[int] = IMAGE_THUMBNAIL_WIDTHS,
+        thumbnail_quality: int = IMAGE_THUMBNAIL_QUALITY,
+        writers: int = IMAGE_WRITERS,
+        write_queue_size: int = IMAGE_WRITE_QUEUE_SIZE,
+    ):
+        self.root = root
+        self.quality = quality
+        self.thumbnail_widths = sorted(thumbnail_widths)
+        self.thumbnail_quality = thumbnail_quality
+        os.makedirs(self.root, exist_ok=True)
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+        self.write_latency = LatencyWindow()
+
+        self._pending = queue.Queue(maxsize=write_queue_size)  # (frame, future)
+        for i in range(writers):
+            threading.Thread(target=self._write_loop, name=f"image-writer-{i}", daemon=True).start()
+
+    def path(self, sha256: str, width: int | None = None) -> str:
+        name = f"{sha256}_{width}.jpg" if width else f"{sha256}.jpg"
+        return os.path.join(self.root, sha256[:2], sha256[2:4], name)
+
+    def put_frame(self, frame: np.ndarray) -> str:
+        """
+        Encodes a BGR frame as JPEG and stores it. Returns the full image's path.
+        """
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        return self.put(encoded.tobytes(), frame)
+
+    def put_frame_async(self, frame: np.ndarray) -> Future:
+        """
+        Queues a frame for the writer threads. Returns a Future resolving to its path.
+        Blocks only while the write queue is full.
+        """
+        future = Future()
+        self._pending.put((frame, future))
+        return future
+
+    def _write_loop(self):
+        while True:
+            frame, future = self._pending.get()
+            started = time.monotonic()
+            try:
+                future.set_result(self.put_frame(frame))
+            except Exception as e:
+                self.write_errors += 1
+                future.set_exception(e)
+            self.write_latency.add(time.monotonic() - started)
+
+    def put(self, data: bytes, frame: np.ndarray | None = None) -> str:
+        """
+        Stores encoded JPEG bytes and their thumbnails unless already present.
+        Pass the decoded `frame` when available to skip decoding for thumbnails.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if os.path.exists(path):
+            # Mark the set as in use: retention spares recently touched files, so it
+            # can't delete them before the new alert pointing here is committed
+            if self._touch(path):
+                self.deduplicated += 1
+                return path
+        if frame is None:
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        # Thumbnails first: once the full image exists, the whole set does
+        for width in self.thumbnail_widths:
+            thumb = frame
+            if frame.shape[1] > width:
+                height = round(frame.shape[0] * width / frame.shape[1])
+                thumb = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+            if ok:
+                self._write(self.path(sha256, width), encoded.tobytes())
+        self._write(path, data)
+        self.stored += 1
+        return path
+
+    def _touch(self, path: str) -> bool:
+        """
+        Updates the mtime of the image and its thumbnails; False when the image is gone.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False  # deleted meanwhile: store it again
+        for thumbnail in self.thumbnails(path).values():
+            try:
+                os.utime(thumbnail)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temp file and rename, so readers never see a partial image
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.bytes_written += len(data)
+
+    def thumbnails(self, path: str | None) -> dict[int, str]:
+        """
+        Thumbnail paths by width for a stored image (full or thumbnail path).
+        Empty for images stored outside the content-addressed layout.
+        """
+        sha256 = content_hash(path)
+        if sha256 is None:
+            return {}
+        return {width: self.path(sha256, width) for width in self.thumbnail_widths}
+
+    def variants(self, path: str) -> list[str]:
+        """
+        Every file of the image at `path`: the full image and its thumbnails.
+        """
+        sha256 = content_hash(path)
+        if sha256 is None:
+            return [path]
+        return [self.path(sha256)] + list(self.thumbnails(path).values())
+
+    def largest_thumbnail(self, path: str) -> str | None:
+        thumbnails = self.thumbnails(path)
+        return thumbnails[max(thumbnails)] if thumbnails else None
+
+    def stats(self) -> dict:
+        return dict(
+            stored=self.stored,
+            deduplicated=self.deduplicated,
+            bytes_written=self.bytes_written,
+            queued=self._pending.qsize(),
+            write_errors=self.write_errors,
+            write=self.write_latency.snapshot(),
+        )
+
+
+def content_hash(path: str | None) -> str | None:
+    """
+    The SHA-256 a content-addressed file is named after (the full image's hash,
+    also for thumbnails); None for other paths.
+    """
+    match = CONTENT_NAME_RE.match(os.path.basename(path or ""))
+    return match.group("sha") if match else None
+
+
+def is_full_image(path: str) -> bool:
+    match = CONTENT_NAME_RE.match(os.path.basename(path))
+    return bool(match) and match.group("width") is None
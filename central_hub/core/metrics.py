@@ -0,0 +1,44 @@
+import math
+import threading
+from collections import deque
+
+
+class LatencyWindow:
+    """
+    Thread-safe sliding window of latency samples (seconds) with percentile summaries.
+    """
+    def __init__(self, size: int = 512):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns count, avg/p50/p95/p99/max in milliseconds over the current window.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return dict(count=count, avg_ms=None, p50_ms=None, p95_ms=None, p99_ms=None, max_ms=None)
+        return dict(
+            count=count,
+            avg_ms=round(sum(samples) / len(samples) * 1000, 2),
+            p50_ms=round(percentile(samples, 50) * 1000, 2),
+            p95_ms=round(percentile(samples, 95) * 1000, 2),
+            p99_ms=round(percentile(samples, 99) * 1000, 2),
+            max_ms=round(samples[-1] * 1000, 2),
+        )
+
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted, non-empty list.
+    """
+    rank = max(0, min(len(sorted_samples) - 1, math.ceil(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[rank]
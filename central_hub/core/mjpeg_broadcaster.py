@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import cv2
+
+from core.camera_capture import CameraCapture
+from core.metrics import LatencyWindow
+from envs import MJPEG_MAX_FPS, MJPEG_QUALITY
+
+
+class MJPEGBroadcaster:
+    """
+    Encodes each camera frame once and fans the same multipart chunk out to all viewers.
+
+    An encoder thread runs while at least one client is subscribed, limited to
+    `max_fps`. Finished chunks are published on the server's event loop, and each
+    client's async generator always yields the newest chunk, so slow consumers
+    skip frames instead of queueing them.
+    """
+    def __init__(self, camera: CameraCapture, max_fps: float = MJPEG_MAX_FPS, quality: int = MJPEG_QUALITY):
+        self.camera = camera
+        self.max_fps = max_fps
+        self.quality = quality
+
+        # Touched only on the event loop
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._chunk: bytes | None = None
+        self._seq = 0
+        self._new_frame = asyncio.Event()
+        self.subscribers = 0
+
+        self._active = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+        self.encode_latency = LatencyWindow()
+
+    async def stream(self):
+        """
+        Async generator of multipart/x-mixed-replace chunks for one client.
+        """
+        self._subscribe()
+        try:
+            seq = 0
+            while not self._closed:
+                if self._seq == seq:
+                    await self._new_frame.wait()
+                    continue
+                # Same bytes object for every client; frames published meanwhile are skipped
+                seq, chunk = self._seq, self._chunk
+                yield chunk
+        finally:
+            self._unsubscribe()
+
+    def _subscribe(self):
+        self._loop = asyncio.get_running_loop()
+        self.subscribers += 1
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mjpeg-encoder", daemon=True)
+                self._thread.start()
+        self._active.set()
+
+    def _unsubscribe(self):
+        self.subscribers -= 1
+        if self.subscribers == 0:
+            self._active.clear()
+
+    def close(self):
+        """
+        Stops the encoder thread and ends every client's stream (e.g. the camera was removed).
+        """
+        self._closed = True
+        self._active.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._new_frame.set)
+
+    def _publish(self, chunk: bytes):
+        self._chunk = chunk
+        self._seq += 1
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        event.set()
+
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        interval = 1.0 / self.max_fps if self.max_fps else 0.0
+        seq = 0
+        next_at = 0.0
+        while not self._closed:
+            self._active.wait()
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            item = self.camera.latest(after_seq=seq, timeout=1.0)
+            if item is None or self._closed:
+                continue
+            seq, _, frame = item
+            next_at = time.monotonic() + interval
+
+            started = time.monotonic()
+            ok, jpeg = cv2.imencode(".jpg", frame, params)
+            if not ok:
+                continue
+            chunk = (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n"
+                b"Content-Length: " + str(jpeg.nbytes).encode() + b"\r\n\r\n"
+                + jpeg.tobytes() + b"\r\n"
+            )
+            self.encode_latency.add(time.monotonic() - started)
+            self.frames_encoded += 1
+            self.bytes_encoded += len(chunk)
+            self._loop.call_soon_threadsafe(self._publish, chunk)
+
+    def stats(self) -> dict:
+        return dict(
+            subscribers=self.subscribers,
+            max_fps=self.max_fps,
+            quality=self.quality,
+            frames_encoded=self.frames_encoded,
+            avg_frame_bytes=self.bytes_encoded // self.frames_encoded if self.frames_encoded else None,
+            encode=self.encode_latency.snapshot(),
+        )
@@ -0,0 +1,92 @@
+import threading
+
+import cv2
+import numpy as np
+
+from envs import (
+    MOTION_FILTER_WIDTH,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_CHANGED,
+    MOTION_BACKGROUND_ALPHA,
+    MOTION_ROIS,
+)
+
+NO_CHANGE_DESCRIPTION = "No visible change"
+
+
+class MotionFilter:
+    """
+    Decides locally whether a frame shows meaningful change, before paying for a vision call.
+
+    Frames are downscaled to `width` pixels wide, converted to grayscale and blurred,
+    then compared with a running-average background. The frame counts as changed when
+    the fraction of region-of-interest pixels differing by more than `pixel_threshold`
+    reaches `min_changed`. Every checked frame is blended into the background with
+    weight `alpha`, so lighting drift and parked objects fade into the baseline.
+
+    `rois` is a list of (x, y, w, h) rectangles in 0..1 frame coordinates; empty means
+    the whole frame. Each camera (`key`) has its own background.
+    """
+    def __init__(
+        self,
+        width: int = MOTION_FILTER_WIDTH,
+        pixel_threshold: int = MOTION_PIXEL_THRESHOLD,
+        min_changed: float = MOTION_MIN_CHANGED,
+        alpha: float = MOTION_BACKGROUND_ALPHA,
+        rois: list = MOTION_ROIS,
+    ):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.alpha = alpha
+        self.rois = rois
+
+        # key -> (background, mask): float32 downscaled grayscale, and a bool mask of the same shape
+        self._backgrounds: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.unchanged = 0
+        self.last_changed_fraction: float | None = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+
+    def _build_mask(self, shape: tuple) -> np.ndarray:
+        if not self.rois:
+            return np.ones(shape, dtype=bool)
+        height, width = shape
+        mask = np.zeros(shape, dtype=bool)
+        for x, y, w, h in self.rois:
+            mask[int(y * height):int(np.ceil((y + h) * height)), int(x * width):int(np.ceil((x + w) * width))] = True
+        return mask
+
+    def has_changed(self, frame: np.ndarray, key: str = "default") -> bool:
+        gray = self._prepare(frame)
+        with self._lock:
+            self.checked += 1
+            background, mask = self._backgrounds.get(key, (None, None))
+            if background is None or background.shape != gray.shape:
+                # No baseline yet: nothing to compare against, let the frame through
+                self._backgrounds[key] = (gray, self._build_mask(gray.shape))
+                self.last_changed_fraction = None
+                return True
+            diff = np.abs(gray - background)
+            changed = np.count_nonzero((diff > self.pixel_threshold) & mask) / np.count_nonzero(mask)
+            background += self.alpha * (gray - background)
+            self.last_changed_fraction = float(changed)
+            if changed < self.min_changed:
+                self.unchanged += 1
+                return False
+            return True
+
+    def stats(self) -> dict:
+        return dict(
+            checked=self.checked,
+            unchanged=self.unchanged,
+            skip_rate=round(self.unchanged / self.checked, 3) if self.checked else None,
+            last_changed_fraction=self.last_changed_fraction,
+        )
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from envs import RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_MAX_DISTANCE, RESULT_CACHE_HASH
+
+
+class ResultCache:
+    """
+    Reuses vision descriptions for near-identical frames.
+
+    Frames are keyed by a 64-bit perceptual hash (dHash or aHash) of a downscaled
+    grayscale copy. A lookup hits when a live entry is within `max_distance` bits
+    (Hamming distance). Entries expire after `ttl` seconds and the least recently
+    used ones are evicted beyond `max_entries`. With `db_path` set, entries are
+    also written to an `analysis_cache` table so they survive restarts; that write
+    is best-effort and never fails the caller (the alert being processed).
+    """
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_SIZE,
+        ttl: float = RESULT_CACHE_TTL,
+        max_distance: int = RESULT_CACHE_MAX_DISTANCE,
+        method: str = RESULT_CACHE_HASH,
+        db_path: str | None = None,
+    ):
+        if method not in ("dhash", "ahash"):
+            raise ValueError(f"Unknown hash method: {method}")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.method = method
+        self.db_path = db_path
+
+        self._entries: OrderedDict[int, tuple[float, str]] = OrderedDict()  # hash -> (created, description)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persist_errors = 0
+
+        if db_path:
+            self._init_db()
+
+    def _init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                hash INTEGER PRIMARY KEY,
+                created REAL,
+                description TEXT
+            )
+        """
+        )
+        conn.execute("DELETE FROM analysis_cache WHERE created < ?", (time.time() - self.ttl,))
+        rows = conn.execute(
+            "SELECT hash, created, description FROM analysis_cache ORDER BY created DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        conn.commit()
+        conn.close()
+        for signed_hash, created, description in reversed(rows):
+            self._entries[signed_hash & 0xFFFFFFFFFFFFFFFF] = (created, description)
+
+    def hash(self, frame: np.ndarray) -> int:
+        """
+        64-bit perceptual hash of a BGR or grayscale frame.
+        """
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.method == "dhash":
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            bits = small[:, 1:] > small[:, :-1]
+        else:
+            small = cv2.resize(gray, (8, 8), interpolation=cv2.INTER_AREA)
+            bits = small > small.mean()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+    def lookup(self, key: int) -> str | None:
+        """
+        Returns the description of the closest live entry within `max_distance`, or None.
+        """
+        now = time.time()
+        with self._lock:
+            best, best_distance = None, self.max_distance + 1
+            for entry_key, (created, _) in list(self._entries.items()):
+                if now - created > self.ttl:
+                    del self._entries[entry_key]
+                    continue
+                distance = (entry_key ^ key).bit_count()
+                if distance < best_distance:
+                    best, best_distance = entry_key, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best][1]
+
+    def store(self, key: int, description: str):
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (created, description)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.db_path:
+            try:
+                self._persist(key, created, description)
+            except sqlite3.Error as e:
+                # The entry still serves from memory; losing it on restart is harmless
+                self.persist_errors += 1
+                print(f"[CACHE] Failed to persist cache entry: {e}")
+
+    def _persist(self, key: int, created: float, description: str):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                # SQLite integers are signed 64-bit
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache(hash, created, description) VALUES (?, ?, ?)",
+                    (key - (1 << 64) if key >= 1 << 63 else key, created, description),
+                )
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return dict(
+            entries=len(self._entries),
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=round(self.hits / lookups, 3) if lookups else None,
+            persist_errors=self.persist_errors,
+        )
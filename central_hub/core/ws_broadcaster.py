@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from envs import WS_CLIENT_QUEUE_SIZE
+
+
+class WebSocketBroadcaster:
+    """
+    Fans alerts out to /ws/alerts clients from the server's event loop.
+
+    `publish` may be called from any thread: the alert is serialized once and
+    handed to the loop with call_soon_threadsafe. Each client has its own bounded
+    queue drained by a sender task, so clients are written to concurrently and a
+    slow one cannot hold up the rest; a client whose queue overflows is evicted.
+    """
+    def __init__(self, queue_size: int = WS_CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._clients: dict[WebSocket, tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.published = 0
+        self.sent = 0
+        self.evicted = 0
+
+    async def serve(self, ws: WebSocket):
+        """
+        Registers an accepted websocket and keeps it until the client disconnects.
+        """
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._clients[ws] = (queue, asyncio.create_task(self._send_loop(ws, queue)))
+        try:
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            client = self._clients.pop(ws, None)
+            if client is not None:
+                client[1].cancel()
+
+    def publish(self, alert: dict):
+        """
+        Thread-safe; returns immediately.
+        """
+        if self._loop is None:
+            return  # nobody has ever connected
+        text = json.dumps(alert)
+        self._loop.call_soon_threadsafe(self._fanout, text)
+
+    def _fanout(self, text: str):
+        self.published += 1
+        for ws, (queue, sender) in list(self._clients.items()):
+            try:
+                queue.put_nowait(text)
+            except asyncio.QueueFull:
+                print("[WS] Evicting slow websocket client")
+                self.evicted += 1
+                del self._clients[ws]
+                sender.cancel()
+                asyncio.create_task(self._close(ws))
+
+    async def _send_loop(self, ws: WebSocket, queue: asyncio.Queue):
+        try:
+            while True:
+                await ws.send_text(await queue.get())
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Broken connection; the receive loop in serve() cleans up
+            self._clients.pop(ws, None)
+
+    async def _close(self, ws: WebSocket):
+        try:
+            await ws.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return dict(
+            clients=len(self._clients),
+            published=self.published,
+            sent=self.sent,
+            evicted=self.evicted,
+        )
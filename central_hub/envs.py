@@ -1,11 +1,138 @@
+import json
 import os
 
 DB_PATH = "alerts/alertdb.sqlite"
+# Alert store: "full" (fsync per alert), "normal" (group commit) or "off"; writer batching; reader pool size
+ALERT_DB_DURABILITY = os.getenv("ALERT_DB_DURABILITY", "normal")
+ALERT_DB_FLUSH_INTERVAL = float(os.getenv("ALERT_DB_FLUSH_INTERVAL", "0.05"))
+ALERT_DB_BATCH_SIZE = int(os.getenv("ALERT_DB_BATCH_SIZE", "256"))
+ALERT_DB_READERS = int(os.getenv("ALERT_DB_READERS", "4"))
+# Seconds the writer keeps retrying a batch while the database is busy or locked before failing it
+ALERT_DB_BUSY_RETRY_SECONDS = float(os.getenv("ALERT_DB_BUSY_RETRY_SECONDS", "60"))
 CAMERA_INDEX = 0
+# Local cameras as JSON [{"name": ..., "uri": ..., "coverage": ["node/sensor", "node/*", ...]}], used
+# until the central config defines cameras; empty = one camera at CAMERA_INDEX covering every sensor.
+# uri: device index, rtsp:// or http:// stream, or a video/image file (path or file://) replayed in a loop
+CAMERAS = json.loads(os.getenv("CAMERAS", "[]"))
+# Mosaic of a multi-camera incident: width (px) of each camera's tile
+CAMERA_MOSAIC_TILE_WIDTH = int(os.getenv("CAMERA_MOSAIC_TILE_WIDTH", "960"))
+# Decoded frames kept in memory by the capture thread, and frames discarded after opening the device
+CAMERA_BUFFER_SIZE = int(os.getenv("CAMERA_BUFFER_SIZE", "30"))
+CAMERA_WARMUP_FRAMES = int(os.getenv("CAMERA_WARMUP_FRAMES", "5"))
+# JPEG handed to the vision model in memory: max width (px, 0 = native) and quality
+CAMERA_ENCODE_MAX_WIDTH = int(os.getenv("CAMERA_ENCODE_MAX_WIDTH", "1024"))
+CAMERA_ENCODE_QUALITY = int(os.getenv("CAMERA_ENCODE_QUALITY", "85"))
 IMAGE_DIR = "images"
+# Content-addressed image store: JPEG quality of stored captures, and widths (px) and quality
+# of the thumbnails generated next to each one
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "95"))
+IMAGE_THUMBNAIL_WIDTHS = json.loads(os.getenv("IMAGE_THUMBNAIL_WIDTHS", "[160, 320, 640]"))
+IMAGE_THUMBNAIL_QUALITY = int(os.getenv("IMAGE_THUMBNAIL_QUALITY", "80"))
+# Background threads encoding and writing captures to disk, and frames queued for them
+IMAGE_WRITERS = int(os.getenv("IMAGE_WRITERS", "2"))
+IMAGE_WRITE_QUEUE_SIZE = int(os.getenv("IMAGE_WRITE_QUEUE_SIZE", "32"))
+# Pre/post-event clips: seconds recorded before and after each alert, in CLIP_DIR
+CLIP_ENABLED = os.getenv("CLIP_ENABLED", "true").lower() == "true"
+CLIP_DIR = "clips"
+CLIP_PRE_SECONDS = float(os.getenv("CLIP_PRE_SECONDS", "5"))
+CLIP_POST_SECONDS = float(os.getenv("CLIP_POST_SECONDS", "5"))
+# Per-camera memory cap of the rolling clip buffer: bytes of encoded frames, and frames
+CLIP_BUFFER_BYTES = int(os.getenv("CLIP_BUFFER_BYTES", str(16 * 1024 * 1024)))
+CLIP_BUFFER_FRAMES = int(os.getenv("CLIP_BUFFER_FRAMES", "600"))
+# Clip frame rate, max width (px, 0 = native) and JPEG quality
+CLIP_FPS = float(os.getenv("CLIP_FPS", "10"))
+CLIP_WIDTH = int(os.getenv("CLIP_WIDTH", "640"))
+CLIP_QUALITY = int(os.getenv("CLIP_QUALITY", "70"))
+# Shared MJPEG stream: encoder frame-rate cap and JPEG quality (0-100)
+MJPEG_MAX_FPS = float(os.getenv("MJPEG_MAX_FPS", "15"))
+MJPEG_QUALITY = int(os.getenv("MJPEG_QUALITY", "80"))
+# Alerts buffered per websocket client before it is considered too slow and disconnected
+WS_CLIENT_QUEUE_SIZE = int(os.getenv("WS_CLIENT_QUEUE_SIZE", "64"))
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 
+# Vision analysis: model, concurrent requests, per-request timeout (s), retries and circuit breaker
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+ANALYZER_MAX_CONCURRENCY = int(os.getenv("ANALYZER_MAX_CONCURRENCY", "4"))
+ANALYZER_TIMEOUT = float(os.getenv("ANALYZER_TIMEOUT", "30"))
+ANALYZER_MAX_RETRIES = int(os.getenv("ANALYZER_MAX_RETRIES", "2"))
+ANALYZER_BREAKER_THRESHOLD = int(os.getenv("ANALYZER_BREAKER_THRESHOLD", "5"))
+ANALYZER_BREAKER_RESET = float(os.getenv("ANALYZER_BREAKER_RESET", "30"))
+
+# Sensor events arriving within this many seconds of the first one are merged into one incident (0 = off)
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0.5"))
+
+# Perceptual-hash cache of vision results: entries, TTL (s), max Hamming distance (of 64 bits),
+# hash ("dhash" or "ahash"), and whether to keep it in the alert database across restarts
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_DISTANCE = int(os.getenv("RESULT_CACHE_MAX_DISTANCE", "5"))
+RESULT_CACHE_HASH = os.getenv("RESULT_CACHE_HASH", "dhash")
+RESULT_CACHE_PERSIST = os.getenv("RESULT_CACHE_PERSIST", "1") == "1"
+
+# Local motion pre-filter: downscale width (px), per-pixel gray-level threshold, fraction of
+# changed ROI pixels needed to call the vision API, background blend weight, and ROI rectangles
+# as JSON [[x, y, w, h], ...] in 0..1 frame coordinates (empty = whole frame)
+MOTION_FILTER_ENABLED = os.getenv("MOTION_FILTER_ENABLED", "1") == "1"
+MOTION_FILTER_WIDTH = int(os.getenv("MOTION_FILTER_WIDTH", "160"))
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+MOTION_MIN_CHANGED = float(os.getenv("MOTION_MIN_CHANGED", "0.01"))
+MOTION_BACKGROUND_ALPHA = float(os.getenv("MOTION_BACKGROUND_ALPHA", "0.1"))
+MOTION_ROIS = json.loads(os.getenv("MOTION_ROIS", "[]"))
+
 CENTRAL_API_URL = os.getenv("CENTRAL_API_URL", "http://localhost:8001")
 HUB_NAME = str(os.getenv("HUB_NAME", "HUB_NAME"))
-CONFIG_SYNC_INTERVAL = int(os.getenv("CONFIG_SYNC_INTERVAL", "10"))
\ No newline at end of file
+CONFIG_SYNC_INTERVAL = int(os.getenv("CONFIG_SYNC_INTERVAL", "10"))
+# Config changes are pushed over a long poll; polling above is only the fallback while
+# it is down, plus a full resync every CONFIG_RESYNC_INTERVAL seconds as a safety net.
+CONFIG_PUSH_ENABLED = os.getenv("CONFIG_PUSH_ENABLED", "true").lower() == "true"
+CONFIG_LONG_POLL_TIMEOUT = int(os.getenv("CONFIG_LONG_POLL_TIMEOUT", "25"))
+CONFIG_RESYNC_INTERVAL = int(os.getenv("CONFIG_RESYNC_INTERVAL", "300"))
+# Store-and-forward of alerts to the central API: alerts per gzip batch, seconds between
+# polls of the alert table, and the cap (s) on the retry backoff while offline
+ALERT_UPLOAD_ENABLED = os.getenv("ALERT_UPLOAD_ENABLED", "true").lower() == "true"
+ALERT_UPLOAD_BATCH_SIZE = int(os.getenv("ALERT_UPLOAD_BATCH_SIZE", "200"))
+ALERT_UPLOAD_INTERVAL = float(os.getenv("ALERT_UPLOAD_INTERVAL", "5"))
+ALERT_UPLOAD_MAX_BACKOFF = float(os.getenv("ALERT_UPLOAD_MAX_BACKOFF", "300"))
+
+# Retention: days alerts and their images are kept (0 = forever), per "node/sensor" overrides
+# as JSON ({"garage/PIR": 7, "door/*": 365, "*/Camera": 30}), days images stay at full
+# resolution before being downsampled to a thumbnail, and seconds between retention runs
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "90"))
+RETENTION_RULES = json.loads(os.getenv("RETENTION_RULES", "{}"))
+RETENTION_FULL_RES_DAYS = float(os.getenv("RETENTION_FULL_RES_DAYS", "7"))
+RETENTION_THUMBNAIL_WIDTH = int(os.getenv("RETENTION_THUMBNAIL_WIDTH", "320"))
+RETENTION_THUMBNAIL_QUALITY = int(os.getenv("RETENTION_THUMBNAIL_QUALITY", "70"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+
+# Alert pipeline: worker pool size, queue depth and overflow policy per stage.
+# Policies: "block" (backpressure), "drop_newest", "drop_oldest".
+PIPELINE_STAGES = {
+    "ingest": {
+        "workers": 1,
+        "depth": int(os.getenv("PIPELINE_INGEST_DEPTH", "256")),
+        "policy": os.getenv("PIPELINE_INGEST_POLICY", "drop_oldest"),
+    },
+    "capture": {
+        "workers": int(os.getenv("PIPELINE_CAPTURE_WORKERS", "1")),
+        "depth": int(os.getenv("PIPELINE_CAPTURE_DEPTH", "32")),
+        "policy": "block",
+    },
+    "analyze": {
+        "workers": int(os.getenv("PIPELINE_ANALYZE_WORKERS", "4")),
+        "depth": int(os.getenv("PIPELINE_ANALYZE_DEPTH", "32")),
+        "policy": "block",
+    },
+    "persist": {
+        "workers": 1,
+        "depth": int(os.getenv("PIPELINE_PERSIST_DEPTH", "128")),
+        "policy": "block",
+    },
+    "notify": {
+        "workers": 1,
+        "depth": int(os.getenv("PIPELINE_NOTIFY_DEPTH", "128")),
+        "policy": "drop_oldest",
+    },
+}
@@ -0,0 +1,390 @@
+"""
+hub_benchmark.py
+
+Hermetic end-to-end benchmark of the hub alert path:
+
+  publisher -> MQTT broker -> MQTTHandler -> AlertPipeline (camera, vision API,
+  AlertStore) -> /ws/alerts websocket -> subscriber
+
+Everything runs in this process and offline: an in-process MQTT broker, a fake
+camera replaying image files (or synthetic frames), and a stub vision server
+whose response time follows a configurable distribution. For each rate, alerts
+are published at that rate for `--duration` seconds and matched to the websocket
+notifications they produce, giving throughput, end-to-end latency, drops and memory.
+
+Usage:
+  python hub_benchmark.py --rates 5 20 50 --duration 20 \
+    --vision-latency lognormal:0.8,0.4 --analyzer-concurrency 16 --json bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import websockets
+
+from alerts.alert_db import AlertStore
+from alerts.mqtt_handler import MQTTHandler
+from alerts.pipeline import AlertPipeline
+from bench.background_server import BackgroundServer
+from bench.fake_camera import FakeCamera
+from bench.mqtt_broker import MQTTBroker
+from bench.stub_vision import StubVisionServer
+from core.ai_analyzer import AIAnalyzer
+from core.camera_registry import CameraRegistry
+from core.hub_app import HubApp
+from core.image_store import ImageStore
+from core.metrics import percentile
+from core.motion_filter import MotionFilter
+from core.result_cache import ResultCache
+from envs import COALESCE_WINDOW
+
+TOPIC = "home/sensor/+/+"
+RESULT_VERSION = 1
+
+
+class HubBenchmark:
+    """
+    Wires the real hub components to local stand-ins and measures the alert path.
+
+    Each published event carries a correlation id that the hub echoes in the
+    websocket notification, which matches it to the publish time. Events come from
+    `nodes` virtual nodes in turn. Events not notified within `drain_timeout`
+    seconds after publishing stops count as dropped.
+    """
+    def __init__(
+        self,
+        rates: list[float],
+        duration: float,
+        images: list[str] | None = None,
+        vision_latency: str = "lognormal:0.8,0.4",
+        vision_error_rate: float = 0.0,
+        analyzer_concurrency: int = 16,
+        qos: int = 0,
+        coalesce_window: float = COALESCE_WINDOW,
+        durability: str = "normal",
+        camera_fps: float = 15.0,
+        motion_filter: bool = False,
+        result_cache: bool = False,
+        drain_timeout: float = 30.0,
+        nodes: int = 50,
+        seed: int | None = None,
+    ):
+        self.rates = rates
+        self.duration = duration
+        self.images = images
+        self.vision_latency = vision_latency
+        self.vision_error_rate = vision_error_rate
+        self.analyzer_concurrency = analyzer_concurrency
+        self.qos = qos
+        self.coalesce_window = coalesce_window
+        self.durability = durability
+        self.camera_fps = camera_fps
+        self.motion_filter = motion_filter
+        self.result_cache = result_cache
+        self.drain_timeout = drain_timeout
+        self.nodes = nodes
+        self.seed = seed
+
+        self._sent: dict[str, float] = {}
+        self._received: dict[str, float] = {}
+        self._ws_connected = threading.Event()
+
+    def config(self) -> dict:
+        return dict(
+            rates=self.rates,
+            duration=self.duration,
+            images=self.images,
+            vision_latency=self.vision_latency,
+            vision_error_rate=self.vision_error_rate,
+            analyzer_concurrency=self.analyzer_concurrency,
+            qos=self.qos,
+            coalesce_window=self.coalesce_window,
+            durability=self.durability,
+            camera_fps=self.camera_fps,
+            motion_filter=self.motion_filter,
+            result_cache=self.result_cache,
+            drain_timeout=self.drain_timeout,
+            nodes=self.nodes,
+        )
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp(prefix="hub-bench-")
+        self.broker = MQTTBroker()
+        self.broker.start()
+        self.vision = StubVisionServer(self.vision_latency, self.vision_error_rate, seed=self.seed)
+        self.vision.start()
+
+        db_path = os.path.join(self.workdir, "alerts.sqlite")
+        self.store = AlertStore(db_path, durability=self.durability)
+        self.image_store = ImageStore(os.path.join(self.workdir, "images"))
+        self.camera = FakeCamera(self.images, fps=self.camera_fps, images=self.image_store)
+        self.cameras = CameraRegistry(self.image_store, static=[])
+        self.cameras.add(self.camera)
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        self.analyzer = AIAnalyzer(max_concurrency=self.analyzer_concurrency, base_url=self.vision.base_url)
+
+        self.hub = HubApp(connect_central=False, cameras=self.cameras)
+        state = self.hub.app.state
+        state.store = self.store
+        state.images = self.image_store
+        self.pipeline = AlertPipeline(
+            store=self.store,
+            cameras=self.cameras,
+            analyzer=self.analyzer,
+            app=self.hub.app,
+            cache=ResultCache(db_path=None) if self.result_cache else None,
+            motion_filter=MotionFilter() if self.motion_filter else None,
+        )
+        self.pipeline.coalescer.window = self.coalesce_window
+        self.pipeline.start()
+        self.server = BackgroundServer(self.hub.app)
+        self.server.start()
+
+        self._ws_thread = threading.Thread(target=self._ws_run, name="ws-subscriber", daemon=True)
+        self._ws_thread.start()
+        if not self._ws_connected.wait(10):
+            raise RuntimeError("Websocket subscriber did not connect")
+        self.mqtt_handler = MQTTHandler("127.0.0.1", self.broker.port, TOPIC, self.pipeline)
+        self.publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.publisher.connect("127.0.0.1", self.broker.port)
+        self.publisher.loop_start()
+
+    def teardown(self):
+        self.publisher.loop_stop()
+        self.publisher.disconnect()
+        self.mqtt_handler.stop()
+        self._ws_loop.call_soon_threadsafe(self._ws_task.cancel)
+        self._ws_thread.join()
+        self.server.stop()
+        self.pipeline.stop()
+        self.cameras.close()
+        self.store.flush()
+        self.vision.stop()
+        self.broker.stop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _ws_run(self):
+        self._ws_loop = asyncio.new_event_loop()
+        self._ws_task = self._ws_loop.create_task(self._ws_listen())
+        try:
+            self._ws_loop.run_until_complete(self._ws_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._ws_loop.close()
+
+    async def _ws_listen(self):
+        url = f"ws://{self.server.host}:{self.server.port}/ws/alerts"
+        async with websockets.connect(url, max_size=None) as ws:
+            # The broadcaster only starts publishing once a client is registered
+            while self.hub.app.state.ws_broadcaster.stats()["clients"] == 0:
+                await asyncio.sleep(0.01)
+            self._ws_connected.set()
+            async for message in ws:
+                received_at = time.perf_counter()
+                for correlation_id in json.loads(message).get("correlation_ids", []):
+                    self._received.setdefault(correlation_id, received_at)
+
+    def run_rate(self, rate: float, phase: int) -> dict:
+        before = self._counters()
+        rss = RSSSampler()
+        rss.start()
+        sent = []
+        interval = 1 / rate
+        started = time.perf_counter()
+        deadline = started + self.duration
+        next_at = started
+        while next_at < deadline:
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            correlation_id = f"{phase}-{len(sent)}"
+            node = f"bench{len(sent) % self.nodes}"
+            payload = json.dumps(dict(node=node, sensor="pir", ts=time.time(), correlation_id=correlation_id))
+            self._sent[correlation_id] = time.perf_counter()
+            self.publisher.publish(f"home/sensor/{node}/pir", payload, qos=self.qos)
+            sent.append(correlation_id)
+            next_at += interval
+        publish_seconds = time.perf_counter() - started
+
+        drain_deadline = time.perf_counter() + self.drain_timeout
+        while time.perf_counter() < drain_deadline and any(c not in self._received for c in sent):
+            time.sleep(0.05)
+        rss.stop()
+
+        received = [self._received[c] for c in sent if c in self._received]
+        latencies = sorted(self._received[c] - self._sent[c] for c in sent if c in self._received)
+        last = max(received, default=started)
+        after = self._counters()
+        return dict(
+            rate=rate,
+            sent=len(sent),
+            publish_rate=round(len(sent) / publish_seconds, 2),
+            notified=len(latencies),
+            dropped=len(sent) - len(latencies),
+            throughput=round(len(latencies) / (last - started), 2) if latencies else 0.0,
+            latency_ms=_latency_summary(latencies),
+            pipeline_dropped=after["pipeline_dropped"] - before["pipeline_dropped"],
+            pipeline_errors=after["pipeline_errors"] - before["pipeline_errors"],
+            ws_evicted=after["ws_evicted"] - before["ws_evicted"],
+            vision_requests=after["vision_requests"] - before["vision_requests"],
+            vision_errors=after["vision_errors"] - before["vision_errors"],
+            rss_mb=rss.summary(),
+        )
+
+    def _counters(self) -> dict:
+        stages = self.pipeline.stages
+        return dict(
+            pipeline_dropped=sum(stage.dropped for stage in stages),
+            pipeline_errors=sum(stage.errors for stage in stages),
+            ws_evicted=self.hub.app.state.ws_broadcaster.evicted,
+            vision_requests=self.vision.requests,
+            vision_errors=self.vision.errors,
+        )
+
+    def run_all(self) -> dict:
+        self.setup()
+        results = []
+        try:
+            for phase, rate in enumerate(self.rates):
+                print(f"=== {rate} alerts/s for {self.duration:.0f}s ===")
+                r = self.run_rate(rate, phase)
+                results.append(r)
+                print(
+                    f"  {r['notified']}/{r['sent']} notified, {r['throughput']} alerts/s, "
+                    f"p50 {r['latency_ms']['p50']} ms, p99 {r['latency_ms']['p99']} ms, "
+                    f"{r['dropped']} dropped, peak RSS {r['rss_mb']['peak']} MB\n"
+                )
+        finally:
+            self.teardown()
+        return dict(
+            benchmark="hub_alert_path",
+            version=RESULT_VERSION,
+            config=self.config(),
+            environment=_environment(),
+            results=results,
+            components=dict(broker=self.broker.stats(), vision=self.vision.stats()),
+        )
+
+
+class RSSSampler:
+    """
+    Samples this process's resident memory every `interval` seconds on a thread.
+    """
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.samples: list[int] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self.samples = [rss_bytes()]
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(rss_bytes())
+
+    def summary(self) -> dict:
+        mb = 1024 * 1024
+        return dict(
+            start=round(self.samples[0] / mb, 1),
+            peak=round(max(self.samples) / mb, 1),
+            end=round(self.samples[-1] / mb, 1),
+        )
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, in KiB on Linux
+
+
+def _latency_summary(sorted_seconds: list[float]) -> dict:
+    if not sorted_seconds:
+        return dict(p50=None, p90=None, p99=None, max=None, mean=None)
+    return dict(
+        p50=round(percentile(sorted_seconds, 50) * 1000, 1),
+        p90=round(percentile(sorted_seconds, 90) * 1000, 1),
+        p99=round(percentile(sorted_seconds, 99) * 1000, 1),
+        max=round(sorted_seconds[-1] * 1000, 1),
+        mean=round(sum(sorted_seconds) / len(sorted_seconds) * 1000, 1),
+    )
+
+
+def _environment() -> dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        revision = None
+    return dict(
+        git_revision=revision,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hermetic end-to-end benchmark of the hub alert path")
+    parser.add_argument("--rates", "-r", nargs="+", type=float, default=[5.0, 20.0],
+                        help="Published alerts per second, one phase per rate")
+    parser.add_argument("--duration", "-d", type=float, default=10.0, help="Seconds of publishing per rate")
+    parser.add_argument("--images", nargs="*", help="Image files or directories for the fake camera")
+    parser.add_argument("--vision-latency", default="lognormal:0.8,0.4",
+                        help="Stub vision response time: fixed:S, uniform:A,B, normal:MEAN,SD, "
+                             "lognormal:MEDIAN,SIGMA or exponential:MEAN (seconds)")
+    parser.add_argument("--vision-error-rate", type=float, default=0.0)
+    parser.add_argument("--analyzer-concurrency", type=int, default=16)
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument("--coalesce-window", type=float, default=COALESCE_WINDOW)
+    parser.add_argument("--durability", choices=("full", "normal", "off"), default="normal")
+    parser.add_argument("--camera-fps", type=float, default=15.0)
+    parser.add_argument("--motion-filter", action="store_true")
+    parser.add_argument("--result-cache", action="store_true")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--nodes", type=int, default=50, help="Virtual nodes the events rotate over")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    bench = HubBenchmark(
+        rates=args.rates,
+        duration=args.duration,
+        images=args.images,
+        vision_latency=args.vision_latency,
+        vision_error_rate=args.vision_error_rate,
+        analyzer_concurrency=args.analyzer_concurrency,
+        qos=args.qos,
+        coalesce_window=args.coalesce_window,
+        durability=args.durability,
+        camera_fps=args.camera_fps,
+        motion_filter=args.motion_filter,
+        result_cache=args.result_cache,
+        drain_timeout=args.drain_timeout,
+        nodes=args.nodes,
+        seed=args.seed,
+    )
+    report = bench.run_all()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
@@ -2,10 +2,28 @@ import os
 
 from core.ai_analyzer import AIAnalyzer
 from alerts.alert_db import AlertStore
-from core.camera_capture import CameraCapture
-from envs import IMAGE_DIR, DB_PATH, CAMERA_INDEX, MQTT_BROKER, MQTT_PORT
+from alerts.alert_uploader import AlertUploader, CURSOR_NAME as UPLOAD_CURSOR
+from alerts.retention import RetentionManager
+from core.camera_registry import CameraRegistry
+from core.image_store import ImageStore
+from core.motion_filter import MotionFilter
+from core.result_cache import ResultCache
+from envs import (
+    IMAGE_DIR,
+    CLIP_DIR,
+    CLIP_ENABLED,
+    DB_PATH,
+    MQTT_BROKER,
+    MQTT_PORT,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_PERSIST,
+    MOTION_FILTER_ENABLED,
+    ALERT_UPLOAD_ENABLED,
+    RETENTION_ENABLED,
+)
 from core.hub_app import HubApp
 from alerts.mqtt_handler import MQTTHandler
+from alerts.pipeline import AlertPipeline
 
 if __name__ == "__main__":
     # Ensure directories exist
@@ -13,21 +31,63 @@ if __name__ == "__main__":
 
     # Initialize components
     store = AlertStore(DB_PATH)
-    camera = CameraCapture(index=CAMERA_INDEX)
+    images = ImageStore(IMAGE_DIR)
+    # One capture thread, MJPEG stream and clip buffer per camera; the central config may replace them
+    cameras = CameraRegistry(images, clip_dir=CLIP_DIR if CLIP_ENABLED else None)
     analyzer = AIAnalyzer()
-    hub = HubApp()
+    cache = ResultCache(db_path=DB_PATH if RESULT_CACHE_PERSIST else None) if RESULT_CACHE_ENABLED else None
+    motion_filter = MotionFilter() if MOTION_FILTER_ENABLED else None
+    hub = HubApp(cameras=cameras)
     # Attach store to FastAPI state for route handlers
     hub.app.state.store = store
+    hub.app.state.stats_sources["store"] = store.stats
+    hub.app.state.images = images
+    hub.app.state.stats_sources["images"] = images.stats
+    hub.app.state.stats_sources["cameras"] = cameras.stats
+    hub.app.state.stats_sources["mjpeg"] = cameras.mjpeg_stats
+    if CLIP_ENABLED:
+        hub.app.state.stats_sources["clips"] = cameras.clip_stats
+    hub.app.state.stats_sources["analyzer"] = analyzer.stats
+
+    # Start alert processing pipeline
+    pipeline = AlertPipeline(
+        store=store,
+        cameras=cameras,
+        analyzer=analyzer,
+        app=hub.app,
+        cache=cache,
+        motion_filter=motion_filter,
+    )
+    pipeline.start()
+    hub.app.state.stats_sources["pipeline"] = pipeline.stats
+    if cache is not None:
+        hub.app.state.stats_sources["result_cache"] = cache.stats
+    if motion_filter is not None:
+        hub.app.state.stats_sources["motion_filter"] = motion_filter.stats
+
+    # Forward alerts to the central API in the background
+    if ALERT_UPLOAD_ENABLED:
+        uploader = AlertUploader(store, hub_id=hub.hub_id)
+        uploader.start()
+        hub.app.state.stats_sources["uploader"] = uploader.stats
+
+    # Expire old alerts and images, downsample aging images and compact the database
+    if RETENTION_ENABLED:
+        retention = RetentionManager(
+            store,
+            images,
+            protect_cursor=UPLOAD_CURSOR if ALERT_UPLOAD_ENABLED else None,
+            clip_dir=CLIP_DIR if CLIP_ENABLED else None,
+        )
+        retention.start()
+        hub.app.state.stats_sources["retention"] = retention.stats
 
     # Start MQTT subscriber
     mqtt_handler = MQTTHandler(
         broker=MQTT_BROKER,
         port=MQTT_PORT,
         topic="home/sensor/+/+",
-        store=store,
-        camera=camera,
-        analyzer=analyzer,
-        app=hub.app,
+        pipeline=pipeline,
     )
 
     # Launch the API server (includes REST, WS, MJPEG)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The hub's modules import each other as top-level packages (core, alerts, envs)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
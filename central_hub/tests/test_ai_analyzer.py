@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import pytest
+
+from core.ai_analyzer import AIAnalyzer, CircuitBreaker, CircuitOpenError
+
+
+def test_breaker_opens_and_lets_one_trial_through():
+    breaker = CircuitBreaker(threshold=2, reset_after=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is still running
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_does_not_wedge_the_breaker(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    analyzer = AIAnalyzer(max_retries=0, breaker_threshold=1, breaker_reset=0.05)
+
+    async def stalled(**kwargs):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(analyzer.client.responses, "create", stalled)
+    analyzer.breaker.record_failure()
+    time.sleep(0.06)
+    trial = asyncio.run_coroutine_threadsafe(analyzer.analyze_async(b"jpeg"), analyzer.loop)
+    time.sleep(0.05)
+    with pytest.raises(CircuitOpenError):
+        analyzer.analyze(b"jpeg")
+    trial.cancel()
+    time.sleep(0.1)
+    assert analyzer.stats()["errors"] == 1
+    assert analyzer.breaker.allow()
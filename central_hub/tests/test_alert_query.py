@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from alerts.alert_db import INSERT_ALERT, AlertStore
+from core.hub_app import HubApp
+from core.image_store import ImageStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AlertStore(str(tmp_path / "alerts.db"))
+
+
+def insert(store: AlertStore, *timestamps: int, node: str = "node", sensor: str = "sensor") -> list[int]:
+    """
+    Writes alerts with the given epoch-ms timestamps directly, returning their ids.
+    """
+    with sqlite3.connect(store.db_path) as conn:
+        return [
+            conn.execute(INSERT_ALERT, ("", ts, node, sensor, None, "", "[]", None)).lastrowid
+            for ts in timestamps
+        ]
+
+
+def walk(store: AlertStore, **filters) -> list[list[int]]:
+    """
+    The ids of every page, following the cursors to the end.
+    """
+    pages, cursor = [], None
+    while True:
+        alerts, cursor = store.query_alerts(cursor=cursor, **filters)
+        pages.append([alert["id"] for alert in alerts])
+        if cursor is None:
+            return pages
+
+
+def test_pages_split_equal_timestamps(store):
+    ids = insert(store, 1000, 2000, 2000, 2000, 2000, 3000)
+    pages = walk(store, limit=2)
+    # Newest first; rows sharing a ts are ordered by id and none is skipped or repeated
+    assert pages == [[ids[5], ids[4]], [ids[3], ids[2]], [ids[1], ids[0]], []]
+
+
+def test_cursor_is_ts_and_id(store):
+    ids = insert(store, 1000, 2000)
+    _, cursor = store.query_alerts(limit=1)
+    assert cursor == f"2000:{ids[1]}"
+
+
+def test_since_until(store):
+    ids = insert(store, 1000, 2000, 3000, 4000, 5000)
+    alerts, cursor = store.query_alerts(since=2000, until=4000)
+    assert [alert["id"] for alert in alerts] == [ids[3], ids[2]]
+    assert cursor is None
+    assert walk(store, since=1000, until=5000, limit=1) == [[ids[4]], [ids[3]], [ids[2]], [ids[1]], []]
+
+
+def test_node_filter_with_cursor(store):
+    a = insert(store, 1000, 2000, 3000, node="a")
+    insert(store, 1500, 2500, node="b")
+    assert walk(store, node="a", limit=2) == [[a[2], a[1]], [a[0]]]
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "1:2:3", "1000", "x:1"])
+def test_malformed_cursor(store, cursor):
+    with pytest.raises(ValueError):
+        store.query_alerts(cursor=cursor)
+
+
+def test_malformed_cursor_is_bad_request(store, tmp_path):
+    hub = HubApp(connect_central=False)
+    hub.app.state.store = store
+    hub.app.state.images = ImageStore(str(tmp_path / "images"))
+    insert(store, 1000, 2000)
+    client = TestClient(hub.app)
+    assert client.get("/alerts", params={"cursor": "nope"}).status_code == 400
+    response = client.get("/alerts", params={"limit": 1})
+    assert response.status_code == 200
+    assert client.get("/alerts", params={"cursor": response.headers["X-Next-Cursor"]}).status_code == 200
+
+
+def test_legacy_ts_backfill_skips_unreadable_timestamps(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE alerts (id INTEGER PRIMARY KEY, timestamp TEXT, node TEXT, sensor TEXT,"
+            " image_path TEXT, description TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO alerts(id, timestamp, node, sensor) VALUES (?, ?, 'node', 'sensor')",
+            [(1, "2024-01-02T03:04:05"), (2, None), (3, "yesterday")],
+        )
+    conn.close()
+    store = AlertStore(db_path)
+    with sqlite3.connect(db_path) as conn:
+        ts = dict(conn.execute("SELECT id, ts FROM alerts"))
+    conn.close()
+    assert ts[1] is not None and ts[2] is None and ts[3] is None
+    assert [alert["id"] for alert in store.query_alerts(since=0)[0]] == [1]
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from alerts.pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, Stage
+
+
+class StalledHandler:
+    """
+    Records jobs and holds the worker inside the first one until `release` is set.
+    """
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.jobs = []
+
+    def __call__(self, job):
+        self.started.set()
+        self.release.wait(5)
+        self.jobs.append(job)
+        return job
+
+
+def stalled_stage(policy: str, block_timeout: float | None = None) -> tuple[Stage, StalledHandler]:
+    """
+    A started depth-1 stage whose worker is stuck in job 0, so job 1 fills the queue.
+    """
+    handler = StalledHandler()
+    stage = Stage("test", handler, depth=1, policy=policy, block_timeout=block_timeout)
+    stage.start()
+    assert stage.submit(0)
+    assert handler.started.wait(5)
+    assert stage.submit(1)
+    return stage, handler
+
+
+def drain(stage: Stage, handler: StalledHandler):
+    handler.release.set()
+    stage.queue.join()
+    stage.stop()
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Stage("test", lambda job: job, policy="drop_everything")
+
+
+def test_block_waits_for_room():
+    stage, handler = stalled_stage(BLOCK, block_timeout=5)
+    threading.Timer(0.2, handler.release.set).start()
+    started = time.monotonic()
+    assert stage.submit(2)
+    assert time.monotonic() - started >= 0.1
+    drain(stage, handler)
+    assert handler.jobs == [0, 1, 2]
+    assert stage.stats()["dropped"] == 0
+
+
+def test_block_drops_after_timeout():
+    stage, handler = stalled_stage(BLOCK, block_timeout=0.1)
+    started = time.monotonic()
+    assert not stage.submit(2)
+    assert time.monotonic() - started >= 0.1
+    drain(stage, handler)
+    assert handler.jobs == [0, 1]
+    stats = stage.stats()
+    assert (stats["submitted"], stats["processed"], stats["dropped"]) == (3, 2, 1)
+
+
+def test_drop_newest_rejects_incoming():
+    stage, handler = stalled_stage(DROP_NEWEST)
+    assert not stage.submit(2)
+    assert not stage.submit(3)
+    drain(stage, handler)
+    assert handler.jobs == [0, 1]
+    stats = stage.stats()
+    assert (stats["submitted"], stats["processed"], stats["dropped"]) == (4, 2, 2)
+
+
+def test_drop_oldest_evicts_queued():
+    stage, handler = stalled_stage(DROP_OLDEST)
+    assert stage.submit(2)
+    assert stage.submit(3)
+    drain(stage, handler)
+    assert handler.jobs == [0, 3]
+    stats = stage.stats()
+    assert (stats["submitted"], stats["processed"], stats["dropped"]) == (4, 2, 2)
+
+
+def test_handler_error_is_counted_and_not_forwarded():
+    def handler(job):
+        if job == "bad":
+            raise RuntimeError("boom")
+        return job
+
+    forwarded = []
+    stage = Stage("test", handler)
+    stage.next = Stage("sink", forwarded.append)
+    stage.next.start()
+    stage.start()
+    for job in ("ok", "bad", "ok"):
+        stage.submit(job)
+    stage.queue.join()
+    stage.next.queue.join()
+    stage.stop()
+    stage.next.stop()
+    assert forwarded == ["ok", "ok"]
+    stats = stage.stats()
+    assert (stats["processed"], stats["errors"], stats["busy"]) == (3, 1, 0)
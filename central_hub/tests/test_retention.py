@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from alerts.alert_db import INSERT_ALERT, AlertStore
+from alerts.retention import RetentionManager
+from core.image_store import ImageStore
+
+DAY = 86_400
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AlertStore(str(tmp_path / "alerts.db"))
+
+
+@pytest.fixture
+def images(tmp_path):
+    return ImageStore(str(tmp_path / "images"))
+
+
+def retention(store: AlertStore, images: ImageStore, **kwargs) -> RetentionManager:
+    kwargs.setdefault("days", 30)
+    kwargs.setdefault("full_res_days", 0)
+    return RetentionManager(store, images, rules={}, **kwargs)
+
+
+def image(images: ImageStore, seed: int, days_old: float = 60) -> str:
+    """
+    Stores a random 640x480 frame and backdates its files.
+    """
+    frame = np.random.default_rng(seed).integers(0, 255, (480, 640, 3), np.uint8)
+    path = images.put_frame(frame)
+    mtime = time.time() - days_old * DAY
+    for variant in images.variants(path):
+        os.utime(variant, (mtime, mtime))
+    return path
+
+
+def alert(store: AlertStore, days_old: float, image_path: str | None = None) -> int:
+    row_id = store.add_alert("node", "pir", image_path, "motion").result()
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute("UPDATE alerts SET ts = ? WHERE id = ?", (int((time.time() - days_old * DAY) * 1000), row_id))
+    conn.close()
+    return row_id
+
+
+def ids(store: AlertStore) -> list[int]:
+    return sorted(a["id"] for a in store.alerts_after(0, limit=1000))
+
+
+def test_expires_only_old_alerts(store, images):
+    alert(store, 40)
+    new = alert(store, 10)
+    report = retention(store, images).run_once()
+    assert report["rows_deleted"] == 1
+    assert ids(store) == [new]
+
+
+def test_keeps_alerts_past_the_protect_cursor(store, images):
+    uploaded = [alert(store, 40) for _ in range(2)]
+    pending = [alert(store, 40) for _ in range(2)]
+    store.set_cursor("upload", uploaded[-1])
+    report = retention(store, images, protect_cursor="upload").run_once()
+    assert report["rows_deleted"] == 2
+    assert ids(store) == pending
+
+
+def test_shared_image_survives_expiry_of_one_alert(store, images):
+    path = image(images, seed=1)
+    alert(store, 40, path)
+    newer = alert(store, 10, path)
+    report = retention(store, images).run_once()
+    assert report["rows_deleted"] == 1 and report["images_deleted"] == 0
+    assert all(os.path.exists(variant) for variant in images.variants(path))
+
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute("UPDATE alerts SET ts = ? WHERE id = ?", (int((time.time() - 40 * DAY) * 1000), newer))
+    conn.close()
+    report = retention(store, images).run_once()
+    assert report["images_deleted"] == 1
+    assert not any(os.path.exists(variant) for variant in images.variants(path))
+
+
+def test_recently_deduplicated_image_survives_expiry(store, images):
+    path = image(images, seed=2)
+    alert(store, 40, path)
+    # A new capture of the same content, whose alert is not committed yet
+    with open(path, "rb") as f:
+        assert images.put(f.read()) == path
+    retention(store, images).run_once()
+    assert os.path.exists(path)
+
+
+def test_downsamples_past_full_res_days(store, images):
+    path = image(images, seed=3, days_old=5)
+    shared = image(images, seed=4, days_old=5)
+    old = alert(store, 5, path)
+    alert(store, 5, shared)
+    alert(store, 0, shared)
+    report = retention(store, images, full_res_days=2).run_once()
+    assert report["thumbnails"] == 1 and report["thumbnail_bytes_reclaimed"] > 0
+    thumbnail = images.largest_thumbnail(path)
+    assert store.alerts_after(old - 1, limit=1)[0]["image_path"] == thumbnail
+    assert os.path.exists(thumbnail) and not os.path.exists(path)
+    # Still the full image of the newer alert
+    assert os.path.exists(shared)
+
+
+def test_compacts_without_full_vacuum(store, images, monkeypatch):
+    old_ms = int((time.time() - 40 * DAY) * 1000)
+    with sqlite3.connect(store.db_path) as conn:
+        conn.executemany(INSERT_ALERT, [("", old_ms, "node", "pir", None, "x" * 1000, "[]", None)] * 200)
+    conn.close()
+    statements = []
+    connect = RetentionManager._connect
+
+    def traced_connect(self):
+        conn = connect(self)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(RetentionManager, "_connect", traced_connect)
+    report = retention(store, images).run_once()
+    assert report["rows_deleted"] == 200
+    assert report["vacuum"] == "incremental"
+    statements = [s.strip().upper() for s in statements]
+    assert "PRAGMA INCREMENTAL_VACUUM" in statements
+    assert not any(s.startswith("VACUUM") for s in statements)
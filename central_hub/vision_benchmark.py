@@ -1,25 +1,75 @@
+import argparse
+import asyncio
+import base64
+import csv
+import itertools
+import json
 import os
 import time
-import base64
+
+import cv2
+import numpy as np
 import requests
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAIError
+
+from bench.fake_camera import FakeCamera
+from bench.stub_vision import StubVisionServer
+from core.metrics import percentile
+
+CSV_FIELDS = [
+    "model", "concurrency", "width", "quality", "requests", "errors", "throughput_rps",
+    "p50_ms", "p90_ms", "p99_ms", "max_ms", "mean_ms",
+    "request_bytes_avg", "response_bytes_avg", "bytes_on_wire_total", "image_bytes_avg",
+]
+
 
 class VisionBenchmark:
     """
-    Benchmarks round-trip latency for a list of OpenAI Vision models.
-    Each iteration downloads a sample image from the internet, encodes it,
-    sends it to the model, and measures the elapsed time.
+    Benchmarks OpenAI Vision models (or anything serving the Responses API).
+
+    Images come from a local corpus, so runs are repeatable and need no internet:
+    only the API at `base_url` is contacted, and that can be the bundled stub
+    server. Each corpus image is re-encoded once per (width, JPEG quality)
+    variant up front. Every combination of model, concurrency, width and quality
+    then sends `requests` requests from `concurrency` concurrent workers, timed
+    with perf_counter. Results report latency percentiles, throughput and the
+    request/response bytes on the wire.
     """
 
-    def __init__(self, api_key: str, models: list[str], image_url: str):
+    def __init__(
+        self,
+        api_key: str,
+        models: list[str],
+        images: list[str] | None = None,
+        image_url: str | None = None,
+        base_url: str | None = None,
+        concurrency: list[int] = (1,),
+        widths: list[int] = (0,),
+        qualities: list[int] = (85,),
+        requests_per_run: int = 20,
+        warmup: int = 1,
+    ):
         """
-        :param api_key: Your OpenAI API key
+        :param api_key: Your OpenAI API key (any value for the stub server)
         :param models: List of OpenAI Vision-capable model names to benchmark
-        :param image_url: URL of a publicly accessible JPEG/PNG image
+        :param images: Local image files or directories (the corpus)
+        :param image_url: Downloaded once and used as the corpus when no images are given
+        :param base_url: API base URL, e.g. http://127.0.0.1:8010/v1 (default: OpenAI)
+        :param concurrency: Numbers of concurrent in-flight requests to test
+        :param widths: Image widths (px) to test; 0 keeps the original size
+        :param qualities: JPEG qualities (0-100) to test
+        :param requests_per_run: Requests per combination
+        :param warmup: Untimed requests per combination, to open connections first
         """
-        self.client = OpenAI(api_key=api_key)
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         self.models = models
+        self.images = images
         self.image_url = image_url
+        self.concurrency = list(concurrency)
+        self.widths = list(widths)
+        self.qualities = list(qualities)
+        self.requests_per_run = requests_per_run
+        self.warmup = warmup
 
         # A fixed prompt to accompany every image request:
         self.prompt_text = (
@@ -27,26 +77,46 @@ class VisionBenchmark:
             "Please provide a detailed description of the cause and appearance."
         )
 
-    def _download_and_encode(self) -> str:
+    def _load_corpus(self) -> list:
         """
-        Downloads the image at self.image_url and returns its Base64-encoded contents.
+        Decoded corpus frames: local images, else the downloaded image_url, else synthetic frames.
         """
-        response = requests.get(self.image_url, timeout=10)
-        response.raise_for_status()
-        image_bytes = response.content
-        encoded = base64.b64encode(image_bytes).decode("utf-8")
-        return encoded
+        if not self.images and self.image_url:
+            print(f"Downloading image from URL: {self.image_url}")
+            response = requests.get(self.image_url, timeout=10)
+            response.raise_for_status()
+            frame = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise RuntimeError("Downloaded image could not be decoded")
+            return [frame]
+        return FakeCamera(self.images).load_frames()
 
-    def benchmark_once(self, model: str, encoded_image: str) -> float:
+    def _encode_variants(self, frames: list) -> dict[tuple[int, int], list[str]]:
         """
-        Sends a single request to the specified model with the encoded_image + prompt,
-        measures, and returns the elapsed time in seconds.
+        Base64 JPEGs of every corpus frame for each (width, quality).
+        """
+        variants = {}
+        for width, quality in itertools.product(self.widths, self.qualities):
+            encoded = []
+            for frame in frames:
+                if width and frame.shape[1] > width:
+                    height = round(frame.shape[0] * width / frame.shape[1])
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if not ok:
+                    raise RuntimeError("JPEG encoding failed")
+                encoded.append(base64.b64encode(jpeg.tobytes()).decode("utf-8"))
+            variants[(width, quality)] = encoded
+        return variants
+
+    async def benchmark_once(self, model: str, encoded_image: str) -> tuple[float, int, int]:
+        """
+        Sends a single request to the specified model with the encoded_image + prompt.
 
         :param model: OpenAI model name
-        :param encoded_image: Base64-encoded JPEG/PNG string (no "data:" prefix)
-        :return: elapsed time in seconds
+        :param encoded_image: Base64-encoded JPEG string (no "data:" prefix)
+        :return: (elapsed seconds, request body bytes, response body bytes)
         """
-        # Wrap into the same format as your existing code but with minimal overhead
         payload = [
             {
                 "role": "user",
@@ -57,58 +127,144 @@ class VisionBenchmark:
             }
         ]
 
-        start = time.time()
+        start = time.perf_counter()
         try:
-            _ = self.client.responses.create(model=model, input=payload)
+            raw = await self.client.responses.with_raw_response.create(model=model, input=payload)
+            raw.parse()
         except OpenAIError as e:
-            # If the request fails (e.g., model not enabled), we re-raise or handle accordingly
             raise RuntimeError(f"Request to model {model} failed: {e}") from e
-        end = time.time()
-        return end - start
+        elapsed = time.perf_counter() - start
+        return elapsed, len(raw.http_response.request.content), len(raw.http_response.content)
 
-    def run_all(self, repeat: int = 1) -> None:
+    async def run_config(self, model: str, concurrency: int, images: list[str]) -> dict:
         """
-        For each model in self.models, runs `self.benchmark_once` `repeat` times and prints the average time.
+        Sends `requests_per_run` requests from `concurrency` workers, cycling over `images`.
         """
-        # Download & encode once (so we are only measuring network+inference, not repeated download)
-        print(f"Downloading image from URL: {self.image_url}")
-        encoded_image = self._download_and_encode()
-        print("Image downloaded and encoded.\n")
+        for i in range(self.warmup):
+            try:
+                await self.benchmark_once(model, images[i % len(images)])
+            except RuntimeError:
+                pass
+        counter = itertools.count()
+        latencies, request_bytes, response_bytes, errors = [], [], [], []
 
-        for model in self.models:
-            print(f"=== Benchmarking model: {model} ===")
-            timings = []
-            for i in range(repeat):
+        async def worker():
+            while (i := next(counter)) < self.requests_per_run:
                 try:
-                    elapsed = self.benchmark_once(model, encoded_image)
-                    timings.append(elapsed)
-                    print(f"  Run #{i+1}: {elapsed:.3f} seconds")
+                    elapsed, sent, received = await self.benchmark_once(model, images[i % len(images)])
                 except RuntimeError as e:
-                    print(f"  ❌ Error on run #{i+1}: {e}")
-                    # If you want to skip further attempts for this model, break here:
-                    break
+                    errors.append(str(e))
+                    continue
+                latencies.append(elapsed)
+                request_bytes.append(sent)
+                response_bytes.append(received)
 
-            if timings:
-                avg = sum(timings) / len(timings)
-                print(f"  → Average over {len(timings)} run(s): {avg:.3f} seconds\n")
-            else:
-                print(f"  → No successful runs for model {model}\n")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        latencies.sort()
+        ms = lambda pct: round(percentile(latencies, pct) * 1000, 1) if latencies else None
+        avg = lambda values: round(sum(values) / len(values)) if values else None
+        return dict(
+            requests=len(latencies),
+            errors=len(errors),
+            throughput_rps=round(len(latencies) / wall, 2),
+            p50_ms=ms(50),
+            p90_ms=ms(90),
+            p99_ms=ms(99),
+            max_ms=ms(100),
+            mean_ms=round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            request_bytes_avg=avg(request_bytes),
+            response_bytes_avg=avg(response_bytes),
+            bytes_on_wire_total=sum(request_bytes) + sum(response_bytes),
+            image_bytes_avg=round(sum(len(image) for image in images) * 3 / 4 / len(images)),
+            first_error=errors[0] if errors else None,
+        )
 
+    async def _run_all(self) -> list[dict]:
+        frames = self._load_corpus()
+        print(f"Corpus: {len(frames)} image(s)")
+        variants = self._encode_variants(frames)
+        results = []
+        for model in self.models:
+            print(f"=== Benchmarking model: {model} ===")
+            for concurrency, (width, quality) in itertools.product(self.concurrency, variants):
+                r = await self.run_config(model, concurrency, variants[(width, quality)])
+                r = dict(model=model, concurrency=concurrency, width=width, quality=quality, **r)
+                results.append(r)
+                print(
+                    f"  c={concurrency:<3} width={width or 'native':<6} q={quality:<3} "
+                    f"{r['throughput_rps']:>7} req/s  p50 {r['p50_ms']} ms  p99 {r['p99_ms']} ms  "
+                    f"{r['request_bytes_avg']} B/request  {r['errors']} error(s)"
+                )
+                if r["first_error"]:
+                    print(f"    ❌ {r['first_error']}")
+            print()
+        await self.client.close()
+        return results
 
-if __name__ == "__main__":
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("Please set the OPENAI_API_KEY environment variable.")
+    def run_all(self) -> list[dict]:
+        """
+        Runs every combination for each model in self.models and returns one result row per combination.
+        """
+        return asyncio.run(self._run_all())
+
+
+def write_csv(path: str, results: list[dict]):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
 
-    vision_models = [
-        "o4-mini",
-        "gpt-4.1-nano",
-        "gpt-4.1-mini"
-    ]
 
-    sample_image_url = "https://i.reddituploads.com/aaf2fe36806744fbb33931bfa7a49522?fit=max&h=1536&w=1536&s=fe1252bc2c0ab3a4fb1ace5f34e541ae"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vision models over a local image corpus")
+    parser.add_argument("--models", nargs="+", default=["o4-mini", "gpt-4.1-nano", "gpt-4.1-mini"])
+    parser.add_argument("--images", nargs="*", help="Image files or directories (default: synthetic frames)")
+    parser.add_argument("--image-url", help="Download this image as the corpus instead")
+    parser.add_argument("--base-url", help="Responses API base URL (default: OpenAI)")
+    parser.add_argument("--stub", action="store_true", help="Start the bundled stub server and benchmark it")
+    parser.add_argument("--stub-latency", default="lognormal:0.8,0.4", help="Stub response time distribution")
+    parser.add_argument("--concurrency", "-c", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--widths", nargs="+", type=int, default=[0, 1024, 512], help="0 = original size")
+    parser.add_argument("--qualities", nargs="+", type=int, default=[85])
+    parser.add_argument("--requests", "-n", type=int, default=20, help="Requests per combination")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--csv", help="Write one row per combination to this CSV file")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
 
-    runs_per_model = 3
+    stub = None
+    base_url = args.base_url
+    api_key = os.getenv("OPENAI_API_KEY")
+    if args.stub:
+        stub = StubVisionServer(args.stub_latency)
+        stub.start()
+        base_url = stub.base_url
+        api_key = api_key or "stub"
+    if not api_key:
+        raise RuntimeError("Please set the OPENAI_API_KEY environment variable (or use --stub).")
 
-    bench = VisionBenchmark(api_key=api_key, models=vision_models, image_url=sample_image_url)
-    bench.run_all(repeat=runs_per_model)
+    bench = VisionBenchmark(
+        api_key=api_key,
+        models=args.models,
+        images=args.images,
+        image_url=args.image_url,
+        base_url=base_url,
+        concurrency=args.concurrency,
+        widths=args.widths,
+        qualities=args.qualities,
+        requests_per_run=args.requests,
+        warmup=args.warmup,
+    )
+    try:
+        results = bench.run_all()
+    finally:
+        if stub is not None:
+            stub.stop()
+    if args.csv:
+        write_csv(args.csv, results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(base_url=base_url, stub_latency=args.stub_latency if stub else None, results=results),
+                      f, indent=2)
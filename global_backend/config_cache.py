@@ -0,0 +1,44 @@
+# config_cache.py
+import threading
+
+
+class HubConfigCache:
+    """
+    Serialized GET /hub/{hub_id}/config responses as (etag, body), one per hub.
+    crud invalidates a hub's entry whenever its hub, nodes or sensors change.
+    """
+    def __init__(self):
+        self._bodies: dict[int, tuple[str, bytes]] = {}
+        self._generations: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hub_id: int) -> tuple[tuple[str, bytes] | None, int]:
+        """
+        Returns (cached (etag, body) or None, generation). Pass the generation back to
+        put() so a body rendered from data read before an invalidation is not cached.
+        """
+        with self._lock:
+            body = self._bodies.get(hub_id)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return body, self._generations.get(hub_id, 0)
+
+    def put(self, hub_id: int, body: tuple[str, bytes], generation: int):
+        with self._lock:
+            if self._generations.get(hub_id, 0) == generation:
+                self._bodies[hub_id] = body
+
+    def invalidate(self, hub_id: int | None):
+        with self._lock:
+            self._bodies.pop(hub_id, None)
+            self._generations[hub_id] = self._generations.get(hub_id, 0) + 1
+
+    def stats(self) -> dict:
+        return dict(entries=len(self._bodies), hits=self.hits, misses=self.misses)
+
+
+hub_config_cache = HubConfigCache()
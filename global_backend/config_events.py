@@ -0,0 +1,77 @@
+# config_events.py
+import asyncio
+import threading
+from collections import deque
+
+# Config events kept per hub for hubs that fall behind
+CONFIG_EVENT_HISTORY = 256
+
+
+class ConfigEventBus:
+    """
+    In-process log of config deltas per hub, for hubs long-polling
+    GET /hub/{hub_id}/config/changes.
+
+    Each event is {"version": <config_version>, "ops": [...]} where an op is
+    {"op": "set", "key": "<location>/<type>", "enabled": bool} or
+    {"op": "remove", "key": "<location>/<type>"}. crud publishes after commit,
+    from any thread; waiters on the event loop are woken thread-safely.
+
+    State lives in this process only: with several workers, or after a restart,
+    hubs detect the version gap and fall back to a full config fetch.
+    """
+    def __init__(self, history: int = CONFIG_EVENT_HISTORY):
+        self.history = history
+        self._events: dict[int, deque] = {}
+        self._waiters: dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, hub_id: int, version: int, ops: list[dict]):
+        with self._lock:
+            events = self._events.setdefault(hub_id, deque(maxlen=self.history))
+            events.append({"version": version, "ops": ops})
+            waiters = self._waiters.pop(hub_id, set())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _since(self, hub_id: int, version: int) -> list[dict] | None:
+        """
+        Events newer than `version` in version order; None if some were already
+        dropped from the history and the hub has to resync.
+        """
+        events = sorted(
+            (event for event in self._events.get(hub_id, ()) if event["version"] > version),
+            key=lambda event: event["version"],
+        )
+        if events and len(self._events[hub_id]) == self.history and events[0]["version"] > version + 1:
+            return None
+        return events
+
+    async def wait(self, hub_id: int, version: int, timeout: float) -> list[dict] | None:
+        """
+        Returns events newer than `version` as soon as there are any, or [] after `timeout`.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            events = self._since(hub_id, version)
+            if events != []:
+                return events
+            waiter = (loop, loop.create_future())
+            self._waiters.setdefault(hub_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.get(hub_id, set()).discard(waiter)
+        with self._lock:
+            return self._since(hub_id, version)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+config_events = ConfigEventBus()
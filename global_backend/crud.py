@@ -1,8 +1,79 @@
 # crud.py
-from sqlalchemy.orm import Session
+import json
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
 import models, schemas
 from datetime import datetime
 
+from config_cache import hub_config_cache
+from config_events import config_events
+
+# --- Config versioning ---
+def _bump_config_version(db: Session, hub_id: int) -> int:
+    """
+    Atomically increments the hub's config_version in the current transaction
+    and returns the new value.
+    """
+    db.query(models.Hub).filter(models.Hub.id == hub_id).update(
+        {models.Hub.config_version: models.Hub.config_version + 1},
+        synchronize_session=False,
+    )
+    return db.query(models.Hub.config_version).filter(models.Hub.id == hub_id).scalar()
+
+def _config_committed(hub_id: int, version: int | None, ops: list[dict]):
+    """
+    Called after commit: drops the cached config and pushes the delta to subscribed hubs.
+    """
+    hub_config_cache.invalidate(hub_id)
+    if version is not None:
+        config_events.publish(hub_id, version, ops)
+
+def _set_flag(location: str, sensor: models.Sensor) -> dict:
+    return {"op": "set", "key": f"{location}/{sensor.type}", "enabled": sensor.status == "enabled"}
+
+def _remove_flag(location: str, sensor_type: str) -> dict:
+    return {"op": "remove", "key": f"{location}/{sensor_type}"}
+
+def _set_camera(camera: models.Camera) -> dict:
+    return {"op": "camera", "camera": schemas.Camera.model_validate(camera, from_attributes=True).model_dump()}
+
+def _remove_camera(name: str) -> dict:
+    return {"op": "camera_remove", "name": name}
+
+# --- Sensor counts ---
+# Node.sensor_count is denormalized. Writers adjust it with an atomic
+# `sensor_count = sensor_count + n` UPDATE rather than read-modify-write in Python,
+# so concurrent provisioning cannot lose updates; it is never taken from clients.
+# reconcile_sensor_counts repairs any drift.
+def _adjust_sensor_count(db: Session, node_id: int, delta: int):
+    db.execute(
+        update(models.Node)
+        .where(models.Node.id == node_id)
+        .values(sensor_count=func.coalesce(models.Node.sensor_count, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+def reconcile_sensor_counts(db: Session) -> int:
+    """
+    Recomputes sensor_count from the sensors table for every node whose stored
+    value is off, in one correlated UPDATE. Returns the number of nodes repaired.
+    """
+    count = (
+        select(func.count(models.Sensor.id))
+        .where(models.Sensor.node_id == models.Node.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(models.Node)
+        .where(models.Node.sensor_count.is_distinct_from(count))
+        .values(sensor_count=count)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
 # --- Hubs ---
 def get_hubs(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Hub).offset(skip).limit(limit).all()
@@ -13,6 +84,28 @@ def get_hub(db: Session, hub_id: int):
 def get_hub_by_name(db: Session, hub_name: str):
     return db.query(models.Hub).filter(models.Hub.name == hub_name).first()
 
+def register_hub(db: Session, hub: schemas.HubCreate) -> tuple[str, int]:
+    """
+    Creates the hub, or updates the ip of the hub with the same name.
+    Returns (status, hub_id).
+    """
+    db_hub = get_hub_by_name(db, hub.name)
+    if db_hub:
+        update_hub(db, db_hub.id, schemas.HubCreate(name=db_hub.name, ip=hub.ip, last_seen=datetime.utcnow()))
+        return "updated", db_hub.id
+    return "registered", create_hub(db, hub).id
+
+def get_hub_config(db: Session, hub_id: int):
+    """
+    Hub with its nodes and their sensors, loaded in a single joined query.
+    """
+    return (
+        db.query(models.Hub)
+        .options(joinedload(models.Hub.nodes).joinedload(models.Node.sensors))
+        .filter(models.Hub.id == hub_id)
+        .first()
+    )
+
 def create_hub(db: Session, hub: schemas.HubCreate):
     db_hub = models.Hub(
         name=hub.name,
@@ -31,7 +124,9 @@ def update_hub(db: Session, hub_id: int, hub: schemas.HubCreate):
     db_hub.name = hub.name
     db_hub.ip = hub.ip
     db_hub.last_seen = hub.last_seen or db_hub.last_seen
+    version = _bump_config_version(db, hub_id)
     db.commit()
+    _config_committed(hub_id, version, [])
     db.refresh(db_hub)
     return db_hub
 
@@ -40,6 +135,7 @@ def delete_hub(db: Session, hub_id: int):
     if db_hub:
         db.delete(db_hub)
         db.commit()
+        _config_committed(hub_id, None, [])
     return db_hub
 
 # --- Nodes ---
@@ -61,10 +157,12 @@ def create_node(db: Session, hub_id: int, node: schemas.NodeCreate):
         ip=node.ip,
         location=node.location,
         status=node.status,
-        sensor_count=node.sensor_count or 0
+        sensor_count=0
     )
     db.add(db_node)
+    version = _bump_config_version(db, hub_id)
     db.commit()
+    _config_committed(hub_id, version, [])
     db.refresh(db_node)
     return db_node
 
@@ -72,21 +170,78 @@ def update_node(db: Session, node_id: int, node: schemas.NodeCreate):
     db_node = get_node(db, node_id)
     if not db_node:
         return None
+    ops = []
+    if node.location != db_node.location:
+        # Flags are keyed by location: move every sensor's flag to the new key
+        ops = [_remove_flag(db_node.location, s.type) for s in db_node.sensors]
+        ops += [_set_flag(node.location, s) for s in db_node.sensors]
     db_node.ip = node.ip
     db_node.location = node.location
     db_node.status = node.status
-    db_node.sensor_count = node.sensor_count
+    hub_id = db_node.hub_id
+    version = _bump_config_version(db, hub_id)
     db.commit()
+    _config_committed(hub_id, version, ops)
     db.refresh(db_node)
     return db_node
 
 def delete_node(db: Session, node_id: int):
     db_node = get_node(db, node_id)
     if db_node:
+        hub_id = db_node.hub_id
+        ops = [_remove_flag(db_node.location, s.type) for s in db_node.sensors]
         db.delete(db_node)
+        version = _bump_config_version(db, hub_id)
         db.commit()
+        _config_committed(hub_id, version, ops)
     return db_node
 
+# --- Cameras ---
+def get_cameras(db: Session, hub_id: int):
+    return db.query(models.Camera).filter(models.Camera.hub_id == hub_id).order_by(models.Camera.id).all()
+
+def get_camera(db: Session, camera_id: int):
+    return db.query(models.Camera).filter(models.Camera.id == camera_id).first()
+
+def create_camera(db: Session, hub_id: int, camera: schemas.CameraCreate):
+    if not get_hub(db, hub_id):
+        return None
+    db_camera = models.Camera(hub_id=hub_id, name=camera.name, uri=camera.uri, status=camera.status)
+    db_camera.coverage = camera.coverage
+    db.add(db_camera)
+    version = _bump_config_version(db, hub_id)
+    db.commit()
+    db.refresh(db_camera)
+    _config_committed(hub_id, version, [_set_camera(db_camera)])
+    return db_camera
+
+def update_camera(db: Session, camera_id: int, camera: schemas.CameraCreate):
+    db_camera = get_camera(db, camera_id)
+    if not db_camera:
+        return None
+    # Hubs key cameras by name: a rename replaces the old camera
+    ops = [_remove_camera(db_camera.name)] if camera.name != db_camera.name else []
+    db_camera.name = camera.name
+    db_camera.uri = camera.uri
+    db_camera.status = camera.status
+    db_camera.coverage = camera.coverage
+    hub_id = db_camera.hub_id
+    version = _bump_config_version(db, hub_id)
+    db.commit()
+    db.refresh(db_camera)
+    _config_committed(hub_id, version, ops + [_set_camera(db_camera)])
+    return db_camera
+
+def delete_camera(db: Session, camera_id: int):
+    db_camera = get_camera(db, camera_id)
+    if db_camera:
+        hub_id = db_camera.hub_id
+        db.delete(db_camera)
+        version = _bump_config_version(db, hub_id)
+        db.commit()
+        _config_committed(hub_id, version, [_remove_camera(db_camera.name)])
+    return db_camera
+
 # --- Sensors ---
 def get_sensors(db: Session, node_id: int, skip: int = 0, limit: int = 100):
     return (
@@ -108,11 +263,14 @@ def create_sensor(db: Session, node_id: int, sensor: schemas.SensorCreate):
         status=sensor.status
     )
     db.add(db_sensor)
-    # update parent node's sensor_count
-    parent = db.query(models.Node).get(node_id)
+    parent = db.get(models.Node, node_id)
     if parent:
-        parent.sensor_count = (parent.sensor_count or 0) + 1
+        _adjust_sensor_count(db, node_id, +1)
+    hub_id = parent.hub_id if parent else None
+    version = _bump_config_version(db, hub_id) if parent else None
+    ops = [_set_flag(parent.location, db_sensor)] if parent else []
     db.commit()
+    _config_committed(hub_id, version, ops)
     db.refresh(db_sensor)
     return db_sensor
 
@@ -120,20 +278,268 @@ def update_sensor(db: Session, sensor_id: int, sensor: schemas.SensorCreate):
     db_sensor = get_sensor(db, sensor_id)
     if not db_sensor:
         return None
+    location = db_sensor.node.location
+    ops = [_remove_flag(location, db_sensor.type)] if sensor.type != db_sensor.type else []
     db_sensor.type   = sensor.type
     db_sensor.pin    = sensor.pin
     db_sensor.status = sensor.status
+    ops.append(_set_flag(location, db_sensor))
+    hub_id = db_sensor.node.hub_id
+    version = _bump_config_version(db, hub_id)
     db.commit()
+    _config_committed(hub_id, version, ops)
     db.refresh(db_sensor)
     return db_sensor
 
 def delete_sensor(db: Session, sensor_id: int):
     db_sensor = get_sensor(db, sensor_id)
     if db_sensor:
-        # update parent node's sensor_count
         parent = db_sensor.node
-        if parent and parent.sensor_count:
-            parent.sensor_count = parent.sensor_count - 1
+        hub_id = parent.hub_id if parent else None
         db.delete(db_sensor)
+        if parent:
+            _adjust_sensor_count(db, parent.id, -1)
+        version = _bump_config_version(db, hub_id) if parent else None
+        ops = [_remove_flag(parent.location, db_sensor.type)] if parent else []
         db.commit()
+        _config_committed(hub_id, version, ops)
     return db_sensor
+
+# --- Bulk operations ---
+# Each runs as one transaction: a bulk INSERT/UPDATE/DELETE, one config version bump
+# and one atomic sensor_count adjustment, returning a result per request item.
+
+def _insert_returning_ids(db: Session, model, rows: list[dict]) -> list[int]:
+    """
+    Inserts the rows and returns their new ids in row order. Dialects that can't
+    return executemany RETURNING rows in parameter order get one INSERT per row.
+    """
+    if not rows:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows).all()
+    return [db.scalars(insert(model).values(**row).returning(model.id)).one() for row in rows]
+
+def bulk_create_nodes(db: Session, hub_id: int, nodes: list[schemas.NodeCreate]):
+    if not get_hub(db, hub_id):
+        return None
+    ids = _insert_returning_ids(
+        db, models.Node,
+        [dict(hub_id=hub_id, ip=n.ip, location=n.location, status=n.status, sensor_count=0) for n in nodes],
+    )
+    version = _bump_config_version(db, hub_id) if ids else None
+    db.commit()
+    _config_committed(hub_id, version, [])
+    return [dict(index=i, id=node_id, status="created") for i, node_id in enumerate(ids)]
+
+def bulk_update_nodes(db: Session, hub_id: int, nodes: list[schemas.NodeBulkUpdate]):
+    if not get_hub(db, hub_id):
+        return None
+    locations = dict(
+        db.query(models.Node.id, models.Node.location)
+        .filter(models.Node.hub_id == hub_id, models.Node.id.in_([n.id for n in nodes]))
+        .all()
+    )
+    found = [n for n in nodes if n.id in locations]
+    moved = {n.id: n.location for n in found if n.location != locations[n.id]}
+    removes, sets = [], []
+    if moved:
+        # Flags are keyed by location: move the flags of every sensor on a relocated node
+        for sensor in db.query(models.Sensor).filter(models.Sensor.node_id.in_(moved)):
+            removes.append(_remove_flag(locations[sensor.node_id], sensor.type))
+            sets.append(_set_flag(moved[sensor.node_id], sensor))
+    version = None
+    if found:
+        db.execute(
+            update(models.Node),
+            [dict(id=n.id, ip=n.ip, location=n.location, status=n.status) for n in found],
+        )
+        version = _bump_config_version(db, hub_id)
+    db.commit()
+    _config_committed(hub_id, version, removes + sets)
+    return [
+        dict(index=i, id=n.id, status="updated" if n.id in locations else "not_found")
+        for i, n in enumerate(nodes)
+    ]
+
+def bulk_delete_nodes(db: Session, hub_id: int, node_ids: list[int]):
+    if not get_hub(db, hub_id):
+        return None
+    found = set(
+        db.scalars(
+            select(models.Node.id).where(models.Node.hub_id == hub_id, models.Node.id.in_(node_ids))
+        )
+    )
+    ops = [
+        _remove_flag(location, sensor_type)
+        for location, sensor_type in db.query(models.Node.location, models.Sensor.type)
+        .join(models.Sensor.node)
+        .filter(models.Sensor.node_id.in_(found))
+    ]
+    version = None
+    if found:
+        db.query(models.Sensor).filter(models.Sensor.node_id.in_(found)).delete(synchronize_session=False)
+        db.query(models.Node).filter(models.Node.id.in_(found)).delete(synchronize_session=False)
+        version = _bump_config_version(db, hub_id)
+    db.commit()
+    _config_committed(hub_id, version, ops)
+    return [
+        dict(index=i, id=node_id, status="deleted" if node_id in found else "not_found")
+        for i, node_id in enumerate(node_ids)
+    ]
+
+def bulk_create_sensors(db: Session, node_id: int, sensors: list[schemas.SensorCreate]):
+    parent = get_node(db, node_id)
+    if not parent:
+        return None
+    hub_id, location = parent.hub_id, parent.location
+    ids = _insert_returning_ids(
+        db, models.Sensor, [dict(node_id=node_id, type=s.type, pin=s.pin, status=s.status) for s in sensors],
+    )
+    version = None
+    if ids:
+        _adjust_sensor_count(db, node_id, len(ids))
+        version = _bump_config_version(db, hub_id)
+    db.commit()
+    _config_committed(hub_id, version, [_set_flag(location, s) for s in sensors])
+    return [dict(index=i, id=sensor_id, status="created") for i, sensor_id in enumerate(ids)]
+
+def bulk_update_sensors(db: Session, node_id: int, sensors: list[schemas.SensorBulkUpdate]):
+    parent = get_node(db, node_id)
+    if not parent:
+        return None
+    hub_id, location = parent.hub_id, parent.location
+    types = dict(
+        db.query(models.Sensor.id, models.Sensor.type)
+        .filter(models.Sensor.node_id == node_id, models.Sensor.id.in_([s.id for s in sensors]))
+        .all()
+    )
+    found = [s for s in sensors if s.id in types]
+    ops = [_remove_flag(location, types[s.id]) for s in found if s.type != types[s.id]]
+    ops += [_set_flag(location, s) for s in found]
+    version = None
+    if found:
+        db.execute(
+            update(models.Sensor),
+            [dict(id=s.id, type=s.type, pin=s.pin, status=s.status) for s in found],
+        )
+        version = _bump_config_version(db, hub_id)
+    db.commit()
+    _config_committed(hub_id, version, ops)
+    return [
+        dict(index=i, id=s.id, status="updated" if s.id in types else "not_found")
+        for i, s in enumerate(sensors)
+    ]
+
+def bulk_delete_sensors(db: Session, node_id: int, sensor_ids: list[int]):
+    parent = get_node(db, node_id)
+    if not parent:
+        return None
+    hub_id, location = parent.hub_id, parent.location
+    types = dict(
+        db.query(models.Sensor.id, models.Sensor.type)
+        .filter(models.Sensor.node_id == node_id, models.Sensor.id.in_(sensor_ids))
+        .all()
+    )
+    version = None
+    if types:
+        deleted = db.query(models.Sensor).filter(models.Sensor.id.in_(types)).delete(synchronize_session=False)
+        _adjust_sensor_count(db, node_id, -deleted)
+        version = _bump_config_version(db, hub_id)
+    db.commit()
+    _config_committed(hub_id, version, [_remove_flag(location, t) for t in types.values()])
+    return [
+        dict(index=i, id=sensor_id, status="deleted" if sensor_id in types else "not_found")
+        for i, sensor_id in enumerate(sensor_ids)
+    ]
+
+# --- Alerts ---
+def _insert_ignoring_conflicts(db: Session, model):
+    """
+    INSERT ... ON CONFLICT DO NOTHING for the session's dialect.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model).on_conflict_do_nothing()
+
+def ingest_alerts(db: Session, hub_id: int, alerts: list[schemas.AlertIn]):
+    """
+    Stores a batch of hub alerts in one transaction. Alerts already stored for this
+    hub (same hub alert id) are skipped, so hubs can safely retry a batch.
+    Returns None if the hub does not exist.
+    """
+    if not db.query(models.Hub.id).filter(models.Hub.id == hub_id).first():
+        return None
+    inserted = db.scalars(
+        _insert_ignoring_conflicts(db, models.Alert).returning(models.Alert.hub_alert_id),
+        [
+            dict(
+                hub_id=hub_id,
+                hub_alert_id=a.id,
+                ts=a.ts,
+                node=a.node,
+                sensor=a.sensor,
+                description=a.description,
+                sources=json.dumps(a.sources),
+                image_sha256=a.image_sha256,
+                received_at=datetime.utcnow(),
+            )
+            for a in alerts
+        ],
+    ).all() if alerts else []
+    hashes = {a.image_sha256 for a in alerts if a.image_sha256}
+    stored = set(db.scalars(select(models.AlertImage.sha256).where(models.AlertImage.sha256.in_(hashes))))
+    db.commit()
+    return dict(
+        accepted=len(inserted),
+        duplicates=len(alerts) - len(inserted),
+        high_water_mark=max((a.id for a in alerts), default=None),
+        missing_images=sorted(hashes - stored),
+    )
+
+def get_alerts(
+    db: Session,
+    hub_id: int | None = None,
+    node: str | None = None,
+    sensor: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+    limit: int = 100,
+):
+    """
+    Newest-first alerts across the fleet, optionally filtered.
+    """
+    query = db.query(models.Alert)
+    if hub_id is not None:
+        query = query.filter(models.Alert.hub_id == hub_id)
+    if node is not None:
+        query = query.filter(models.Alert.node == node)
+    if sensor is not None:
+        query = query.filter(models.Alert.sensor == sensor)
+    if since is not None:
+        query = query.filter(models.Alert.ts > since)
+    if until is not None:
+        query = query.filter(models.Alert.ts <= until)
+    return [
+        dict(
+            id=a.id,
+            hub_id=a.hub_id,
+            hub_alert_id=a.hub_alert_id,
+            ts=a.ts,
+            node=a.node,
+            sensor=a.sensor,
+            description=a.description,
+            sources=json.loads(a.sources) if a.sources else [],
+            image_url=f"/images/{a.image_sha256}" if a.image_sha256 else None,
+        )
+        for a in query.order_by(models.Alert.ts.desc(), models.Alert.id.desc()).limit(limit)
+    ]
+
+def get_alert_image(db: Session, sha256: str):
+    return db.get(models.AlertImage, sha256)
+
+def add_alert_image(db: Session, sha256: str, size: int, content_type: str):
+    db.execute(
+        _insert_ignoring_conflicts(db, models.AlertImage),
+        dict(sha256=sha256, size=size, content_type=content_type, created_at=datetime.utcnow()),
+    )
+    db.commit()
@@ -0,0 +1,130 @@
+# db_benchmark.py
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+class DBBenchmark:
+    """
+    Compares request throughput of the sync (threadpool) and async (AsyncSession)
+    database modes. For each mode the API is started with uvicorn against the same
+    database, then `concurrency` clients issue database-bound reads for `duration`
+    seconds while latencies are recorded.
+    """
+
+    def __init__(self, database_url: str, concurrency: int, duration: float, port: int = 8011):
+        self.database_url = database_url
+        self.concurrency = concurrency
+        self.duration = duration
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def _start_server(self, async_mode: bool) -> subprocess.Popen:
+        env = dict(os.environ, DATABASE_URL=self.database_url, DB_ASYNC=str(async_mode).lower())
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{self.base_url}/hubs/", timeout=1).raise_for_status()
+                return server
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        server.terminate()
+        raise RuntimeError("API did not start")
+
+    async def _client(self, client: httpx.AsyncClient, paths: list[str], deadline: float,
+                      latencies: list[float], errors: list[int]):
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                resp = await client.get(paths[i % len(paths)])
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors.append(1)
+            i += 1
+
+    async def _drive(self) -> dict:
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30) as client:
+            hubs = (await client.get("/hubs/")).json()
+            paths = ["/hubs/"]
+            for hub in hubs:
+                paths.append(f"/hubs/{hub['id']}")
+                paths += [f"/nodes/{node['id']}/sensors/" for node in hub["nodes"]]
+            latencies, errors = [], []
+            start = time.perf_counter()
+            deadline = start + self.duration
+            await asyncio.gather(*(
+                self._client(client, paths[i:] + paths[:i], deadline, latencies, errors)
+                for i in range(self.concurrency)
+            ))
+            elapsed = time.perf_counter() - start
+        latencies.sort()
+        return dict(
+            requests=len(latencies),
+            errors=len(errors),
+            throughput_rps=round(len(latencies) / elapsed, 1),
+            p50_ms=_percentile_ms(latencies, 50),
+            p99_ms=_percentile_ms(latencies, 99),
+            max_ms=_percentile_ms(latencies, 100),
+        )
+
+    def run_mode(self, async_mode: bool) -> dict:
+        server = self._start_server(async_mode)
+        try:
+            return asyncio.run(self._drive())
+        finally:
+            server.terminate()
+            server.wait()
+
+    def run_all(self) -> dict:
+        results = {}
+        for mode in ("sync", "async"):
+            print(f"=== {mode} mode: {self.concurrency} clients for {self.duration:.0f}s ===")
+            results[mode] = self.run_mode(mode == "async")
+            r = results[mode]
+            print(f"  {r['throughput_rps']} req/s, p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms, "
+                  f"{r['errors']} errors\n")
+        return results
+
+
+def _percentile_ms(sorted_samples: list[float], pct: float) -> float | None:
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return round(sorted_samples[rank - 1] * 1000, 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and async database modes")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./benchmark.db"))
+    parser.add_argument("--concurrency", "-c", type=int, default=32)
+    parser.add_argument("--duration", "-d", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--populate", action="store_true", help="Load mock_db data first")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    if args.populate:
+        os.environ["DATABASE_URL"] = args.database_url
+        import mock_db
+        mock_db.populate()
+
+    bench = DBBenchmark(args.database_url, args.concurrency, args.duration, args.port)
+    results = bench.run_all()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(concurrency=args.concurrency, duration=args.duration, results=results), f, indent=2)
@@ -0,0 +1,74 @@
+# heartbeat.py
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+
+import models
+from database import SessionLocal
+
+# Seconds between last_seen flushes
+HEARTBEAT_FLUSH_INTERVAL = 5.0
+
+
+class HeartbeatRecorder:
+    """
+    Collects hub last_seen timestamps in memory and writes them in one batched
+    UPDATE every `interval` seconds, instead of a commit per config poll.
+    """
+    def __init__(self, interval: float = HEARTBEAT_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def touch(self, hub_id: int):
+        with self._lock:
+            self._pending[hub_id] = datetime.utcnow()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="heartbeat-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[HEARTBEAT] Flush failed: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            db.connection().execute(
+                update(models.Hub)
+                .where(models.Hub.id == bindparam("hub_id"))
+                .values(last_seen=bindparam("seen")),
+                [{"hub_id": hub_id, "seen": seen} for hub_id, seen in pending.items()],
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put them back unless a newer heartbeat arrived meanwhile
+            with self._lock:
+                for hub_id, seen in pending.items():
+                    self._pending.setdefault(hub_id, seen)
+            raise
+        finally:
+            db.close()
+
+
+heartbeats = HeartbeatRecorder()
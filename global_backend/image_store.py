@@ -0,0 +1,36 @@
+# image_store.py
+import hashlib
+import os
+import tempfile
+
+# Alert images uploaded by hubs, stored by SHA-256 under <dir>/<first 2 hex chars>/<hash>
+ALERT_IMAGE_DIR = os.getenv("ALERT_IMAGE_DIR", "alert_images")
+# Largest accepted image upload, in bytes
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+
+
+def image_path(sha256: str) -> str:
+    return os.path.join(ALERT_IMAGE_DIR, sha256[:2], sha256)
+
+
+def save_image(sha256: str, data: bytes) -> bool:
+    """
+    Writes `data` under its hash unless it is already stored. Returns True if written.
+    Raises ValueError if the content does not match `sha256`.
+    """
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError("Content does not match the SHA-256 in the URL")
+    path = image_path(sha256)
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename, so readers never see a partial image
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
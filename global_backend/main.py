@@ -1,15 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import hubs, nodes, sensors
+from database import async_engine, engine, Base
+from heartbeat import heartbeats
+from sensor_counts import sensor_counts
+from routers import alerts, cameras, hubs, images, nodes, sensors
 from routers.hub_sync import router as hub_sync_router
 
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Batched hub last_seen writes; flush what is left on shutdown.
+    # sensor_count drift is repaired on startup and then periodically.
+    heartbeats.start()
+    sensor_counts.start()
+    yield
+    sensor_counts.stop()
+    heartbeats.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 app = FastAPI(
     title="Test IoT Security Management API",
     description="CRUD for Hubs, Nodes, and Sensors (no auth)",
-    version="0.0.1"
+    version="0.0.1",
+    lifespan=lifespan,
 )
 
 # Allow all origins for now (adjust in production)
@@ -27,7 +46,12 @@ app.include_router(nodes.router)
 app.include_router(nodes.single)
 app.include_router(sensors.router)
 app.include_router(sensors.single)
+app.include_router(cameras.router)
+app.include_router(cameras.single)
 app.include_router(hub_sync_router)
+app.include_router(alerts.router)
+app.include_router(alerts.fleet)
+app.include_router(images.router)
 
 if __name__ == "__main__":
     import uvicorn
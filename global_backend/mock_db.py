@@ -1,3 +1,5 @@
+from sqlalchemy import insert
+
 from database import SessionLocal, Base, engine
 from models import Hub, Node, Sensor
 from datetime import datetime
@@ -14,40 +16,41 @@ def populate():
         session.query(Hub).delete()
         session.commit()
 
-        # Create 3 hubs
-        for i in range(1, 4):
-            hub = Hub(
-                name=f"MockHub{i}",
-                ip=f"192.168.10.{i}",
-                last_seen=datetime.utcnow()
-            )
-            session.add(hub)
-            session.flush()  # assign hub.id
-
-            # For each hub, create 2 nodes
-            for j in range(1, 3):
-                node = Node(
-                    hub_id=hub.id,
+        # Bulk INSERTs: one statement per table instead of a flush per row
+        hub_ids = session.scalars(
+            insert(Hub).returning(Hub.id, sort_by_parameter_order=True),
+            [
+                dict(name=f"MockHub{i}", ip=f"192.168.10.{i}", last_seen=datetime.utcnow())
+                for i in range(1, 4)  # 3 hubs
+            ],
+        ).all()
+
+        # For each hub, create 2 nodes
+        types = ["PIR", "Camera", "Temperature"]
+        node_ids = session.scalars(
+            insert(Node).returning(Node.id, sort_by_parameter_order=True),
+            [
+                dict(
+                    hub_id=hub_id,
                     ip=f"10.0.{i}.{j}",
                     location=f"Location_{i}_{j}",
                     status="online",
-                    sensor_count=0
+                    sensor_count=len(types),
                 )
-                session.add(node)
-                session.flush()  # assign node.id
-
-                # For each node, create 3 sensors
-                types = ["PIR", "Camera", "Temperature"]
-                for pin_idx, sensor_type in enumerate(types, start=1):
-                    sensor = Sensor(
-                        node_id=node.id,
-                        type=sensor_type,
-                        pin=str(pin_idx),
-                        status="active"
-                    )
-                    session.add(sensor)
-                    # increment sensor_count on the node
-                    node.sensor_count = (node.sensor_count or 0) + 1
+                for i, hub_id in enumerate(hub_ids, start=1)
+                for j in range(1, 3)
+            ],
+        ).all()
+
+        # For each node, create 3 sensors
+        session.execute(
+            insert(Sensor),
+            [
+                dict(node_id=node_id, type=sensor_type, pin=str(pin_idx), status="active")
+                for node_id in node_ids
+                for pin_idx, sensor_type in enumerate(types, start=1)
+            ],
+        )
 
         # Commit all at once
         session.commit()
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+import json
+
+from sqlalchemy import BigInteger, Column, Integer, String, Text, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -11,8 +13,13 @@ class Hub(Base):
     name = Column(String, index=True, nullable=False)
     ip = Column(String, nullable=False)
     last_seen = Column(DateTime, default=datetime.utcnow)
+    # Bumped by every change to the hub, its nodes or sensors; served as the config ETag
+    config_version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    nodes = relationship("Node", back_populates="hub", cascade="all, delete-orphan")
+    # Eager (SELECT ... IN) loads: every Hub/Node response includes them, and nothing
+    # may lazy-load after an AsyncSession.run_sync call has returned
+    nodes = relationship("Node", back_populates="hub", cascade="all, delete-orphan", lazy="selectin")
+    cameras = relationship("Camera", back_populates="hub", cascade="all, delete-orphan", lazy="selectin")
 
 class Node(Base):
     __tablename__ = "nodes"
@@ -25,7 +32,7 @@ class Node(Base):
     sensor_count = Column(Integer, default=0)
 
     hub = relationship("Hub", back_populates="nodes")
-    sensors = relationship("Sensor", back_populates="node", cascade="all, delete-orphan")
+    sensors = relationship("Sensor", back_populates="node", cascade="all, delete-orphan", lazy="selectin")
 
 class Sensor(Base):
     __tablename__ = "sensors"
@@ -37,3 +44,51 @@ class Sensor(Base):
     status = Column(String, nullable=True)
 
     node = relationship("Node", back_populates="sensors")
+
+class Camera(Base):
+    __tablename__ = "cameras"
+    __table_args__ = (UniqueConstraint("hub_id", "name", name="uq_cameras_hub_name"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    hub_id = Column(Integer, ForeignKey("hubs.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    uri = Column(String, nullable=False)                        # device index, file path/URI or rtsp://
+    status = Column(String, nullable=True)
+    coverage_json = Column("coverage", Text, nullable=True)     # JSON list of "node/sensor" keys
+
+    hub = relationship("Hub", back_populates="cameras")
+
+    @property
+    def coverage(self) -> list[str]:
+        return json.loads(self.coverage_json) if self.coverage_json else []
+
+    @coverage.setter
+    def coverage(self, keys: list[str]):
+        self.coverage_json = json.dumps(keys)
+
+class Alert(Base):
+    __tablename__ = "alerts"
+    __table_args__ = (
+        # Hubs retry batches; (hub_id, hub_alert_id) makes ingestion idempotent
+        UniqueConstraint("hub_id", "hub_alert_id", name="uq_alerts_hub_alert"),
+        Index("idx_alerts_hub_ts", "hub_id", "ts"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    hub_id = Column(Integer, ForeignKey("hubs.id", ondelete="CASCADE"), nullable=False)
+    hub_alert_id = Column(Integer, nullable=False)     # AlertStore row id on the hub
+    ts = Column(BigInteger, nullable=False)            # epoch milliseconds
+    node = Column(String, nullable=True)
+    sensor = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    sources = Column(Text, nullable=True)              # JSON list of "node/sensor"
+    image_sha256 = Column(String(64), nullable=True)   # AlertImage, uploaded separately
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+class AlertImage(Base):
+    __tablename__ = "alert_images"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,63 @@
+# routers/alerts.py
+import zlib
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from typing import List, Optional
+
+import crud, schemas
+from database import DB, get_db
+
+# Largest accepted alert batch after decompression, in bytes
+MAX_ALERT_BATCH_BYTES = 16 * 1024 * 1024
+
+router = APIRouter(prefix="/hub/{hub_id}/alerts", tags=["alerts"])
+
+@router.post("/", response_model=schemas.AlertBatchResult)
+async def ingest_alerts(hub_id: int, request: Request, db: DB = Depends(get_db)):
+    """
+    Batch upload from a hub's alert uploader: a JSON schemas.AlertBatch, optionally
+    sent with Content-Encoding: gzip. Idempotent per (hub, hub alert id), so a batch
+    can be retried as a whole. `missing_images` lists image hashes to PUT to /images.
+    """
+    body = await request.body()
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        body = _gunzip(body)
+    elif len(body) > MAX_ALERT_BATCH_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch too large")
+    try:
+        batch = schemas.AlertBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    result = await db.run(crud.ingest_alerts, hub_id, batch.alerts)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Hub not found")
+    return result
+
+def _gunzip(body: bytes) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, MAX_ALERT_BATCH_BYTES)
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Invalid gzip body")
+    if decompressor.unconsumed_tail:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch too large")
+    return data
+
+# Fleet-wide view, mounted under /alerts
+fleet = APIRouter(prefix="/alerts", tags=["alerts"])
+
+@fleet.get("/", response_model=List[schemas.Alert])
+async def read_alerts(
+    hub_id: Optional[int] = None,
+    node: Optional[str] = None,
+    sensor: Optional[str] = None,
+    since: Optional[int] = Query(None, description="Only alerts newer than this epoch-ms timestamp"),
+    until: Optional[int] = Query(None, description="Only alerts at or before this epoch-ms timestamp"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: DB = Depends(get_db),
+):
+    return await db.run(
+        crud.get_alerts, hub_id=hub_id, node=node, sensor=sensor, since=since, until=until, limit=limit,
+    )
@@ -0,0 +1,49 @@
+# routers/cameras.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from typing import List
+
+import crud, schemas
+from database import DB, get_db
+
+router = APIRouter(prefix="/hubs/{hub_id}/cameras", tags=["cameras"])
+
+@router.get("/", response_model=List[schemas.Camera])
+async def read_cameras(hub_id: int, db: DB = Depends(get_db)):
+    return await db.run(crud.get_cameras, hub_id)
+
+@router.post("/", response_model=schemas.Camera, status_code=status.HTTP_201_CREATED)
+async def create_camera(hub_id: int, camera: schemas.CameraCreate, db: DB = Depends(get_db)):
+    try:
+        db_camera = await db.run(crud.create_camera, hub_id, camera)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Camera name already used on this hub")
+    if not db_camera:
+        raise HTTPException(status_code=404, detail="Hub not found")
+    return db_camera
+
+single = APIRouter(prefix="/cameras", tags=["cameras"])
+
+@single.get("/{camera_id}", response_model=schemas.Camera)
+async def read_camera(camera_id: int, db: DB = Depends(get_db)):
+    db_camera = await db.run(crud.get_camera, camera_id)
+    if not db_camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return db_camera
+
+@single.put("/{camera_id}", response_model=schemas.Camera)
+async def update_camera(camera_id: int, camera: schemas.CameraCreate, db: DB = Depends(get_db)):
+    try:
+        db_camera = await db.run(crud.update_camera, camera_id, camera)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Camera name already used on this hub")
+    if not db_camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return db_camera
+
+@single.delete("/{camera_id}", response_model=schemas.Camera)
+async def delete_camera(camera_id: int, db: DB = Depends(get_db)):
+    db_camera = await db.run(crud.delete_camera, camera_id)
+    if not db_camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return db_camera
@@ -1,55 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from datetime import datetime
 
-from database import SessionLocal
+from config_cache import hub_config_cache
+from config_events import config_events
+from database import DB, get_db
+from heartbeat import heartbeats
 import crud
 import schemas
 
 router = APIRouter(prefix="/hub", tags=["hub_sync"])
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.put("/register", status_code=status.HTTP_200_OK)
-def register_hub(hub: schemas.HubCreate, db: Session = Depends(get_db)):
+async def register_hub(hub: schemas.HubCreate, db: DB = Depends(get_db)):
     """
     Called by a hub on boot.
     """
-
-    # Check if the hub already exists
-    db_hub = crud.get_hub_by_name(db, hub.name)
-    if db_hub:
-        # Update the existing hub
-        db_hub.ip = hub.ip
-        db_hub.last_seen = datetime.utcnow()
-        crud.update_hub(db, db_hub.id, db_hub)
-        db.commit()
-        return {"status": "updated", "hub_id": db_hub.id}
-    else:
-        # Create a new hub
-        db_hub = crud.create_hub(db, hub)
-        hub_id = db_hub.id
-
-    db.commit()
-    return {"status": "registered", "hub_id": hub_id}
+    result, hub_id = await db.run(crud.register_hub, hub)
+    return {"status": result, "hub_id": hub_id}
 
 @router.get("/{hub_id}/config", response_model=schemas.Hub)
-def get_hub_config(hub_id: int, db: Session = Depends(get_db)):
+async def get_hub_config(hub_id: int, request: Request, db: DB = Depends(get_db)):
     """
     Returns the Hub with nested nodes and sensors (including each sensor.status).
     HubApp can call this for full config.
+
+    The ETag is the hub's config_version; send it back in If-None-Match to get an
+    empty 304 while nothing changed. The serialized response is cached per hub until
+    crud changes the hub, its nodes or sensors; last_seen is recorded in memory and
+    flushed in batches.
     """
-    db_hub = crud.get_hub(db, hub_id)
+    cached, generation = hub_config_cache.get(hub_id)
+    if cached is None:
+        cached = await db.run(_render_config, hub_id)
+        if cached is None:
+            raise HTTPException(status_code=404, detail="Hub not found")
+        hub_config_cache.put(hub_id, cached, generation)
+    etag, body = cached
+
+    heartbeats.touch(hub_id)
+    if etag in _parse_if_none_match(request.headers.get("if-none-match", "")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _render_config(db: Session, hub_id: int) -> tuple[str, bytes] | None:
+    db_hub = crud.get_hub_config(db, hub_id)
     if not db_hub:
-        raise HTTPException(status_code=404, detail="Hub not found")
+        return None
+    etag = f'"{hub_id}-{db_hub.config_version}"'
+    return etag, schemas.Hub.model_validate(db_hub, from_attributes=True).model_dump_json().encode()
+
+
+@router.get("/{hub_id}/config/changes")
+async def wait_config_changes(
+    hub_id: int,
+    since: int = Query(..., description="config_version the hub has applied"),
+    timeout: float = Query(25.0, ge=0, le=60),
+):
+    """
+    Long poll for config deltas newer than `since`. Answers as soon as there are
+    any, or with an empty list after `timeout` seconds. `reset` means the deltas
+    are no longer available and the hub must fetch the full config.
+    """
+    events = await config_events.wait(hub_id, since, timeout)
+    heartbeats.touch(hub_id)
+    if events is None:
+        return {"reset": True, "events": []}
+    response = {"reset": False, "events": events}
+    if events:
+        response["etag"] = f'"{hub_id}-{events[-1]["version"]}"'
+    return response
+
 
-    db_hub.last_seen = datetime.utcnow()
-    crud.update_hub(db, hub_id, db_hub)
-    db.commit()
-    return db_hub
\ No newline at end of file
+def _parse_if_none_match(header: str) -> set[str]:
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
\ No newline at end of file
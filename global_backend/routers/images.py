@@ -0,0 +1,48 @@
+# routers/images.py
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse
+
+import crud
+import image_store
+from database import DB, get_db
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+@router.put("/{sha256}")
+async def upload_image(sha256: str, request: Request, response: Response, db: DB = Depends(get_db)):
+    """
+    Stores an alert image under its SHA-256. Uploading content that is already
+    stored is a no-op (200); a new image returns 201.
+    """
+    if not SHA256_RE.match(sha256):
+        raise HTTPException(status_code=400, detail="Expected a lowercase hex SHA-256")
+    if await db.run(crud.get_alert_image, sha256):
+        return {"sha256": sha256, "stored": False}
+    data = await request.body()
+    if len(data) > image_store.MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+    try:
+        await run_in_threadpool(image_store.save_image, sha256, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    content_type = request.headers.get("content-type", "image/jpeg")
+    await db.run(crud.add_alert_image, sha256, len(data), content_type)
+    response.status_code = status.HTTP_201_CREATED
+    return {"sha256": sha256, "stored": True}
+
+@router.get("/{sha256}")
+async def read_image(sha256: str, db: DB = Depends(get_db)):
+    image = await db.run(crud.get_alert_image, sha256) if SHA256_RE.match(sha256) else None
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Content-addressed: the bytes behind a URL never change
+    return FileResponse(
+        image_store.image_path(sha256),
+        media_type=image.content_type,
+        headers={"ETag": f'"{sha256}"', "Cache-Control": "public, max-age=31536000, immutable"},
+    )
@@ -1,47 +1,61 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from typing import List
 
 import crud, schemas
-from database import SessionLocal
+from database import DB, get_db
 
 router = APIRouter(prefix="/hubs/{hub_id}/nodes", tags=["nodes"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[schemas.Node])
-def read_nodes(hub_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_nodes(db, hub_id, skip, limit)
+async def read_nodes(hub_id: int, skip: int = 0, limit: int = 100, db: DB = Depends(get_db)):
+    return await db.run(crud.get_nodes, hub_id, skip, limit)
 
 @router.post("/", response_model=schemas.Node, status_code=status.HTTP_201_CREATED)
-def create_node(hub_id: int, node: schemas.NodeCreate, db: Session = Depends(get_db)):
-    return crud.create_node(db, hub_id, node)
+async def create_node(hub_id: int, node: schemas.NodeCreate, db: DB = Depends(get_db)):
+    return await db.run(crud.create_node, hub_id, node)
+
+# Bulk operations: one transaction per request, one result per array item
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_nodes(hub_id: int, nodes: List[schemas.NodeCreate], db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_create_nodes, hub_id, nodes)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Hub not found")
+    return {"results": results}
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_nodes(hub_id: int, nodes: List[schemas.NodeBulkUpdate], db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_update_nodes, hub_id, nodes)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Hub not found")
+    return {"results": results}
+
+@router.delete("/bulk", response_model=schemas.BulkResult)
+async def bulk_delete_nodes(hub_id: int, body: schemas.BulkDelete, db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_delete_nodes, hub_id, body.ids)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Hub not found")
+    return {"results": results}
 
 # For single node operations, mount under /nodes
 single = APIRouter(prefix="/nodes", tags=["nodes"])
 
 @single.get("/{node_id}", response_model=schemas.Node)
-def read_node(node_id: int, db: Session = Depends(get_db)):
-    db_node = crud.get_node(db, node_id)
+async def read_node(node_id: int, db: DB = Depends(get_db)):
+    db_node = await db.run(crud.get_node, node_id)
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
     return db_node
 
 @single.put("/{node_id}", response_model=schemas.Node)
-def update_node(node_id: int, node: schemas.NodeCreate, db: Session = Depends(get_db)):
-    db_node = crud.update_node(db, node_id, node)
+async def update_node(node_id: int, node: schemas.NodeCreate, db: DB = Depends(get_db)):
+    db_node = await db.run(crud.update_node, node_id, node)
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
     return db_node
 
 @single.delete("/{node_id}", response_model=schemas.Node)
-def delete_node(node_id: int, db: Session = Depends(get_db)):
-    db_node = crud.delete_node(db, node_id)
+async def delete_node(node_id: int, db: DB = Depends(get_db)):
+    db_node = await db.run(crud.delete_node, node_id)
     if not db_node:
         raise HTTPException(status_code=404, detail="Node not found")
     return db_node
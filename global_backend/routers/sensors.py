@@ -1,47 +1,61 @@
 # routers/sensors.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from typing import List
 
 import crud, schemas
-from database import SessionLocal
+from database import DB, get_db
 
 router = APIRouter(prefix="/nodes/{node_id}/sensors", tags=["sensors"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[schemas.Sensor])
-def read_sensors(node_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_sensors(db, node_id, skip, limit)
+async def read_sensors(node_id: int, skip: int = 0, limit: int = 100, db: DB = Depends(get_db)):
+    return await db.run(crud.get_sensors, node_id, skip, limit)
 
 @router.post("/", response_model=schemas.Sensor, status_code=status.HTTP_201_CREATED)
-def create_sensor(node_id: int, sensor: schemas.SensorCreate, db: Session = Depends(get_db)):
-    return crud.create_sensor(db, node_id, sensor)
+async def create_sensor(node_id: int, sensor: schemas.SensorCreate, db: DB = Depends(get_db)):
+    return await db.run(crud.create_sensor, node_id, sensor)
+
+# Bulk operations: one transaction per request, one result per array item
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_sensors(node_id: int, sensors: List[schemas.SensorCreate], db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_create_sensors, node_id, sensors)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return {"results": results}
+
+@router.put("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_sensors(node_id: int, sensors: List[schemas.SensorBulkUpdate], db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_update_sensors, node_id, sensors)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return {"results": results}
+
+@router.delete("/bulk", response_model=schemas.BulkResult)
+async def bulk_delete_sensors(node_id: int, body: schemas.BulkDelete, db: DB = Depends(get_db)):
+    results = await db.run(crud.bulk_delete_sensors, node_id, body.ids)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return {"results": results}
 
 single = APIRouter(prefix="/sensors", tags=["sensors"])
 
 @single.get("/{sensor_id}", response_model=schemas.Sensor)
-def read_sensor(sensor_id: int, db: Session = Depends(get_db)):
-    db_sensor = crud.get_sensor(db, sensor_id)
+async def read_sensor(sensor_id: int, db: DB = Depends(get_db)):
+    db_sensor = await db.run(crud.get_sensor, sensor_id)
     if not db_sensor:
         raise HTTPException(status_code=404, detail="Sensor not found")
     return db_sensor
 
 @single.put("/{sensor_id}", response_model=schemas.Sensor)
-def update_sensor(sensor_id: int, sensor: schemas.SensorCreate, db: Session = Depends(get_db)):
-    db_sensor = crud.update_sensor(db, sensor_id, sensor)
+async def update_sensor(sensor_id: int, sensor: schemas.SensorCreate, db: DB = Depends(get_db)):
+    db_sensor = await db.run(crud.update_sensor, sensor_id, sensor)
     if not db_sensor:
         raise HTTPException(status_code=404, detail="Sensor not found")
     return db_sensor
 
 @single.delete("/{sensor_id}", response_model=schemas.Sensor)
-def delete_sensor(sensor_id: int, db: Session = Depends(get_db)):
-    db_sensor = crud.delete_sensor(db, sensor_id)
+async def delete_sensor(sensor_id: int, db: DB = Depends(get_db)):
+    db_sensor = await db.run(crud.delete_sensor, sensor_id)
     if not db_sensor:
         raise HTTPException(status_code=404, detail="Sensor not found")
     return db_sensor
@@ -24,7 +24,6 @@ class NodeBase(BaseModel):
     ip: Optional[str] = None
     location: Optional[str] = None
     status: Optional[str] = None
-    sensor_count: Optional[int] = 0
 
 class NodeCreate(NodeBase):
     pass
@@ -32,11 +31,30 @@ class NodeCreate(NodeBase):
 class Node(NodeBase):
     id: int
     hub_id: int
+    sensor_count: Optional[int] = 0     # maintained by the server
     sensors: List[Sensor] = []
 
     class Config:
         orm_mode = True
 
+# ---- Camera ----
+class CameraBase(BaseModel):
+    name: str
+    uri: str                        # "0" (device index), file path/URI or rtsp://...
+    status: Optional[str] = "enabled"
+    # Sensors whose events this camera captures: "node/sensor", "node/*", "*/sensor" or "*"
+    coverage: List[str] = []
+
+class CameraCreate(CameraBase):
+    pass
+
+class Camera(CameraBase):
+    id: int
+    hub_id: int
+
+    class Config:
+        orm_mode = True
+
 # ---- Hub ----
 class HubBase(BaseModel):
     name: str
@@ -48,7 +66,57 @@ class HubCreate(HubBase):
 
 class Hub(HubBase):
     id: int
+    config_version: int = 1
     nodes: List[Node] = []
+    cameras: List[Camera] = []
 
     class Config:
         orm_mode = True
+
+# ---- Bulk operations ----
+class NodeBulkUpdate(NodeBase):
+    id: int
+
+class SensorBulkUpdate(SensorBase):
+    id: int
+
+class BulkDelete(BaseModel):
+    ids: List[int]
+
+class BulkItemResult(BaseModel):
+    index: int                      # position in the request array
+    id: Optional[int] = None
+    status: str                     # created | updated | deleted | not_found
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+# ---- Alerts ----
+class AlertIn(BaseModel):
+    id: int                         # hub-local alert id
+    ts: int                         # epoch milliseconds
+    node: Optional[str] = None
+    sensor: Optional[str] = None
+    description: Optional[str] = None
+    sources: List[str] = []
+    image_sha256: Optional[str] = None
+
+class AlertBatch(BaseModel):
+    alerts: List[AlertIn]
+
+class AlertBatchResult(BaseModel):
+    accepted: int                   # newly stored
+    duplicates: int                 # already stored by an earlier attempt
+    high_water_mark: Optional[int]  # largest hub alert id in the batch
+    missing_images: List[str]       # referenced hashes the hub still has to upload
+
+class Alert(BaseModel):
+    id: int
+    hub_id: int
+    hub_alert_id: int
+    ts: int
+    node: Optional[str] = None
+    sensor: Optional[str] = None
+    description: Optional[str] = None
+    sources: List[str] = []
+    image_url: Optional[str] = None
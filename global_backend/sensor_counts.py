@@ -0,0 +1,58 @@
+# sensor_counts.py
+import threading
+
+import crud
+from database import SessionLocal
+
+# Seconds between sensor_count reconciliation passes
+SENSOR_COUNT_RECONCILE_INTERVAL = 3600.0
+
+
+class SensorCountReconciler:
+    """
+    Periodically repairs Node.sensor_count drift (rows written by older code,
+    manual SQL, failed partial writes) with crud.reconcile_sensor_counts.
+    """
+    def __init__(self, interval: float = SENSOR_COUNT_RECONCILE_INTERVAL):
+        self.interval = interval
+        self.repaired = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sensor-count-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        # First pass right away, then every `interval` seconds
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"[SENSOR_COUNT] Reconciliation failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def reconcile(self) -> int:
+        db = SessionLocal()
+        try:
+            repaired = crud.reconcile_sensor_counts(db)
+        finally:
+            db.close()
+        if repaired:
+            print(f"[SENSOR_COUNT] Repaired sensor_count on {repaired} node(s)")
+        self.repaired += repaired
+        return repaired
+
+
+sensor_counts = SensorCountReconciler()
+
+if __name__ == "__main__":
+    sensor_counts.reconcile()
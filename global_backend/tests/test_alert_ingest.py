@@ -0,0 +1,77 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import crud
+import models
+import schemas
+from routers import alerts
+from routers.alerts import MAX_ALERT_BATCH_BYTES
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(alerts.router)
+    app.include_router(alerts.fleet)
+    return TestClient(app)
+
+
+@pytest.fixture
+def hub(db):
+    return crud.create_hub(db, schemas.HubCreate(name="hub", ip="10.0.0.1"))
+
+
+def batch(*ids: int) -> dict:
+    return {"alerts": [dict(id=i, ts=1_700_000_000_000 + i, node="node", sensor="pir") for i in ids]}
+
+
+def post_gzip(client: TestClient, hub_id: int, body: bytes):
+    return client.post(
+        f"/hub/{hub_id}/alerts/", content=gzip.compress(body),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+
+
+def test_same_gzip_batch_twice_is_idempotent(client, db, hub):
+    body = json.dumps(batch(1, 2, 3)).encode()
+    first = post_gzip(client, hub.id, body)
+    assert first.status_code == 200
+    assert first.json()["accepted"] == 3 and first.json()["duplicates"] == 0
+    second = post_gzip(client, hub.id, body)
+    assert second.status_code == 200
+    assert second.json()["accepted"] == 0 and second.json()["duplicates"] == 3
+    assert second.json()["high_water_mark"] == 3
+    assert db.query(models.Alert).count() == 3
+
+
+def test_partly_stored_batch_only_adds_new_alerts(client, db, hub):
+    assert client.post(f"/hub/{hub.id}/alerts/", json=batch(1, 2)).json()["accepted"] == 2
+    result = client.post(f"/hub/{hub.id}/alerts/", json=batch(2, 3)).json()
+    assert (result["accepted"], result["duplicates"]) == (1, 1)
+    assert db.query(models.Alert).count() == 3
+
+
+def test_unknown_hub(client, db):
+    assert client.post("/hub/999/alerts/", json=batch(1)).status_code == 404
+
+
+def test_oversized_body_is_rejected(client, db, hub):
+    body = b" " * (MAX_ALERT_BATCH_BYTES + 1)
+    assert client.post(
+        f"/hub/{hub.id}/alerts/", content=body, headers={"Content-Type": "application/json"},
+    ).status_code == 413
+    # Also when it only exceeds the cap once decompressed
+    assert post_gzip(client, hub.id, body).status_code == 413
+    assert db.query(models.Alert).count() == 0
+
+
+def test_invalid_gzip_is_rejected(client, db, hub):
+    response = client.post(
+        f"/hub/{hub.id}/alerts/", content=b"not gzip",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+from database import Base
+
+
+def node(i: int) -> schemas.NodeCreate:
+    return schemas.NodeCreate(ip=f"10.0.0.{i}", location=f"room-{i}", status="enabled")
+
+
+def sensor(i: int) -> schemas.SensorCreate:
+    return schemas.SensorCreate(type=f"type-{i}", pin=str(i))
+
+
+@pytest.fixture
+def hub(db):
+    return crud.create_hub(db, schemas.HubCreate(name="hub", ip="10.0.0.1"))
+
+
+def test_bulk_create_nodes_returns_ids_in_request_order(db, hub):
+    results = crud.bulk_create_nodes(db, hub.id, [node(i) for i in range(5)])
+    assert [r["index"] for r in results] == list(range(5))
+    locations = {n.id: n.location for n in db.query(models.Node)}
+    assert [locations[r["id"]] for r in results] == [f"room-{i}" for i in range(5)]
+
+
+def test_bulk_operations_on_missing_parent(db):
+    assert crud.bulk_create_nodes(db, 999, [node(0)]) is None
+    assert crud.bulk_create_sensors(db, 999, [sensor(0)]) is None
+
+
+def test_bulk_update_and_delete_report_not_found(db, hub):
+    ids = [r["id"] for r in crud.bulk_create_nodes(db, hub.id, [node(0), node(1)])]
+    results = crud.bulk_update_nodes(
+        db, hub.id, [schemas.NodeBulkUpdate(id=ids[0], location="moved"), schemas.NodeBulkUpdate(id=999)],
+    )
+    assert [r["status"] for r in results] == ["updated", "not_found"]
+    assert crud.get_node(db, ids[0]).location == "moved"
+    results = crud.bulk_delete_nodes(db, hub.id, [ids[1], 999])
+    assert [r["status"] for r in results] == ["deleted", "not_found"]
+    assert [n.id for n in db.query(models.Node)] == [ids[0]]
+
+
+def test_bulk_changes_bump_config_version_once(db, hub):
+    version = hub.config_version
+    node_id = crud.bulk_create_nodes(db, hub.id, [node(0)])[0]["id"]
+    crud.bulk_create_sensors(db, node_id, [sensor(i) for i in range(3)])
+    db.refresh(hub)
+    assert hub.config_version == version + 2
+
+
+def test_per_row_returning_fallback(tmp_path):
+    # Without insertmanyvalues the dialect can't return executemany rows in order
+    engine = create_engine(f"sqlite:///{tmp_path / 'fallback.db'}", use_insertmanyvalues=False)
+    assert not engine.dialect.insert_executemany_returning_sort_by_parameter_order
+    Base.metadata.create_all(bind=engine)
+    inserts = []
+    event.listen(
+        engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT") else None,
+    )
+    db = sessionmaker(bind=engine)()
+    try:
+        hub = crud.create_hub(db, schemas.HubCreate(name="hub", ip="10.0.0.1"))
+        inserts.clear()
+        results = crud.bulk_create_nodes(db, hub.id, [node(i) for i in range(3)])
+        assert len(inserts) == 3
+        locations = {n.id: n.location for n in db.query(models.Node)}
+        assert [locations[r["id"]] for r in results] == ["room-0", "room-1", "room-2"]
+        node_id = results[0]["id"]
+        results = crud.bulk_create_sensors(db, node_id, [sensor(i) for i in range(4)])
+        types = {s.id: s.type for s in db.query(models.Sensor)}
+        assert [types[r["id"]] for r in results] == [f"type-{i}" for i in range(4)]
+        assert crud.get_node(db, node_id).sensor_count == 4
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,60 @@
+import crud
+import models
+import schemas
+from sensor_counts import SensorCountReconciler
+
+
+def sensor(i: int) -> schemas.SensorCreate:
+    return schemas.SensorCreate(type=f"type-{i}", pin=str(i))
+
+
+def make_node(db) -> int:
+    hub = crud.create_hub(db, schemas.HubCreate(name="hub", ip="10.0.0.1"))
+    return crud.create_node(db, hub.id, schemas.NodeCreate(location="hall")).id
+
+
+def sensor_count(db, node_id: int) -> int:
+    db.expire_all()
+    return crud.get_node(db, node_id).sensor_count
+
+
+def test_bulk_create_and_delete_adjust_sensor_count(db):
+    node_id = make_node(db)
+    ids = [r["id"] for r in crud.bulk_create_sensors(db, node_id, [sensor(i) for i in range(5)])]
+    assert sensor_count(db, node_id) == 5
+    crud.bulk_delete_sensors(db, node_id, ids[:2] + [999])
+    assert sensor_count(db, node_id) == 3
+    crud.bulk_delete_sensors(db, node_id, ids[:2])  # already gone
+    assert sensor_count(db, node_id) == 3
+
+
+def test_single_create_and_delete_adjust_sensor_count(db):
+    node_id = make_node(db)
+    first = crud.create_sensor(db, node_id, sensor(0))
+    crud.create_sensor(db, node_id, sensor(1))
+    assert sensor_count(db, node_id) == 2
+    crud.delete_sensor(db, first.id)
+    assert sensor_count(db, node_id) == 1
+
+
+def test_reconcile_repairs_corrupted_counts(db):
+    node_id = make_node(db)
+    other_id = crud.create_node(db, crud.get_node(db, node_id).hub_id, schemas.NodeCreate(location="yard")).id
+    crud.bulk_create_sensors(db, node_id, [sensor(i) for i in range(3)])
+    db.query(models.Node).filter(models.Node.id == node_id).update({models.Node.sensor_count: 42})
+    db.query(models.Node).filter(models.Node.id == other_id).update({models.Node.sensor_count: None})
+    db.commit()
+    assert crud.reconcile_sensor_counts(db) == 2
+    assert sensor_count(db, node_id) == 3
+    assert sensor_count(db, other_id) == 0
+    assert crud.reconcile_sensor_counts(db) == 0
+
+
+def test_reconciler_counts_repairs(db):
+    node_id = make_node(db)
+    db.query(models.Node).filter(models.Node.id == node_id).update({models.Node.sensor_count: 7})
+    db.commit()
+    reconciler = SensorCountReconciler()
+    assert reconciler.reconcile() == 1
+    assert reconciler.repaired == 1
+    assert sensor_count(db, node_id) == 0